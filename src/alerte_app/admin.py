@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Alerte
+
+
+@admin.register(Alerte)
+class AdminAlerte(admin.ModelAdmin):
+    list_display = ["date_creation", "regle", "niveau", "message", "active", "notifiee", "date_resolution"]
+    list_filter = ["active", "regle", "niveau"]
+    search_fields = ["message", "cle"]
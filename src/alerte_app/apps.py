@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class AlerteAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'alerte_app'
+
+    def ready(self):
+        #réévaluation des règles quand un modèle surveillé change
+        #(le passage périodique est le service `scanner_alertes --boucle`, pas un thread du web)
+        from .signals import connecter
+        connecter()
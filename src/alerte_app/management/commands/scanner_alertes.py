@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from alerte_app.scanner import regles_demandees, scanner
+
+
+class Command(BaseCommand):
+    help = (
+        "Réévalue toutes les règles d'alerte (alerte_app.regles) et met en file les "
+        "mails de notification. --boucle pour le lancer en continu"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--boucle", action="store_true", help="Relance le scanner indéfiniment")
+        parser.add_argument("--intervalle", type=float, default=900, help="Secondes entre deux passages complets (défaut 900)")
+        parser.add_argument(
+            "--reveil", type=float, default=5,
+            help="Secondes entre deux lectures des règles demandées par les signaux (défaut 5)",
+        )
+
+    def passage(self, noms=None):
+        for regle, (creees, resolues) in scanner(noms=noms).items():
+            self.stdout.write(f"🔎 {regle}: {creees} nouvelle(s), {resolues} résolue(s)")
+
+    def handle(self, *args, **options):
+        if not options["boucle"]:
+            self.passage()
+            return
+
+        self.stdout.write(self.style.SUCCESS("✅ Scanner d'alertes démarré (Ctrl+C pour arrêter)"))
+        prochain_complet = 0
+        try:
+            while True:
+                close_old_connections()
+                demandees = regles_demandees()
+                if time.monotonic() >= prochain_complet:
+                    self.passage()
+                    prochain_complet = time.monotonic() + options["intervalle"]
+                elif demandees:
+                    self.passage(demandees)
+                time.sleep(options["reveil"])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt du scanner")
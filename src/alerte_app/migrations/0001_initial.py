@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Alerte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('regle', models.CharField(max_length=50)),
+                ('cle', models.CharField(max_length=120, unique=True)),
+                ('niveau', models.CharField(choices=[('info', 'Info'), ('warning', 'Attention'), ('danger', 'Urgent')], default='info', max_length=10)),
+                ('message', models.CharField(max_length=255)),
+                ('lien', models.CharField(blank=True, default='', max_length=255)),
+                ('active', models.BooleanField(default=True)),
+                ('notifiee', models.BooleanField(default=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_mise_a_jour', models.DateTimeField(auto_now=True)),
+                ('date_resolution', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-date_creation'],
+                'indexes': [models.Index(condition=models.Q(('active', True)), fields=['date_creation'], name='alerte_active_idx')],
+            },
+        ),
+    ]
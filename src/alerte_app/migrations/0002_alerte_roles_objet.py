@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:34
+
+from django.db import migrations, models
+
+
+def remplir_objet_id(apps, schema_editor):
+    """Alertes créées avant le champ: l'id de la demande est dans la clé"""
+    Alerte = apps.get_model('alerte_app', 'Alerte')
+    for alerte in Alerte.objects.filter(regle='rapport_en_retard', objet_id__isnull=True):
+        alerte.objet_id = int(alerte.cle.rsplit(':', 1)[1])
+        alerte.save(update_fields=['objet_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alerte_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alerte',
+            name='objet_id',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='alerte',
+            name='roles',
+            field=models.CharField(default='directeur,comptable,secretaire', max_length=100),
+        ),
+        migrations.RunPython(remplir_objet_id, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+from django.db import models
+
+
+class Alerte(models.Model):
+    """Alerte précalculée par le scanner (voir alerte_app.scanner)
+    Une ligne par problème détecté (règles dans alerte_app.regles), identifiée par
+    `cle` (ex: "rapport_en_retard:12"):
+    un nouveau passage du scanner met la ligne à jour au lieu de la dupliquer,
+    et la désactive quand le problème a disparu.
+    """
+    NIVEAU_CHOICES = [
+        ('info', 'Info'),
+        ('warning', 'Attention'),
+        ('danger', 'Urgent'),
+    ]
+
+    regle = models.CharField(max_length=50)
+    cle = models.CharField(max_length=120, unique=True)
+    niveau = models.CharField(max_length=10, choices=NIVEAU_CHOICES, default='info')
+    message = models.CharField(max_length=255)
+    lien = models.CharField(max_length=255, blank=True, default='')
+    #pages d'accueil concernées, ex: "directeur,secretaire" (le dashboard montre tout)
+    roles = models.CharField(max_length=100, default='directeur,comptable,secretaire')
+    #objet concerné pour les alertes par objet (demande, client...)
+    objet_id = models.PositiveBigIntegerField(blank=True, null=True)
+    active = models.BooleanField(default=True)
+    notifiee = models.BooleanField(default=False)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_mise_a_jour = models.DateTimeField(auto_now=True)
+    date_resolution = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-date_creation']
+        indexes = [
+            #le dashboard ne lit que les alertes actives, les plus récentes d'abord
+            models.Index(fields=['date_creation'], condition=models.Q(active=True), name='alerte_active_idx'),
+        ]
+
+    def __str__(self):
+        return f"[{self.niveau}] {self.message}"
@@ -0,0 +1,292 @@
+"""REGLES D'ALERTE
+Une classe par type d'alerte, enregistrée dans REGLES par @enregistrer.
+
+    class FondBas(Regle):
+        nom = 'fond_bas'
+        modeles = (FondDisponible, MouvementFond)   # réévaluée à chaque modification
+        def alertes(self, maintenant):
+            return {cle: {'message': ..., 'lien': ...}}   # alertes qui doivent exister
+
+evaluer() synchronise la table Alerte avec ce que retourne alertes(): création des
+nouvelles, mise à jour des messages, désactivation de celles qui ont disparu.
+Les règles dépendant de la date (retards, anniversaires) sont en plus réévaluées
+par le scanner périodique (alerte_app.scanner).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Prefetch
+from django.urls import reverse
+from django.utils import timezone
+
+from chantier_app.models import Chantier
+from client_app.models import Client
+from contrat_app.models import Contrat
+from directeur_app.models import FondDisponible, MouvementFond
+from employee_app.models import RapportDepense
+from notification_app.outbox import mettre_en_file
+from sanba_finflow.cache import invalider_modele
+from secretaire_app.models import DemandeDecaissement
+from .models import Alerte
+
+
+logger = logging.getLogger(__name__)
+
+ROLES = ('directeur', 'comptable', 'secretaire')
+DELAI_RAPPORT = timedelta(hours=48)
+#au-delà, une alerte de retard est affichée mais plus envoyée par mail (historique)
+FENETRE_MAIL_RETARD = timedelta(hours=getattr(settings, 'ALERTES_FENETRE_MAIL_RETARD', 168))
+SEUIL_FOND_BAS = getattr(settings, 'ALERTES_SEUIL_FOND_BAS', 100000)
+
+REGLES = {}
+
+
+def enregistrer(classe):
+    """Décorateur: ajoute une instance de la règle au registre"""
+    REGLES[classe.nom] = classe()
+    return classe
+
+
+#####__ CLASSE DE BASE __####
+
+class Regle:
+    nom = None
+    niveau = 'info'
+    roles = ROLES       # pages d'accueil qui affichent l'alerte (le dashboard les montre toutes)
+    modeles = ()        # modèles dont un save/delete relance la règle (voir signals.py)
+
+    def alertes(self, maintenant):
+        """{cle: {'message', 'lien', ['niveau'], ['objet_id']}} des alertes qui doivent être actives"""
+        raise NotImplementedError
+
+    def apres_synchronisation(self, maintenant):
+        """Hook appelé après chaque évaluation (ex: mise en file des mails)"""
+
+    def evaluer(self, maintenant=None):
+        """Retourne (créées, résolues)"""
+        maintenant = maintenant or timezone.now()
+        attendues = {
+            cle: {'niveau': self.niveau, 'roles': ",".join(self.roles), 'lien': '', 'objet_id': None, **champs}
+            for cle, champs in self.alertes(maintenant).items()
+        }
+        resultat = synchroniser(self.nom, attendues, maintenant)
+        self.apres_synchronisation(maintenant)
+        return resultat
+
+
+def synchroniser(regle, attendues, maintenant):
+    """attendues = {cle: champs de l'Alerte} pour la règle; retourne (créées, résolues)"""
+    existantes = {
+        alerte.cle: alerte
+        for alerte in Alerte.objects.filter(regle=regle, cle__in=list(attendues))
+    }
+    creees = modifiees = 0
+    for cle, champs in attendues.items():
+        alerte = existantes.get(cle)
+        if alerte is None:
+            try:
+                with transaction.atomic():
+                    Alerte.objects.create(regle=regle, cle=cle, **champs)
+                creees += 1
+            except IntegrityError:
+                #un autre scanner (autre worker) vient de la créer
+                pass
+        elif not alerte.active or any(getattr(alerte, champ) != valeur for champ, valeur in champs.items()):
+            #réapparue ou message changé (ex: nombre de rapports)
+            modifiees += Alerte.objects.filter(pk=alerte.pk).update(
+                active=True, date_resolution=None, date_mise_a_jour=maintenant, **champs
+            )
+
+    resolues = Alerte.objects.filter(regle=regle, active=True).exclude(cle__in=list(attendues)).update(
+        active=False, date_resolution=maintenant, date_mise_a_jour=maintenant
+    )
+    if modifiees or resolues:
+        #update() ne déclenche pas post_save: le widget d'alertes en cache doit être invalidé à la main
+        transaction.on_commit(lambda: invalider_modele(Alerte))
+    return creees, resolues
+
+
+#####__ CHANTIERS / CONTRATS / CLIENTS __####
+
+@enregistrer
+class ChantiersEnRetard(Regle):
+    nom = 'chantiers_en_retard'
+    niveau = 'warning'
+    roles = ('directeur', 'comptable')
+    modeles = (Chantier,)
+
+    def alertes(self, maintenant):
+        nombre = Chantier.objects.en_retard(maintenant.date()).count()
+        if not nombre:
+            return {}
+        return {self.nom: {
+            'message': f"🚨{nombre} chantier(s) en retard",
+            'lien': f"{reverse('chantier_app:liste-chantier')}?status=retard",
+        }}
+
+
+@enregistrer
+class ContratsNonSignes(Regle):
+    nom = 'contrats_non_signes'
+    roles = ('directeur', 'comptable')
+    modeles = (Contrat,)
+
+    def alertes(self, maintenant):
+        nombre = Contrat.objects.filter(date_signature__isnull=True).count()
+        if not nombre:
+            return {}
+        return {self.nom: {
+            'message': f"{nombre} contrats(s) en attente de signature",
+            'lien': reverse('contrat_app:liste-contrats'),
+        }}
+
+
+@enregistrer
+class ClientsSansChantier(Regle):
+    """Opportunités manquées"""
+    nom = 'clients_sans_chantier'
+    roles = ('directeur', 'secretaire')
+    modeles = (Client, Chantier)
+
+    def alertes(self, maintenant):
+        nombre = Client.objects.filter(~Exists(Chantier.objects.filter(client=OuterRef('pk')))).count()
+        if not nombre:
+            return {}
+        return {self.nom: {
+            'message': f"{nombre} client(s) sans chantier",
+            'lien': reverse('client_app:liste-client'),
+        }}
+
+
+@enregistrer
+class AnniversairesClients(Regle):
+    """Une alerte par client dont c'est l'anniversaire (désactivée le lendemain par le scanner)"""
+    nom = 'anniversaire_client'
+    roles = ('directeur', 'secretaire')
+    modeles = (Client,)
+
+    def alertes(self, maintenant):
+        #plage sur l'index client_anniversaire_idx (plus de __month/__day)
+        clients = Client.objects.anniversaires_a_venir(0, timezone.localtime(maintenant).date()).only('id', 'nom')
+        return {
+            f"{self.nom}:{client.pk}": {
+                'message': f" Souhaitons un joyeux anniversaire au client {client.nom}",
+                'lien': reverse('client_app:detail-client', args=[client.pk]),
+                'objet_id': client.pk,
+            }
+            for client in clients
+        }
+
+
+#####__ FOND __####
+
+@enregistrer
+class FondBas(Regle):
+    nom = 'fond_bas'
+    niveau = 'danger'
+    #le fond est modifié par update() (directeur_app.fonds): c'est le journal qui déclenche
+    modeles = (FondDisponible, MouvementFond)
+
+    def alertes(self, maintenant):
+        fond = FondDisponible.objects.filter(id=1).values_list('montant', flat=True).first()
+        if fond is None or fond >= SEUIL_FOND_BAS:
+            return {}
+        return {self.nom: {
+            'message': f"Fonds très bas! ({fond} FCFA)",
+            'lien': reverse('directeur_app:historique-fonds'),
+        }}
+
+
+#####__ RAPPORTS DE DEPENSE __####
+
+def demandes_sans_rapport(maintenant):
+    """Demandes décaissées avant maintenant - 48h sans aucun rapport (index partiel demande_decaisse_idx)"""
+    return DemandeDecaissement.objects.filter(
+        decaisse=True, date_decaissement__lte=maintenant - DELAI_RAPPORT,
+    ).filter(
+        ~Exists(RapportDepense.objects.filter(demande_decaissement=OuterRef('pk')))
+    )
+
+
+@enregistrer
+class RapportsEnRetard(Regle):
+    """Demande décaissée depuis plus de 48h sans rapport de dépense
+    Une alerte par demande; mail au demandeur et à la gestion, une seule fois par alerte,
+    et seulement si le retard a commencé il y a moins de FENETRE_MAIL_RETARD: au premier
+    passage du scanner, les retards anciens sont marqués notifiés sans mail
+    """
+    nom = 'rapport_en_retard'
+    niveau = 'warning'
+    modeles = (DemandeDecaissement, RapportDepense)
+
+    def alertes(self, maintenant):
+        lien = reverse("secretaire_app:hist-demande-decaisse")
+        return {
+            f"{self.nom}:{demande.pk}": {
+                'message': (
+                    f"⚠️ {demande.demandeur.username} n'a pas soumis de rapport de dépense pour "
+                    f"le décaissement {demande.reference_demande or demande.pk} (plus de 48 heures)"
+                ),
+                'lien': f"{lien}?q={demande.reference_demande}" if demande.reference_demande else lien,
+                'objet_id': demande.pk,
+            }
+            for demande in demandes_sans_rapport(maintenant).select_related('demandeur')
+        }
+
+    def apres_synchronisation(self, maintenant):
+        a_notifier = list(Alerte.objects.filter(regle=self.nom, active=True, notifiee=False))
+        if not a_notifier:
+            return
+        demandes = DemandeDecaissement.objects.select_related('demandeur').prefetch_related(
+            #qui a décaissé: l'auteur du retrait dans le journal du fond
+            Prefetch('mouvements_fond', queryset=MouvementFond.objects.filter(type_mouvement='retrait').select_related('auteur'))
+        ).in_bulk([alerte.objet_id for alerte in a_notifier])
+        limite = maintenant - DELAI_RAPPORT - FENETRE_MAIL_RETARD
+        anciennes = {
+            alerte.pk for alerte in a_notifier
+            if alerte.objet_id in demandes and demandes[alerte.objet_id].date_decaissement < limite
+        }
+        Alerte.objects.filter(pk__in=anciennes).update(notifiee=True)
+        for alerte in a_notifier:
+            demande = demandes.get(alerte.objet_id)
+            if alerte.pk in anciennes:
+                continue
+            #UPDATE conditionnel: un seul scanner envoie les mails de cette alerte
+            if demande is None or not Alerte.objects.filter(pk=alerte.pk, notifiee=False).update(notifiee=True):
+                continue
+            decaisseurs = [mouvement.auteur.email for mouvement in demande.mouvements_fond.all() if mouvement.auteur]
+            mettre_en_file(
+                subject="⚠️ Rapport de Dépense en Retard",
+                message=f"Bonjour {demande.demandeur.username}, vous n'avez pas encore soumis votre rapport de dépense pour le décaissement effectué il y a plus de 48 heures. Veuillez le faire dès que possible.",
+                from_email=settings.EMAIL_HOST_USER,
+                recipient_list=[demande.demandeur.email],
+            )
+            mettre_en_file(
+                subject="⚠️ Rapport de Dépense en Retard",
+                message=f"Bonjour, {demande.demandeur.username} n'a pas encore soumis son rapport de dépense pour le décaissement {demande.reference_demande or demande.pk} fait il y a plus de 48 heures.",
+                from_email=settings.EMAIL_HOST_USER,
+                recipient_list=decaisseurs + list(settings.ALERTES_EMAILS_GESTION),
+            )
+
+
+@enregistrer
+class RapportsSansDemande(Regle):
+    nom = 'rapports_sans_demande'
+    niveau = 'warning'
+    roles = ('directeur', 'comptable')
+    modeles = (RapportDepense,)
+
+    def alertes(self, maintenant):
+        nombre = RapportDepense.objects.filter(
+            demande_decaissement__isnull=True,
+            date_creation__lte=maintenant - DELAI_RAPPORT,
+            status__in=['soumis', 'brouillon'],
+        ).count()
+        if not nombre:
+            return {}
+        return {self.nom: {
+            'message': f"🚨 {nombre} rapport(s) sans lien à une demande (>48h)",
+            'lien': reverse("directeur_app:rapport-depense-employee"),
+        }}
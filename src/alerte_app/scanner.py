@@ -0,0 +1,56 @@
+"""SCANNER D'ALERTES
+Réévalue toutes les règles (alerte_app.regles) à intervalle régulier:
+`manage.py scanner_alertes --boucle` (service `scanner` de docker-compose, ou cron).
+Nécessaire pour les règles qui dépendent de l'heure (retards, 48h, anniversaires);
+les autres sont déjà tenues à jour par les signaux (alerte_app.signals). Entre deux
+passages complets, la boucle réévalue les règles demandées par les modifications
+faites hors transaction (demander / regles_demandees).
+Les pages ne font que lire la table: alertes_actives().
+"""
+import logging
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Alerte
+from .regles import REGLES
+
+
+logger = logging.getLogger(__name__)
+
+#une clé par règle demandée, dans le cache commun à tous les workers
+PREFIXE_DEMANDE = "alertes:a_reevaluer"
+
+
+def demander(*noms):
+    """Demande au scanner de réévaluer ces règles (plusieurs demandes = une évaluation)"""
+    cache.set_many({f"{PREFIXE_DEMANDE}:{nom}": True for nom in noms}, timeout=None)
+
+
+def regles_demandees():
+    """Noms des règles demandées depuis le dernier appel
+    delete() ne réussit qu'une fois par demande: deux scanners ne la traitent pas tous les deux
+    """
+    return [nom for nom in REGLES if cache.delete(f"{PREFIXE_DEMANDE}:{nom}")]
+
+
+def scanner(maintenant=None, noms=None):
+    """Passe les règles `noms` (toutes par défaut); retourne {règle: (créées, résolues)}"""
+    maintenant = maintenant or timezone.now()
+    resultat = {}
+    for nom in REGLES if noms is None else noms:
+        try:
+            resultat[nom] = REGLES[nom].evaluer(maintenant)
+        except Exception as e:
+            #une règle en erreur ne bloque pas les autres
+            logger.error(f"Erreur règle d'alerte {nom}: {e}")
+    logger.info(f"Scanner alertes: {resultat}")
+    return resultat
+
+
+def alertes_actives(role=None):
+    """Une requête sur l'index partiel alerte_active_idx; role = page d'accueil ('secretaire'...)"""
+    alertes = Alerte.objects.filter(active=True).order_by('-date_creation')
+    if role:
+        alertes = alertes.filter(roles__contains=role)
+    return alertes
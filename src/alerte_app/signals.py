@@ -0,0 +1,82 @@
+"""REEVALUATION DES ALERTES A CHAQUE MODIFICATION
+Chaque règle déclare ses `modeles`; un save/delete de l'un d'eux relance la règle
+après le commit. Plusieurs modifications dans la même transaction ne relancent
+la règle qu'une fois. Les changements de statut en masse (update(), sans
+post_save) passent par le signal chantier_app.transitions.statuts_modifies.
+Hors transaction (autocommit), rien n'est évalué dans la requête: la règle est
+demandée au scanner (alerte_app.scanner.demander).
+"""
+import logging
+import threading
+
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+
+from chantier_app.models import Chantier
+from chantier_app.transitions import statuts_modifies
+from .regles import REGLES
+from .scanner import demander
+
+
+logger = logging.getLogger(__name__)
+
+
+def _evaluer(regle):
+    try:
+        regle.evaluer()
+    except Exception as e:
+        #une alerte ratée ne doit pas faire échouer la requête; le scanner rattrapera
+        logger.error(f"Erreur réévaluation alerte {regle.nom}: {e}")
+
+
+#règles à réévaluer au prochain commit, par thread (une connexion par thread)
+_en_attente = threading.local()
+
+
+def _regles_en_attente():
+    if not hasattr(_en_attente, 'noms'):
+        _en_attente.noms = set()
+    return _en_attente.noms
+
+
+def _evaluer_en_attente():
+    #un callback par modification, mais le premier vide l'ensemble: chaque règle une seule fois.
+    #Après un rollback, les noms restés là sont réévalués au commit suivant (sans effet, la règle relit la base)
+    noms = _regles_en_attente()
+    _en_attente.noms = set()
+    for nom in noms:
+        _evaluer(REGLES[nom])
+
+
+def _planifier(regles):
+    noms = [regle.nom for regle in regles]
+    if not connection.in_atomic_block:
+        #on_commit s'exécuterait tout de suite, une fois par save, sans regroupement
+        demander(*noms)
+        return
+    _regles_en_attente().update(noms)
+    transaction.on_commit(_evaluer_en_attente)
+
+
+def connecter():
+    """Branche un receiver par modèle surveillé (appelé par AlerteAppConfig.ready)"""
+    regles_par_modele = {}
+    for regle in REGLES.values():
+        for modele in regle.modeles:
+            regles_par_modele.setdefault(modele, []).append(regle)
+
+    for modele, regles in regles_par_modele.items():
+        def receiver(sender, regles=regles, **kwargs):
+            if kwargs.get('raw'):
+                return
+            _planifier(regles)
+
+        for nom_signal, signal in (('save', post_save), ('delete', post_delete)):
+            signal.connect(receiver, sender=modele, weak=False, dispatch_uid=f"alertes:{modele._meta.label_lower}:{nom_signal}")
+        if modele is Chantier:
+            #changement de statut en masse: update() sans post_save, un seul signal par lot, déjà après le commit
+            def transition(sender, regles=regles, **kwargs):
+                for regle in regles:
+                    _evaluer(regle)
+
+            statuts_modifies.connect(transition, sender=modele, weak=False, dispatch_uid=f"alertes:{modele._meta.label_lower}:transition")
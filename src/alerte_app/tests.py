@@ -0,0 +1,71 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from auth_app.models import Personnel
+from notification_app.models import MessageSortant
+from secretaire_app.models import DemandeDecaissement
+
+from . import signals
+from .models import Alerte
+from .regles import RapportsEnRetard
+from .scanner import regles_demandees, scanner
+
+
+class RapportsEnRetardTests(TestCase):
+
+    def creer_decaissement(self, reference, il_y_a):
+        return DemandeDecaissement.objects.create(
+            demandeur=self.employe, montant=Decimal('1000'), motif='m', reference_demande=reference,
+            decaisse=True, date_decaissement=timezone.now() - il_y_a,
+        )
+
+    def setUp(self):
+        self.employe = Personnel.objects.create_user(username='employe', password='pw', email='e@x.com')
+
+    @override_settings(ALERTES_EMAILS_GESTION=['gestion@example.com'])
+    def test_premier_passage_ne_relance_pas_l_historique(self):
+        self.creer_decaissement('ANCIEN', timedelta(days=60))
+        self.creer_decaissement('RECENT', timedelta(hours=50))
+
+        scanner()
+
+        alertes = Alerte.objects.filter(regle=RapportsEnRetard.nom, active=True)
+        self.assertEqual(alertes.count(), 2)
+        self.assertFalse(alertes.filter(notifiee=False).exists())
+        #deux mails (demandeur + gestion), tous pour le retard récent
+        mails = MessageSortant.objects.all()
+        self.assertEqual(mails.count(), 2)
+        self.assertTrue(all('ANCIEN' not in mail.corps for mail in mails))
+
+        scanner()
+        self.assertEqual(MessageSortant.objects.count(), 2)
+
+
+class PlanificationReglesTests(TestCase):
+
+    def test_chaque_regle_une_seule_fois_par_transaction(self):
+        employe = Personnel.objects.create_user(username='employe', password='pw')
+        with mock.patch.object(signals, '_evaluer') as evaluer:
+            with self.captureOnCommitCallbacks(execute=True):
+                for numero in range(3):
+                    DemandeDecaissement.objects.create(demandeur=employe, montant=Decimal('1000'), motif=f'm{numero}')
+        evalues = [appel.args[0].nom for appel in evaluer.call_args_list]
+        self.assertIn(RapportsEnRetard.nom, evalues)
+        self.assertEqual(len(evalues), len(set(evalues)))
+
+    def test_hors_transaction_confiee_au_scanner(self):
+        employe = Personnel.objects.create_user(username='employe', password='pw')
+        regles_demandees()
+        with mock.patch.object(signals, 'connection', mock.Mock(in_atomic_block=False)), \
+                mock.patch.object(signals, '_evaluer') as evaluer:
+            for numero in range(3):
+                DemandeDecaissement.objects.create(demandeur=employe, montant=Decimal('1000'), motif=f'm{numero}')
+
+        evaluer.assert_not_called()
+        self.assertIn(RapportsEnRetard.nom, regles_demandees())
+        #chaque demande n'est rendue qu'une fois
+        self.assertEqual(regles_demandees(), [])
@@ -9,7 +9,7 @@ from secretaire_app.models import DemandeDecaissement
 from secretaire_app.forms import DemandeDecaissementForm
 from client_app.forms import ClientForm
 from employee_app.form import RapportDepenseForm
-from django.core.mail import send_mail
+from notification_app.outbox import mettre_en_file
 from django.conf import settings
 import logging
 
@@ -55,7 +55,7 @@ def register_view(request):
                     lieu_de_naissance=form.cleaned_data['lieu_de_naissance'],
                     personne_a_prevenir_en_cas=form.cleaned_data['personne_a_prevenir_en_cas']
                 )
-                send_mail(
+                mettre_en_file(
                     subject="Identifiant Temporaire",
                     message=f"""Bonjour, Mr/Mme {form.cleaned_data.get('first_name')},
                     \n Vos identifiant pour SANBA GESTION FINFLOW: 
@@ -153,11 +153,11 @@ def change_credentials_view(request):
             #change password si fourni
             new_password = form.cleaned_data.get("new_password")
             if new_password:
-                print(f"new_password: {new_password}")
-                print(f"new_username: {new_username}")
+                #jamais le mot de passe dans les logs
+                logger.debug("changement de mot de passe pour %s (nouveau nom: %s)", user.pk, new_username or '-')
                 user.set_password(new_password)
                 try: 
-                    send_mail(
+                    mettre_en_file(
                         subject="Identifiant Temporaire",
                         message=f"""Bonjour, Mr/Mme {request.user.last_name},
                         \n Vous venez de changer vos identifiant pour SANBA GESTION FINFLOW: 
@@ -1,6 +1,35 @@
 from django.contrib import admin
-from .models import Chantier
+from .models import Chantier, DureeStatut, TransitionChantier
 
 @admin.register(Chantier)
 class AdminChantier(admin.ModelAdmin):
     list_display=["nom_chantier", "reference", "status_chantier", "date_debut_prevue", "date_fin_prevue"]
+
+@admin.register(TransitionChantier)
+class AdminTransitionChantier(admin.ModelAdmin):
+    """Historique en lecture seule"""
+    list_display = ["date_transition", "chantier", "transition", "ancien_status", "nouveau_status", "duree_ancien_status", "auteur"]
+    list_filter = ["transition", "nouveau_status"]
+    list_select_related = ["chantier", "auteur"]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DureeStatut)
+class AdminDureeStatut(admin.ModelAdmin):
+    """Cumuls calculés (recompute_durees_statut pour reconstruire)"""
+    list_display = ["type_travaux", "status_chantier", "chantiers", "passages", "duree_totale", "duree_moyenne", "date_mise_a_jour"]
+    list_filter = ["status_chantier"]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
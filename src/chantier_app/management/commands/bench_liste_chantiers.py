@@ -0,0 +1,105 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from auth_app.models import Personnel
+from chantier_app.models import Chantier
+from chantier_app.views import ChantierListeView
+from client_app.models import Client
+from contrat_app.models import Contrat
+
+
+class AnnulerBench(Exception):
+    """Levée à la fin du bench pour annuler toutes les données créées"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le nombre de requêtes de la liste des chantiers à différentes volumétries "
+        "(données créées dans une transaction puis annulées: la base n'est pas modifiée)"
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tailles",
+            nargs="+",
+            type=int,
+            default=[100, 1000, 10000],
+            help="Nombres de chantiers à tester (défaut: 100 1000 10000)",
+        )
+    
+    def handle(self, *args, **options):
+        resultats = []
+        try:
+            with transaction.atomic():
+                utilisateur = Personnel.objects.create_user(username="bench_liste_chantiers")
+                client = Client.objects.create(
+                    type_client="particulier", nom="Bench", telephone="0",
+                    adresse="bench", ville="Ouagadougou", pays="Burkina Faso",
+                )
+                deja_crees = 0
+                for taille in sorted(options["tailles"]):
+                    self.creer_chantiers(client, deja_crees, taille - deja_crees)
+                    deja_crees = taille
+                    resultats.append((taille, *self.mesurer(utilisateur)))
+                raise AnnulerBench
+        except AnnulerBench:
+            pass
+        
+        self.stdout.write(f"{'chantiers':>10} {'requêtes':>9} {'temps (ms)':>11}")
+        for taille, requetes, duree in resultats:
+            self.stdout.write(f"{taille:>10} {requetes:>9} {duree:>11.1f}")
+        
+        if len({requetes for _, requetes, _ in resultats}) == 1:
+            self.stdout.write(self.style.SUCCESS("✅ Nombre de requêtes constant"))
+        else:
+            self.stdout.write(self.style.WARNING("⚠️ Le nombre de requêtes dépend du volume"))
+    
+    def creer_chantiers(self, client, debut, nombre):
+        """bulk_create: un chantier sur deux a un contrat, un sur quatre est payé"""
+        aujourdhui = timezone.now().date()
+        statuts = ["en_cours", "termine", "devis", "planification"]
+        chantiers = Chantier.objects.bulk_create(
+            [
+                Chantier(
+                    client=client,
+                    reference=f"BENCH-{i}",
+                    nom_chantier=f"Chantier bench {i}",
+                    adresse_chantier="bench",
+                    type_travaux="toiture_tole",
+                    type_batiment="autre",
+                    status_chantier=statuts[i % len(statuts)],
+                    date_fin_prevue=aujourdhui - timezone.timedelta(days=i % 10),
+                )
+                for i in range(debut, debut + nombre)
+            ],
+            batch_size=1000,
+        )
+        Contrat.objects.bulk_create(
+            [
+                Contrat(
+                    chantier=chantier,
+                    reference_contrat=f"BENCH-C-{chantier.pk}",
+                    montant_total=Decimal("100000"),
+                    montant_encaisse=Decimal("100000") if chantier.pk % 4 == 0 else Decimal("0"),
+                )
+                for chantier in chantiers
+                if chantier.pk % 2 == 0
+            ],
+            batch_size=1000,
+        )
+    
+    def mesurer(self, utilisateur):
+        """Rend la page liste (comme un vrai GET) et compte les requêtes SQL"""
+        requete = RequestFactory().get("/chantier/chantier/")
+        requete.user = utilisateur
+        debut = time.perf_counter()
+        with CaptureQueriesContext(connection) as requetes:
+            reponse = ChantierListeView.as_view()(requete)
+            reponse.render()
+        return len(requetes), (time.perf_counter() - debut) * 1000
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from chantier_app.transitions import recalculer_durees
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruit les durées par statut et par type de travaux (DureeStatut) "
+        "à partir de l'historique des transitions"
+    )
+
+    def handle(self, *args, **options):
+        lignes = recalculer_durees()
+        self.stdout.write(self.style.SUCCESS(f"✅ {lignes} ligne(s) (type de travaux, statut) reconstruite(s)"))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chantier_app', '0002_remove_chantier_facturer_remove_chantier_payer'),
+        ('client_app', '0002_client_client_contact_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chantier',
+            index=models.Index(fields=['status_chantier', 'date_fin_prevue'], name='chantier_statut_fin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chantier',
+            index=models.Index(fields=['date_creation', 'id'], name='chantier_creation_idx'),
+        ),
+    ]
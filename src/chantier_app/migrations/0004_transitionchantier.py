@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chantier_app', '0003_chantier_chantier_statut_fin_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransitionChantier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transition', models.CharField(max_length=20)),
+                ('ancien_status', models.CharField(choices=[('devis', 'Devis en Cours'), ('planification', 'Planification'), ('en_cours', 'En Cours'), ('suspendu', 'Suspendu'), ('termine', 'Terminé'), ('annule', 'Annulé')], max_length=50)),
+                ('nouveau_status', models.CharField(choices=[('devis', 'Devis en Cours'), ('planification', 'Planification'), ('en_cours', 'En Cours'), ('suspendu', 'Suspendu'), ('termine', 'Terminé'), ('annule', 'Annulé')], max_length=50)),
+                ('date_transition', models.DateTimeField(default=django.utils.timezone.now)),
+                ('auteur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transitions_chantier', to=settings.AUTH_USER_MODEL)),
+                ('chantier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='chantier_app.chantier')),
+            ],
+            options={
+                'verbose_name': 'Transition de chantier',
+                'verbose_name_plural': 'Transitions de chantier',
+                'ordering': ['-date_transition', '-id'],
+                'indexes': [models.Index(fields=['chantier', 'date_transition'], name='transition_chantier_date_idx')],
+            },
+        ),
+    ]
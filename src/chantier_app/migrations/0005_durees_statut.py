@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:43
+
+import datetime
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def ouvrir_historique(apps, schema_editor):
+    #chantiers sans historique: le début de leur statut actuel est inconnu, une ligne 'reprise'
+    #marque le début du suivi (ce séjour ne sera pas compté dans DureeStatut)
+    Chantier = apps.get_model('chantier_app', 'Chantier')
+    TransitionChantier = apps.get_model('chantier_app', 'TransitionChantier')
+    maintenant = timezone.now()
+    TransitionChantier.objects.bulk_create([
+        TransitionChantier(
+            chantier_id=chantier_id, transition='reprise', ancien_status=status,
+            nouveau_status=status, date_transition=maintenant,
+        )
+        for chantier_id, status in Chantier.objects.filter(transitions__isnull=True).values_list('id', 'status_chantier')
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chantier_app', '0004_transitionchantier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transitionchantier',
+            name='duree_ancien_status',
+            field=models.DurationField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='DureeStatut',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_travaux', models.CharField(choices=[('charpente_metallique', 'Charpente Métallique'), ('toiture_tole', 'Toiture Tôle'), ('decoration', 'Décoration'), ('toiture_couverture', 'Toiture Couverture'), ('isolation', 'Isolation'), ('ventilation', 'Ventilation'), ('toiture_etancheite', 'Toiture Étanchéité'), ('garde_corps', 'Garde-Corps'), ('escalier_metal', 'Escalier en Métal'), ('porte_grillee', 'Porte/Grille Métallique'), ('mixte', 'Travaux Mixtes'), ('autre', 'Autre')], max_length=50)),
+                ('status_chantier', models.CharField(choices=[('devis', 'Devis en Cours'), ('planification', 'Planification'), ('en_cours', 'En Cours'), ('suspendu', 'Suspendu'), ('termine', 'Terminé'), ('annule', 'Annulé')], max_length=50)),
+                ('chantiers', models.PositiveIntegerField(default=0)),
+                ('passages', models.PositiveIntegerField(default=0)),
+                ('duree_totale', models.DurationField(default=datetime.timedelta)),
+                ('date_mise_a_jour', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Durée par statut',
+                'verbose_name_plural': 'Durées par statut',
+                'constraints': [models.UniqueConstraint(fields=('status_chantier', 'type_travaux'), name='duree_statut_unique')],
+            },
+        ),
+        migrations.RunPython(ouvrir_historique, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,61 @@
+from datetime import timedelta
+
 from django.db import models
+from django.db.models import BooleanField, Case, F, Q, Value, When
 from django.urls import reverse
 from django.utils import timezone
 from auth_app.models import Personnel
 
 
 
+#####__ ETAT DE PAIEMENT ET RETARD (calculés en SQL) __####
+#le contrat est en OneToOne (related_name="contrats"): une seule jointure, pas de doublons
+PAYE_ENTIEREMENT = Q(contrats__montant_encaisse__gte=F('contrats__montant_total'))
+PAYE_PARTIELLEMENT = Q(contrats__montant_encaisse__gt=0, contrats__montant_encaisse__lt=F('contrats__montant_total'))
+
+
+def q_en_retard(aujourdhui=None):
+    """En cours et date de fin prévue dépassée (index chantier_statut_fin_idx)"""
+    return Q(status_chantier='en_cours', date_fin_prevue__lt=aujourdhui or timezone.now().date())
+
+
+def _drapeau(condition):
+    return Case(When(condition, then=Value(True)), default=Value(False), output_field=BooleanField())
+
+
+class ChantierQuerySet(models.QuerySet):
+    
+    def with_payment_state(self):
+        """Ajoute paye_entierement / paye_partiellement (booléens) et etat_paiement
+        ('paye', 'partiel', 'impaye', 'sans_contrat') calculés dans la requête"""
+        return self.annotate(
+            paye_entierement=_drapeau(PAYE_ENTIEREMENT),
+            paye_partiellement=_drapeau(PAYE_PARTIELLEMENT),
+            etat_paiement=Case(
+                When(contrats__isnull=True, then=Value('sans_contrat')),
+                When(PAYE_ENTIEREMENT, then=Value('paye')),
+                When(PAYE_PARTIELLEMENT, then=Value('partiel')),
+                default=Value('impaye'),
+            ),
+        )
+    
+    def with_delay_state(self, aujourdhui=None):
+        """Ajoute en_retard (booléen); la date du jour est lue une fois pour toute la requête"""
+        return self.annotate(en_retard=_drapeau(q_en_retard(aujourdhui)))
+    
+    def payes(self):
+        return self.filter(PAYE_ENTIEREMENT)
+    
+    def partiellement_payes(self):
+        return self.filter(PAYE_PARTIELLEMENT)
+    
+    def impayes(self):
+        return self.exclude(PAYE_ENTIEREMENT).exclude(PAYE_PARTIELLEMENT)
+    
+    def en_retard(self, aujourdhui=None):
+        return self.filter(q_en_retard(aujourdhui))
+
+
 class Chantier(models.Model):
     
     """
@@ -132,10 +183,18 @@ class Chantier(models.Model):
     date_creation = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
     
+    objects = ChantierQuerySet.as_manager()
+    
     class Meta:
         """configuration spécial pour django"""
         verbose_name = "Chantier"
         verbose_name_plural = "Chantiers"
+        indexes = [
+            #chantiers en retard: status_chantier='en_cours' ET date_fin_prevue < aujourd'hui
+            models.Index(fields=['status_chantier', 'date_fin_prevue'], name='chantier_statut_fin_idx'),
+            #liste paginée par curseur (-date_creation, -id)
+            models.Index(fields=['date_creation', 'id'], name='chantier_creation_idx'),
+        ]
     
     def __str__(self):
         """affichage dans l'admin"""
@@ -147,43 +206,98 @@ class Chantier(models.Model):
         """
         return 0 # a ameliorer plus tard
     
-    def est_payer_partiellement(self):
-        """Vérifie si le chantier est partiellement payé"""
+    #Les trois méthodes suivantes lisent les annotations de with_payment_state() /
+    #with_delay_state() quand elles sont présentes (listes): aucune requête par ligne.
+    #Sans annotation (chantier chargé seul), elles retombent sur le contrat.
+    
+    def _contrat_ou_none(self):
         try:
-            contrat = self.contrats
-            # Gère les None
-            if contrat.montant_encaisse is None or contrat.montant_total is None:
-                return False
-            if  contrat.montant_encaisse >= contrat.montant_total:
-                return False
-            elif contrat.montant_encaisse > 0:
-                return True
+            return self.contrats
         except Chantier.contrats.RelatedObjectDoesNotExist:
-            
-             return False
+            return None
+    
+    def est_payer_partiellement(self):
+        """Vérifie si le chantier est partiellement payé"""
+        if 'paye_partiellement' in self.__dict__:
+            return self.paye_partiellement
+        contrat = self._contrat_ou_none()
+        if contrat is None or contrat.montant_encaisse is None or contrat.montant_total is None:
+            return False
+        return 0 < contrat.montant_encaisse < contrat.montant_total
 
     def est_payer_entierement(self):
         """Vérifie si le chantier est entièrement payé"""
-        try:
-            
-            contrat = self.contrats
-            
-            # Gère les None
-            if contrat.montant_encaisse is None or contrat.montant_total is None:
-                return False
-            elif contrat.montant_encaisse >= contrat.montant_total:
-                return True
-            return False
-        except Chantier.contrats.RelatedObjectDoesNotExist:
-            
+        if 'paye_entierement' in self.__dict__:
+            return self.paye_entierement
+        contrat = self._contrat_ou_none()
+        if contrat is None or contrat.montant_encaisse is None or contrat.montant_total is None:
             return False
+        return contrat.montant_encaisse >= contrat.montant_total
 
     @property
     def est_en_retard(self):
         """Vérifie si le chantier est en retard"""
+        if 'en_retard' in self.__dict__:
+            return self.en_retard
         if self.status_chantier == 'en_cours' and self.date_fin_prevue:
             return self.date_fin_prevue < timezone.now().date()
         return False
     
     def get_absolute_url(self):
         return reverse('chantier_app:detail-chantier', args=[str(self.id)])
+
+
+class TransitionChantier(models.Model):
+    """Historique des changements de statut (ajout seulement, voir chantier_app.transitions)"""
+    chantier = models.ForeignKey(Chantier, on_delete=models.CASCADE, related_name="transitions")
+    transition = models.CharField(max_length=20)
+    ancien_status = models.CharField(max_length=50, choices=Chantier.STATUS_CHANTIER_CHOICES)
+    nouveau_status = models.CharField(max_length=50, choices=Chantier.STATUS_CHANTIER_CHOICES)
+    auteur = models.ForeignKey(Personnel, on_delete=models.SET_NULL, null=True, blank=True, related_name="transitions_chantier")
+    date_transition = models.DateTimeField(default=timezone.now)
+    #temps passé dans ancien_status (depuis la transition précédente, ou la création du chantier);
+    #vide si inconnu (chantier antérieur à l'historique, voir transitions.REPRISE)
+    duree_ancien_status = models.DurationField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-date_transition', '-id']
+        verbose_name = "Transition de chantier"
+        verbose_name_plural = "Transitions de chantier"
+        indexes = [
+            #historique d'un chantier, du plus récent au plus ancien
+            models.Index(fields=['chantier', 'date_transition'], name='transition_chantier_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.chantier_id}: {self.ancien_status} -> {self.nouveau_status}"
+
+
+class DureeStatut(models.Model):
+    """Temps passé dans chaque statut, cumulé par type de travaux
+    Tenu à jour à chaque transition (chantier_app.transitions); seuls les passages
+    terminés et de début connu comptent (le statut actuel d'un chantier n'est pas encore mesuré).
+    Reconstruction complète: manage.py recompute_durees_statut
+    """
+    type_travaux = models.CharField(max_length=50, choices=Chantier.TYPE_TRAVAUX_CHOICES)
+    status_chantier = models.CharField(max_length=50, choices=Chantier.STATUS_CHANTIER_CHOICES)
+    #chantiers = chantiers distincts passés par ce statut; passages = séjours (un chantier suspendu puis repris en compte deux)
+    chantiers = models.PositiveIntegerField(default=0)
+    passages = models.PositiveIntegerField(default=0)
+    duree_totale = models.DurationField(default=timedelta)
+    date_mise_a_jour = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Durée par statut"
+        verbose_name_plural = "Durées par statut"
+        constraints = [
+            #une ligne par (type de travaux, statut); sert aussi d'index pour le radar du dashboard
+            models.UniqueConstraint(fields=['status_chantier', 'type_travaux'], name='duree_statut_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.type_travaux} / {self.status_chantier}"
+    
+    @property
+    def duree_moyenne(self):
+        """Durée moyenne par chantier (timedelta)"""
+        return self.duree_totale / self.chantiers if self.chantiers else None
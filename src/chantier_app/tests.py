@@ -1,3 +1,235 @@
+import datetime
+from decimal import Decimal
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+
+from client_app.models import Client
+from contrat_app.models import Contrat
+
+from . import transitions
+from .models import Chantier, DureeStatut, TransitionChantier
+
+
+class ChantierQuerySetTests(TestCase):
+
+    def setUp(self):
+        self.client_chantier = Client.objects.create(
+            type_client='particulier', nom='Nom', prenom='Test', telephone='1', adresse='a', ville='Ouaga', pays='BF',
+        )
+
+    def creer_chantier(self, reference, status='en_cours', fin=None, total=None, encaisse=None):
+        chantier = Chantier.objects.create(
+            client=self.client_chantier, reference=reference, nom_chantier='C', adresse_chantier='x',
+            type_travaux='decoration', type_batiment='autre', status_chantier=status, date_fin_prevue=fin,
+        )
+        if total is not None:
+            Contrat.objects.create(
+                chantier=chantier, reference_contrat=f'C-{reference}',
+                montant_total=Decimal(total), montant_encaisse=Decimal(encaisse),
+            )
+        return chantier
+
+    def test_etat_de_paiement(self):
+        self.creer_chantier('PAYE', total='1000', encaisse='1000')
+        self.creer_chantier('TROP', total='1000', encaisse='1200')
+        self.creer_chantier('PARTIEL', total='1000', encaisse='400')
+        self.creer_chantier('IMPAYE', total='1000', encaisse='0')
+        self.creer_chantier('SANS')
+
+        chantiers = {chantier.reference: chantier for chantier in Chantier.objects.with_payment_state()}
+        self.assertEqual(len(chantiers), 5)
+        self.assertEqual(
+            {reference: chantier.etat_paiement for reference, chantier in chantiers.items()},
+            {'PAYE': 'paye', 'TROP': 'paye', 'PARTIEL': 'partiel', 'IMPAYE': 'impaye', 'SANS': 'sans_contrat'},
+        )
+        #les méthodes de l'instance lisent les annotations
+        with self.assertNumQueries(0):
+            self.assertTrue(chantiers['PAYE'].est_payer_entierement())
+            self.assertFalse(chantiers['PARTIEL'].est_payer_entierement())
+            self.assertTrue(chantiers['PARTIEL'].est_payer_partiellement())
+            self.assertFalse(chantiers['SANS'].est_payer_partiellement())
+
+        references = lambda queryset: sorted(queryset.values_list('reference', flat=True))
+        self.assertEqual(references(Chantier.objects.payes()), ['PAYE', 'TROP'])
+        self.assertEqual(references(Chantier.objects.partiellement_payes()), ['PARTIEL'])
+        self.assertEqual(references(Chantier.objects.impayes()), ['IMPAYE', 'SANS'])
+
+    def test_annotations_d_accord_avec_le_calcul_en_python(self):
+        self.creer_chantier('PAYE', total='500', encaisse='500')
+        self.creer_chantier('PARTIEL', total='500', encaisse='1')
+        self.creer_chantier('SANS')
+
+        for chantier in Chantier.objects.with_payment_state():
+            frais = Chantier.objects.get(pk=chantier.pk)
+            self.assertEqual(chantier.paye_entierement, frais.est_payer_entierement())
+            self.assertEqual(chantier.paye_partiellement, frais.est_payer_partiellement())
+
+    def test_retard(self):
+        aujourdhui = datetime.date(2025, 6, 15)
+        self.creer_chantier('RETARD', fin=datetime.date(2025, 6, 14))
+        self.creer_chantier('ECHEANCE', fin=aujourdhui)
+        self.creer_chantier('TERMINE', status='termine', fin=datetime.date(2025, 1, 1))
+        self.creer_chantier('SANS_DATE')
+
+        annotes = {
+            chantier.reference: chantier.en_retard
+            for chantier in Chantier.objects.with_delay_state(aujourdhui)
+        }
+        self.assertEqual(annotes, {'RETARD': True, 'ECHEANCE': False, 'TERMINE': False, 'SANS_DATE': False})
+        self.assertEqual(list(Chantier.objects.en_retard(aujourdhui).values_list('reference', flat=True)), ['RETARD'])
+
+        #sans date explicite: aujourd'hui, comme la propriété est_en_retard
+        for chantier in Chantier.objects.with_delay_state():
+            self.assertEqual(chantier.en_retard, Chantier.objects.get(pk=chantier.pk).est_en_retard)
+
+
+class AppliquerEnMasseTests(TestCase):
+
+    def setUp(self):
+        self.client_chantier = Client.objects.create(
+            type_client='particulier', nom='Nom', prenom='Test', telephone='1', adresse='a', ville='Ouaga', pays='BF',
+        )
+        self.en_cours, self.suspendu, self.termine, self.annule = (
+            Chantier.objects.create(
+                client=self.client_chantier, reference=status, nom_chantier='C', adresse_chantier='x',
+                type_travaux='decoration', type_batiment='autre', status_chantier=status,
+            )
+            for status in ('en_cours', 'suspendu', 'termine', 'annule')
+        )
+        self.recepteur = mock.Mock()
+        transitions.statuts_modifies.connect(self.recepteur, weak=False, dispatch_uid='tests')
+        self.addCleanup(transitions.statuts_modifies.disconnect, dispatch_uid='tests')
+
+    def test_issue_par_chantier(self):
+        ids = [self.en_cours.pk, self.suspendu.pk, self.termine.pk, self.annule.pk, 999999]
+        with self.captureOnCommitCallbacks(execute=True):
+            resultats = transitions.appliquer_en_masse('terminer', [str(i) for i in ids] + [self.en_cours.pk])
+
+        self.assertEqual(resultats, {
+            self.en_cours.pk: transitions.Resultat('ok', 'en_cours'),
+            self.suspendu.pk: transitions.Resultat('ok', 'suspendu'),
+            self.termine.pk: transitions.Resultat('deja', 'termine'),
+            self.annule.pk: transitions.Resultat('interdit', 'annule'),
+            999999: transitions.Resultat('introuvable'),
+        })
+        self.en_cours.refresh_from_db()
+        self.assertEqual(self.en_cours.status_chantier, 'termine')
+        self.assertEqual(self.en_cours.date_fin_reelle, datetime.date.today())
+        self.assertEqual(
+            sorted(TransitionChantier.objects.values_list('chantier_id', 'ancien_status', 'nouveau_status')),
+            [(self.en_cours.pk, 'en_cours', 'termine'), (self.suspendu.pk, 'suspendu', 'termine')],
+        )
+
+    def test_transition_interdite_ne_modifie_rien(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            resultats = transitions.appliquer_en_masse('suspendre', [self.termine.pk, self.annule.pk])
+
+        self.assertEqual({resultat.issue for resultat in resultats.values()}, {'interdit'})
+        self.assertEqual(callbacks, [])
+        self.assertFalse(TransitionChantier.objects.exists())
+        self.recepteur.assert_not_called()
+
+    def test_transition_inconnue(self):
+        with self.assertRaises(KeyError):
+            transitions.appliquer_en_masse('demolir', [self.en_cours.pk])
+
+    def test_statut_modifie_entre_lecture_et_update(self):
+        lecture = Chantier.objects.select_for_update
+
+        def lecture_puis_modification_concurrente():
+            #un autre worker termine le chantier juste après la lecture des statuts
+            class Selection:
+                def filter(self, **filtres):
+                    def lire(*champs):
+                        lignes = list(lecture().filter(**filtres).values(*champs))
+                        Chantier.objects.filter(pk=autre.pk).update(status_chantier='termine')
+                        return lignes
+                    return mock.Mock(values=lire)
+            return Selection()
+
+        autre = self.en_cours
+        with mock.patch.object(Chantier.objects, 'select_for_update', lecture_puis_modification_concurrente):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with self.assertRaises(transitions.TransitionConcurrente):
+                    transitions.appliquer_en_masse('suspendre', [self.en_cours.pk, self.suspendu.pk])
+
+        #transaction annulée: aucun statut changé, aucun historique, aucun signal
+        self.en_cours.refresh_from_db()
+        self.assertEqual(self.en_cours.status_chantier, 'en_cours')
+        self.assertFalse(TransitionChantier.objects.exists())
+        self.assertEqual(callbacks, [])
+        self.recepteur.assert_not_called()
+
+    def test_signal_envoye_apres_le_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            transitions.appliquer_en_masse('suspendre', [self.en_cours.pk])
+            self.recepteur.assert_not_called()
+
+        self.recepteur.assert_not_called()
+        for callback in callbacks:
+            callback()
+        self.recepteur.assert_called_once()
+        kwargs = self.recepteur.call_args.kwargs
+        self.assertEqual((kwargs['ids'], kwargs['client_ids']), ([self.en_cours.pk], [self.client_chantier.pk]))
+        self.assertEqual(kwargs['transition'].nom, 'suspendre')
+        self.assertEqual(kwargs['anciennes'], {self.en_cours.pk: {'status_chantier': 'en_cours'}})
+
+
+class DureesStatutTests(TestCase):
+
+    def setUp(self):
+        client_chantier = Client.objects.create(
+            type_client='particulier', nom='Nom', prenom='Test', telephone='1', adresse='a', ville='Ouaga', pays='BF',
+        )
+        self.chantier = Chantier.objects.create(
+            client=client_chantier, reference='R', nom_chantier='C', adresse_chantier='x',
+            type_travaux='decoration', type_batiment='autre', status_chantier='en_cours',
+        )
+        self.t0 = timezone.now() - datetime.timedelta(days=30)
+        Chantier.objects.filter(pk=self.chantier.pk).update(date_creation=self.t0)
+
+    def appliquer_le(self, jour, nom_transition):
+        with mock.patch('chantier_app.transitions.timezone.now', return_value=self.t0 + datetime.timedelta(days=jour)):
+            self.assertEqual(transitions.appliquer(nom_transition, self.chantier.pk).issue, 'ok')
+
+    def durees(self):
+        return sorted(DureeStatut.objects.filter(type_travaux='decoration').values_list(
+            'status_chantier', 'chantiers', 'passages', 'duree_totale',
+        ))
+
+    def test_durees_cumulees_puis_recalculees(self):
+        self.appliquer_le(2, 'suspendre')
+        self.appliquer_le(3, 'commencer')
+        self.appliquer_le(7, 'suspendre')
+
+        attendu = [
+            ('en_cours', 1, 2, datetime.timedelta(days=6)),
+            ('suspendu', 1, 1, datetime.timedelta(days=1)),
+        ]
+        self.assertEqual(self.durees(), attendu)
+        #la reconstruction depuis l'historique retrouve les cumuls incrémentaux
+        self.assertEqual(transitions.recalculer_durees(), 2)
+        self.assertEqual(self.durees(), attendu)
+
+    def test_sejour_anterieur_a_l_historique_non_mesure(self):
+        #ligne posée par la migration 0005 pour un chantier existant
+        TransitionChantier.objects.create(
+            chantier=self.chantier, transition=transitions.REPRISE, ancien_status='en_cours',
+            nouveau_status='en_cours', date_transition=self.t0 + datetime.timedelta(days=20),
+        )
+        self.appliquer_le(21, 'suspendre')
+        self.appliquer_le(22, 'commencer')
+        self.appliquer_le(24, 'suspendre')
 
-# Create your tests here.
+        #le premier séjour en_cours (début inconnu) n'est compté ni en durée ni en chantier
+        premiere = TransitionChantier.objects.filter(transition='suspendre').order_by('date_transition').first()
+        self.assertIsNone(premiere.duree_ancien_status)
+        attendu = [
+            ('en_cours', 1, 1, datetime.timedelta(days=2)),
+            ('suspendu', 1, 1, datetime.timedelta(days=1)),
+        ]
+        self.assertEqual(self.durees(), attendu)
+        transitions.recalculer_durees()
+        self.assertEqual(self.durees(), attendu)
@@ -0,0 +1,221 @@
+"""MACHINE A ETATS DES CHANTIERS
+Les transitions autorisées sont déclarées une seule fois ici (TRANSITIONS) et
+utilisées par les vues de statut et par le changement de statut en masse.
+
+    resultats = appliquer_en_masse('terminer', [12, 13, 14], request.user)
+    -> {12: Resultat('ok', 'en_cours'), 13: Resultat('interdit', 'annule'), 14: Resultat('introuvable')}
+
+Une transition en masse = un seul UPDATE conditionnel
+    UPDATE chantier SET status_chantier = 'termine', ... WHERE id IN (...) AND status_chantier IN ('en_cours', 'suspendu')
+et une ligne TransitionChantier par chantier modifié (historique), avec le temps
+passé dans l'ancien statut. Ces durées sont cumulées par type de travaux dans
+DureeStatut (lu par le radar du dashboard).
+
+Les chantiers créés avant l'historique ont une ligne REPRISE (migration 0005): le début
+de leur statut d'alors est inconnu, ce séjour n'est pas mesuré (duree_ancien_status vide).
+"""
+from collections import namedtuple
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.dispatch import Signal
+from django.utils import timezone
+
+from sanba_finflow.cache import invalider_modele
+from .models import Chantier, DureeStatut, TransitionChantier
+
+
+#envoyé après le commit d'une transition (l'UPDATE ne déclenche pas post_save):
+#les caches, le snapshot KPI, les stats client et les alertes s'y abonnent
+statuts_modifies = Signal()  # kwargs: ids, client_ids, transition, anciennes ({id: valeurs d'avant des colonnes modifiées})
+
+
+@dataclass(frozen=True)
+class Transition:
+    nom: str
+    cible: str
+    depuis: tuple
+    libelle: str
+    #colonnes de dates remises à jour: nom -> 'aujourdhui' ou None
+    dates: tuple = ()
+
+    def valeurs(self, maintenant):
+        valeurs = {'status_chantier': self.cible, 'date_modification': maintenant}
+        for champ, valeur in self.dates:
+            valeurs[champ] = maintenant.date() if valeur == 'aujourdhui' else None
+        return valeurs
+
+
+TRANSITIONS = {
+    transition.nom: transition
+    for transition in (
+        Transition('planifier', 'planification', ('devis', 'en_cours', 'suspendu'),
+                   "Remettre en planification", dates=(('date_debut_reelle', None),)),
+        Transition('commencer', 'en_cours', ('devis', 'planification', 'suspendu'),
+                   "Démarrer", dates=(('date_debut_reelle', 'aujourdhui'),)),
+        Transition('suspendre', 'suspendu', ('en_cours',), "Suspendre"),
+        Transition('terminer', 'termine', ('en_cours', 'suspendu'),
+                   "Terminer", dates=(('date_fin_reelle', 'aujourdhui'),)),
+        Transition('annuler', 'annule', ('devis', 'planification', 'en_cours', 'suspendu'), "Annuler"),
+    )
+}
+
+
+#ligne d'historique posée par la migration pour les chantiers existants (début du suivi)
+REPRISE = 'reprise'
+
+#issue par chantier: 'ok', 'deja' (déjà dans le statut cible), 'interdit', 'introuvable'
+Resultat = namedtuple('Resultat', ['issue', 'ancien_status'], defaults=[None])
+
+
+class TransitionConcurrente(Exception):
+    """Un chantier a changé de statut entre la lecture et l'UPDATE; rien n'est appliqué"""
+
+
+def _apres_commit(ids, client_ids, transition, anciennes):
+    invalider_modele(Chantier)
+    statuts_modifies.send(sender=Chantier, ids=ids, client_ids=client_ids, transition=transition, anciennes=anciennes)
+
+
+def _debuts_de_sejour(etats, ids):
+    """Pour chaque chantier: (début du séjour dans son statut actuel, statuts déjà quittés avec une durée mesurée)
+    Début None si inconnu: seule la ligne REPRISE précède (chantier antérieur à l'historique)
+    Une requête groupée sur l'historique (index chantier, date_transition)
+    """
+    #(date, début inconnu) de la dernière ligne de chaque chantier; sans historique: sa création
+    derniers = {i: (etats[i]['date_creation'], False) for i in ids}
+    deja_quittes = set()
+    for ligne in (
+        TransitionChantier.objects.filter(chantier_id__in=ids)
+        .values('chantier_id', 'transition', 'ancien_status')
+        .annotate(derniere=Max('date_transition'), mesures=Count('duree_ancien_status')).order_by()
+    ):
+        #comme recalculer_durees: seuls les séjours mesurés comptent le chantier
+        if ligne['mesures']:
+            deja_quittes.add((ligne['chantier_id'], ligne['ancien_status']))
+        reprise = ligne['transition'] == REPRISE
+        derniers[ligne['chantier_id']] = max(derniers[ligne['chantier_id']], (ligne['derniere'], reprise))
+    debuts = {i: None if inconnu else date for i, (date, inconnu) in derniers.items()}
+    return debuts, deja_quittes
+
+
+def _cumuler_durees(transitions, deja_quittes):
+    """Ajoute les séjours qui viennent de se terminer aux cumuls DureeStatut
+    transitions: lignes TransitionChantier pas encore enregistrées, avec _type_travaux
+    (les séjours de durée inconnue sont ignorés)
+    """
+    cumuls = {}
+    for t in transitions:
+        if t.duree_ancien_status is None:
+            continue
+        cle = (t._type_travaux, t.ancien_status)
+        chantiers, passages, duree = cumuls.get(cle, (0, 0, timedelta()))
+        nouveau = (t.chantier_id, t.ancien_status) not in deja_quittes
+        cumuls[cle] = (chantiers + nouveau, passages + 1, duree + t.duree_ancien_status)
+
+    for (type_travaux, status), (chantiers, passages, duree) in cumuls.items():
+        #la ligne est verrouillée (PostgreSQL) ou la transaction écrit déjà (SQLite): pas de mise à jour perdue
+        ligne, _ = DureeStatut.objects.select_for_update().get_or_create(
+            type_travaux=type_travaux, status_chantier=status
+        )
+        ligne.chantiers += chantiers
+        ligne.passages += passages
+        ligne.duree_totale += duree
+        ligne.save(update_fields=['chantiers', 'passages', 'duree_totale', 'date_mise_a_jour'])
+
+
+def appliquer_en_masse(nom_transition, ids, auteur=None):
+    """Applique la transition aux chantiers `ids`; retourne {id: Resultat}
+    Lève KeyError si la transition n'existe pas, TransitionConcurrente si la
+    sélection a changé pendant l'opération (la transaction est alors annulée)
+    """
+    transition = TRANSITIONS[nom_transition]
+    ids = sorted({int(i) for i in ids})
+    maintenant = timezone.now()
+
+    with transaction.atomic():
+        #verrou des lignes (PostgreSQL) pour que l'ancien statut journalisé soit exact
+        etats = {
+            ligne['id']: ligne
+            for ligne in Chantier.objects.select_for_update().filter(pk__in=ids)
+            .values('id', 'status_chantier', 'client_id', 'type_travaux', 'date_creation',
+                    *(champ for champ, _ in transition.dates))
+        }
+        eligibles = [i for i in ids if i in etats and etats[i]['status_chantier'] in transition.depuis]
+
+        modifies = 0
+        if eligibles:
+            modifies = Chantier.objects.filter(
+                pk__in=eligibles, status_chantier__in=transition.depuis
+            ).update(**transition.valeurs(maintenant))
+        if modifies != len(eligibles):
+            #une ligne a changé entre la lecture et l'UPDATE (pas de verrou de ligne sur SQLite)
+            raise TransitionConcurrente("Des chantiers ont été modifiés entre-temps, réessayez")
+
+        if eligibles:
+            debuts, deja_quittes = _debuts_de_sejour(etats, eligibles)
+            transitions = []
+            for i in eligibles:
+                t = TransitionChantier(
+                    chantier_id=i, transition=transition.nom, ancien_status=etats[i]['status_chantier'],
+                    nouveau_status=transition.cible, auteur=auteur, date_transition=maintenant,
+                    duree_ancien_status=None if debuts[i] is None else max(maintenant - debuts[i], timedelta()),
+                )
+                t._type_travaux = etats[i]['type_travaux']
+                transitions.append(t)
+            TransitionChantier.objects.bulk_create(transitions)
+            _cumuler_durees(transitions, deja_quittes)
+
+            client_ids = sorted({etats[i]['client_id'] for i in eligibles})
+            #valeurs d'avant des colonnes que l'UPDATE a changées (delta du snapshot KPI)
+            anciennes = {
+                i: {'status_chantier': etats[i]['status_chantier'], **{champ: etats[i][champ] for champ, _ in transition.dates}}
+                for i in eligibles
+            }
+            transaction.on_commit(lambda: _apres_commit(eligibles, client_ids, transition, anciennes))
+
+    resultats = {}
+    for i in ids:
+        if i not in etats:
+            resultats[i] = Resultat('introuvable')
+            continue
+        ancien_status = etats[i]['status_chantier']
+        if i in eligibles:
+            resultats[i] = Resultat('ok', ancien_status)
+        elif ancien_status == transition.cible:
+            resultats[i] = Resultat('deja', ancien_status)
+        else:
+            resultats[i] = Resultat('interdit', ancien_status)
+    return resultats
+
+
+def appliquer(nom_transition, chantier_id, auteur=None):
+    """Transition d'un seul chantier (vues de statut); retourne son Resultat"""
+    return appliquer_en_masse(nom_transition, [chantier_id], auteur)[int(chantier_id)]
+
+
+#####__ RECONSTRUCTION DES DUREES __####
+
+def recalculer_durees():
+    """Reconstruit DureeStatut depuis l'historique (une requête d'agrégat)
+    Retourne le nombre de lignes (type de travaux, statut) écrites
+    """
+    lignes = [
+        DureeStatut(
+            type_travaux=ligne['chantier__type_travaux'], status_chantier=ligne['ancien_status'],
+            chantiers=ligne['chantiers'], passages=ligne['passages'], duree_totale=ligne['duree_totale'],
+        )
+        for ligne in TransitionChantier.objects.filter(duree_ancien_status__isnull=False)
+        .values('chantier__type_travaux', 'ancien_status')
+        .annotate(
+            chantiers=Count('chantier', distinct=True),
+            passages=Count('id'),
+            duree_totale=Sum('duree_ancien_status'),
+        ).order_by()
+    ]
+    with transaction.atomic():
+        DureeStatut.objects.all().delete()
+        DureeStatut.objects.bulk_create(lignes)
+    return len(lignes)
@@ -18,6 +18,7 @@ urlpatterns = [
     path('chantier/<int:chantier_id>/suspendre/',views.suspendre_chantier_view, name='suspendre-chantier'),
     path('chantier/<int:chantier_id>/planifier/', views.planifier_chantier_view, name='planifier-chantier'),
     path('chantier/<int:chantier_id>/annuler/', views.annuler_chantier_view, name='annuler-chantier'),
+    path('chantier/transition-en-masse/', views.transition_en_masse_view, name='transition-en-masse'),
     
     #URL pour ouvrir le modal pour le changement de status
     path('chantier/<int:chantier_id>/status-modal/',views.get_status_modal, name='status-modal'),
@@ -4,19 +4,28 @@ from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, CreateView , DetailView, UpdateView, DeleteView
 from django.contrib import messages
-from django.utils import timezone
 from chantier_app import models
-from django.db.models import Q, Sum, F
+from django.db.models import Q, Sum, F, Count
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 
-from chantier_app.models import Chantier
+from chantier_app.models import Chantier, PAYE_ENTIEREMENT, q_en_retard
+from chantier_app.transitions import TRANSITIONS, TransitionConcurrente, appliquer, appliquer_en_masse
+from sanba_finflow.pagination import KeysetPaginationMixin
+from recherche_app.index import rechercher
 from .forms import ChantierInfoForm, ChantierLocalisationForm, ChantierCaracteristiquesForm, ChantierPlanningForm, ChantierBudgetForm
 
+import logging
+
+logger = logging.getLogger(__name__)
+
 
 
 #Chantiers Views
     
-class ChantierListeView(LoginRequiredMixin, ListView):
+class ChantierListeView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """Récupère tous les liste de la base ,
         Les envoie au templates,
         Affiche le template
@@ -25,7 +34,8 @@ class ChantierListeView(LoginRequiredMixin, ListView):
     model = Chantier #le model utilsé
     template_name = "chantiers_templates/chantiers_liste.html"
     context_object_name = "chantiers" #comment on l'appel dans le templates
-    paginate_by = 20 # 20 clients par page 
+    paginate_by = 20 # 20 chantiers par page 
+    keyset_ordering = ('-date_creation', '-id') #pagination par curseur (pas d'OFFSET)
     
     def get_template_names(self):
         """retourne le template partial si requete HTMX"""
@@ -47,7 +57,8 @@ class ChantierListeView(LoginRequiredMixin, ListView):
         # ⚡ AVANT : 1 requête par chantier pour client + 1 par chef
         # ⚡ APRÈS : 1 seule requête avec JOIN pour TOUS les chantiers
            
-       ).prefetch_related('equipe_affectee')
+       ).prefetch_related('equipe_affectee').with_payment_state().with_delay_state()
+       # ⬅️ état de paiement (joint depuis Contrat) et retard calculés en SQL (ChantierQuerySet)
        # ⬅️ ManyToMany : Charge TOUTE l'équipe en 2 requêtes max
        # 1. Tous les chantiers
        # 2. Tous les équipes de ces chantiers
@@ -58,24 +69,20 @@ class ChantierListeView(LoginRequiredMixin, ListView):
        if status:
            if status == 'retard':
                #Cas spécial : chantiers "en_cours" + date dépassée
-               queryset = queryset.filter(
-                   status_chantier="en_cours",
-                   date_fin_prevue=timezone.now().date()
-                   
-               )
+               queryset = queryset.en_retard()
            else:
                queryset= queryset.filter(status_chantier=status)
         
        #########################__ # 2️⃣ FILTRE TYPE TRAVAUX __############################
        type_travaux = self.request.GET.get("type_travaux") 
        if type_travaux:
-           queryset = Chantier.objects.filter(type_travaux=type_travaux)
+           queryset = queryset.filter(type_travaux=type_travaux)
            
        ########################__ # 3️⃣ RECHERCHE TEXTE (nom chantier Ou client) __############################
        search_query =  self.request.GET.get('q') #q pour query standars
        if search_query:
-           #Q()= OR condition (cherche dans plusieurs champs)
-           queryset = queryset.filter(
+           #index plein texte (recherche_app); Q()= OR condition utilisé seulement hors SQLite
+           queryset = rechercher(queryset, search_query,
                Q(nom_chantier__icontains=search_query)|
                Q(client__nom__icontains=search_query)|
                Q(client__prenom__icontains=search_query)|
@@ -90,32 +97,21 @@ class ChantierListeView(LoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs) #Récupère le contexte de base
         
         #STATS pour affichage(en-tete, badges)
-        context['total_chantiers'] = self.get_queryset().count()
-        #compte tous les chantiers filtres
-        context['chantiers_en_cours'] = self.get_queryset().filter(
-            status_chantier="en_cours"
-        ).count()
-        
-        context['chantiers_termines'] = self.get_queryset().filter(
-            status_chantier="termine"
-        ).count()
-        
-        context['chantiers_en_retard']=self.get_queryset().filter(
-            status_chantier='en_cours',
-            date_fin_prevue__lt=timezone.now().date()
-        ).count()
-        #compte slmt ceux en retard
+        #UNE seule requête d'agrégats conditionnels sur la liste filtrée
+        context.update(self.object_list.order_by().aggregate(
+            total_chantiers=Count('id'), #compte tous les chantiers filtres
+            chantiers_en_cours=Count('id', filter=Q(status_chantier="en_cours")),
+            chantiers_termines=Count('id', filter=Q(status_chantier="termine")),
+            chantiers_en_retard=Count('id', filter=q_en_retard()), #compte slmt ceux en retard
+            chantiers_payes=Count('id', filter=PAYE_ENTIEREMENT),
+        ))
         
         #OPTIONS pour les selects html
         context['STATUS_CHANTIER_CHOICES']=Chantier.STATUS_CHANTIER_CHOICES
+        context['TRANSITIONS']=TRANSITIONS.values() #changement de statut en masse
         #EX: [('en_cours', 'En cours'), ('termine', 'Terminé')...]
         
         context['TYPE_TRAVAUX_CHOICES']=Chantier.TYPE_TRAVAUX_CHOICES
-        
-        #logique python pour filtrer nombre de chantier payé
-        chantiers = self.get_queryset()
-        chantier_paye = [c for c in chantiers if c.est_payer_entierement()]
-        context['chantiers_payes'] = len(chantier_paye)
      
         return context # Retourne tout au template
           
@@ -145,16 +141,13 @@ class ChantierCreateView(LoginRequiredMixin, SessionWizardView):
         
         #DEBUG pour equipe affectee
         for form in form_list:
-            print(f" 🔍 Form {form.__class__.__name__} à equipe_affectee: {'equipe_affectee'in form.cleaned_data}")
+            logger.debug(" 🔍 Form %s à equipe_affectee: %s", form.__class__.__name__, 'equipe_affectee' in form.cleaned_data)
             
             if 'equipe_affectee' in form.cleaned_data:
                 equipe_data = form.cleaned_data["equipe_affectee"]
-                print(f" 🎯 Equipe trouvée : {equipe_data}")
-                print(f" 🎯 Type: {type(equipe_data)}")
-                if equipe_data:
-                    print(f"🎯 nombre de membres : {len(equipe_data)}")
-                    for membre in equipe_data:
-                        print(f"👤{membre.username}")
+                logger.debug(" 🎯 Equipe trouvée : %s (type: %s)", equipe_data, type(equipe_data))
+                if equipe_data and logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("🎯 membres (%s): %s", len(equipe_data), [membre.username for membre in equipe_data])
         
         for form in form_list:
             for field, value in form.cleaned_data.items():
@@ -174,7 +167,7 @@ class ChantierCreateView(LoginRequiredMixin, SessionWizardView):
         # 🎯 Étape 4 : Maintenant on peut gérer l'équipe (ManyToMany)
         if equipe_data:
             chantier.equipe_affectee.set(equipe_data)  # ← ✅ CORRECT !
-            print(chantier.equipe_affectee.all())
+            logger.debug("Equipe affectée: %s", chantier.equipe_affectee.all())
         # 🎯 Message de succès
         messages.success(self.request, f"Chantier {chantier.nom_chantier} créé avec succès !")
         
@@ -191,11 +184,15 @@ class ChantierDetailView(LoginRequiredMixin, DetailView):
     template_name = "chantiers_templates/details_chantier.html"
     context_object_name = 'chantier'
     
+    def get_queryset(self):
+        #badges retard / paiement calculés dans la requête du chantier
+        return Chantier.objects.with_payment_state().with_delay_state()
+    
     def get_context_data(self, **kwargs):
         """On peut ajouter des données supplémentaires au template"""
         #Récupère le contexte de base (le chantier)
         context = super().get_context_data(**kwargs)
-        chantier = self.get_object() #le chantier actuel
+        chantier = self.object #le chantier actuel (déjà chargé par get_object)
         #Ajoute des données supplémentaires
         context['total_depenses'] = chantier.depenses.aggregate(
             total = Sum(F('prix_unitaire') * F('quantité'))
@@ -333,159 +330,137 @@ class ChantierDeleteView(LoginRequiredMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
     
 
-from django.contrib.auth.decorators import login_required
-from django.contrib import messages
-from django.shortcuts import redirect, get_object_or_404
-from django.utils import timezone
-
-
-@login_required
-def planifier_chantier_view(request, chantier_id):
-    """Remet un chantier en planification (change son status à 'planification')"""
+def _changer_statut(request, chantier_id, nom_transition, verbe, niveau, message_ok):
+    """Applique une transition à un chantier (voir chantier_app.transitions) et revient au détail
+    L'historique (TransitionChantier) est écrit par la transition elle-même
+    """
     try:
         chantier = get_object_or_404(Chantier, pk=chantier_id)
-    
-        # Vérifier si le chantier peut être replanifié
-        if chantier.status_chantier == 'annule':
-            messages.error(request, f"❌ Impossible de replanifier le chantier '{chantier.nom_chantier}' car il est annulé.")
-        elif chantier.status_chantier == 'termine':
-            messages.error(request, f"❌ Impossible de replanifier le chantier '{chantier.nom_chantier}' car il est déjà terminé.")
-        elif chantier.status_chantier == 'planification':
-            messages.info(request, f"ℹ️ Le chantier '{chantier.nom_chantier}' est déjà en planification.")
+        resultat = appliquer(nom_transition, chantier.id, request.user)
+        cible = TRANSITIONS[nom_transition].cible
+        
+        if resultat.issue == 'ok':
+            messages.add_message(request, niveau, message_ok.format(nom=chantier.nom_chantier, ancien=resultat.ancien_status))
+        elif resultat.issue == 'deja':
+            statut = dict(Chantier.STATUS_CHANTIER_CHOICES)[cible].lower()
+            messages.info(request, f"ℹ️ Le chantier '{chantier.nom_chantier}' est déjà {statut}.")
+        elif resultat.issue == 'interdit':
+            statut = dict(Chantier.STATUS_CHANTIER_CHOICES)[resultat.ancien_status].lower()
+            messages.error(request, f"❌ Impossible de {verbe} le chantier '{chantier.nom_chantier}' (statut actuel: {statut}).")
         else:
-            # Remettre en planification
-            chantier.status_chantier = "planification"
-            chantier.date_debut_reelle = None  # Réinitialiser la date de début
-            chantier.date_modification = timezone.now()
-            chantier.save()
-            
-            messages.info(request, f"📋 Le chantier '{chantier.nom_chantier}' a été remis en planification.")
+            #supprimé entre le chargement et la transition
+            messages.error(request, f"❌ Le chantier '{chantier.nom_chantier}' n'existe plus.")
+            return redirect("chantier_app:liste-chantier")
         
         return redirect("chantier_app:detail-chantier", pk=chantier.id)
         
     except Exception as e:
-        messages.error(request, f"❌ Erreur lors de la replanification du chantier: {str(e)}")
+        messages.error(request, f"❌ Erreur lors du changement de statut du chantier: {str(e)}")
         return redirect("chantier_app:liste-chantier")
-    
+
+
+@login_required
+def planifier_chantier_view(request, chantier_id):
+    """Remet un chantier en planification (change son status à 'planification')"""
+    return _changer_statut(request, chantier_id, 'planifier', "replanifier", messages.INFO,
+                           "📋 Le chantier '{nom}' a été remis en planification.")
 
 
 @login_required
 def commencer_chantier_view(request, chantier_id):
     """Démarre un chantier (change son status à 'en_cours')"""
-    try:
-        chantier = get_object_or_404(Chantier, pk=chantier_id)
-        
-        # Vérifier si le chantier peut être démarré
-        if chantier.status_chantier == 'termine':
-            messages.error(request, f"❌ Impossible de démarrer le chantier '{chantier.nom_chantier}' car il est déjà terminé.")
-        elif chantier.status_chantier == 'annule':
-            messages.error(request, f"❌ Impossible de démarrer le chantier '{chantier.nom_chantier}' car il est annulé.")
-        elif chantier.status_chantier == 'en_cours':
-            messages.info(request, f"ℹ️ Le chantier '{chantier.nom_chantier}' est déjà en cours.")
-        else:
-            # Démarrer le chantier
-            chantier.status_chantier = "en_cours"
-            chantier.date_debut_reelle = timezone.now().date()
-            chantier.date_modification = timezone.now()
-            chantier.save()
-            
-            messages.success(request, f"✅ Le chantier '{chantier.nom_chantier}' a été démarré avec succès!")
-        
-        # Rediriger vers le détail du chantier avec le paramètre
-        return redirect("chantier_app:detail-chantier", pk=chantier.id)
-        
-    except Exception as e:
-        messages.error(request, f"❌ Erreur lors du démarrage du chantier: {str(e)}")
-        return redirect("chantier_app:liste-chantier")
+    return _changer_statut(request, chantier_id, 'commencer', "démarrer", messages.SUCCESS,
+                           "✅ Le chantier '{nom}' a été démarré avec succès!")
     
     
 @login_required
 def terminer_chantier_view(request, chantier_id):
     """Termine un chantier (change son status à 'termine')"""
-    try:
-        chantier = get_object_or_404(Chantier, pk=chantier_id)
-        
-        # Vérifier si le chantier peut être terminé
-        if chantier.status_chantier == 'annule':
-            messages.error(request, f"❌ Impossible de terminer le chantier '{chantier.nom_chantier}' car il est annulé.")
-        elif chantier.status_chantier == 'termine':
-            messages.info(request, f"ℹ️ Le chantier '{chantier.nom_chantier}' est déjà terminé.")
-        elif chantier.status_chantier not in ['en_cours', 'suspendu']:
-            messages.error(request, f"❌ Le chantier '{chantier.nom_chantier}' doit être en cours ou suspendu pour être terminé.")
-        else:
-            # Terminer le chantier
-            chantier.status_chantier = "termine"
-            chantier.date_fin_reelle = timezone.now().date()
-            chantier.date_modification = timezone.now()
-            chantier.save()
-            
-            messages.success(request, f"✅ Le chantier '{chantier.nom_chantier}' a été terminé avec succès!")
-        
-        return redirect("chantier_app:detail-chantier", pk=chantier.id)
-        
-    except Exception as e:
-        messages.error(request, f"❌ Erreur lors de la terminaison du chantier: {str(e)}")
-        return redirect("chantier_app:liste-chantier")
+    return _changer_statut(request, chantier_id, 'terminer', "terminer", messages.SUCCESS,
+                           "✅ Le chantier '{nom}' a été terminé avec succès!")
 
 
 @login_required
 def suspendre_chantier_view(request, chantier_id):
     """Suspend un chantier (change son status à 'suspendu')"""
-    try:
-        chantier = get_object_or_404(Chantier, pk=chantier_id)
-        
-        # Vérifier si le chantier peut être suspendu
-        if chantier.status_chantier == 'annule':
-            messages.error(request, f"❌ Impossible de suspendre le chantier '{chantier.nom_chantier}' car il est annulé.")
-        elif chantier.status_chantier == 'termine':
-            messages.error(request, f"❌ Impossible de suspendre le chantier '{chantier.nom_chantier}' car il est déjà terminé.")
-        elif chantier.status_chantier == 'suspendu':
-            messages.info(request, f"ℹ️ Le chantier '{chantier.nom_chantier}' est déjà suspendu.")
-        elif chantier.status_chantier != 'en_cours':
-            messages.error(request, f"❌ Le chantier '{chantier.nom_chantier}' doit être en cours pour être suspendu.")
-        else:
-            # Suspendre le chantier
-            chantier.status_chantier = "suspendu"
-            chantier.date_modification = timezone.now()
-            chantier.save()
-            
-            messages.warning(request, f"⚠️ Le chantier '{chantier.nom_chantier}' a été suspendu.")
-        
-        return redirect("chantier_app:detail-chantier", pk=chantier.id)
-        
-    except Exception as e:
-        messages.error(request, f"❌ Erreur lors de la suspension du chantier: {str(e)}")
-        return redirect("chantier_app:liste-chantier")
+    return _changer_statut(request, chantier_id, 'suspendre', "suspendre", messages.WARNING,
+                           "⚠️ Le chantier '{nom}' a été suspendu.")
     
 
 @login_required
 def annuler_chantier_view(request, chantier_id):
     """Annule un chantier (change son status à 'annule')"""
-    try:
-        chantier = get_object_or_404(Chantier, pk=chantier_id)
-        
-        # Vérifier si le chantier peut être annulé
-        if chantier.status_chantier == 'annule':
-            messages.info(request, f"ℹ️ Le chantier '{chantier.nom_chantier}' est déjà annulé.")
-        elif chantier.status_chantier == 'termine':
-            messages.error(request, f"❌ Impossible d'annuler le chantier '{chantier.nom_chantier}' car il est déjà terminé.")
-        else:
-            # Annuler le chantier
-            ancien_status = chantier.status_chantier
-            chantier.status_chantier = "annule"
-            chantier.date_modification = timezone.now()
-            chantier.save()
-            
-            messages.error(request, f"❌ Le chantier '{chantier.nom_chantier}' a été annulé (ancien statut: {ancien_status}).")
-        
-        return redirect("chantier_app:detail-chantier", pk=chantier.id)
-        
-    except Exception as e:
-        messages.error(request, f"❌ Erreur lors de l'annulation du chantier: {str(e)}")
-        return redirect("chantier_app:liste-chantier")
+    return _changer_statut(request, chantier_id, 'annuler', "annuler", messages.ERROR,
+                           "❌ Le chantier '{nom}' a été annulé (ancien statut: {ancien}).")
     
 
 def get_status_modal(request, chantier_id):
     """Vue pour charger le modal de changement de statut"""
     chantier = get_object_or_404(Chantier, id=chantier_id)
-    return render(request, 'modal/status_chantier.html', {'chantier': chantier})
\ No newline at end of file
+    return render(request, 'modal/status_chantier.html', {'chantier': chantier})
+
+
+#####__ CHANGEMENT DE STATUT EN MASSE __####
+
+#issue -> (niveau du message, libellé)
+LIBELLES_ISSUE = {
+    'ok': (messages.SUCCESS, "modifié(s)"),
+    'deja': (messages.INFO, "déjà dans ce statut"),
+    'interdit': (messages.ERROR, "refusé(s): transition impossible depuis leur statut"),
+    'introuvable': (messages.ERROR, "introuvable(s)"),
+}
+
+
+@login_required
+@require_POST
+def transition_en_masse_view(request):
+    """Applique une transition (POST transition=terminer, ids=1&ids=2...) aux chantiers cochés
+    Répond en JSON (Accept: application/json) avec l'issue par chantier, sinon
+    ajoute un message par issue et revient à la liste
+    """
+    nom_transition = request.POST.get('transition')
+    try:
+        ids = [int(i) for i in request.POST.getlist('ids')]
+    except ValueError:
+        ids = None
+    veut_json = 'application/json' in request.headers.get('Accept', '')
+
+    erreur, statut_http = None, 400
+    if nom_transition not in TRANSITIONS:
+        erreur = "Transition inconnue"
+    elif not ids:
+        erreur = "Aucun chantier sélectionné"
+    else:
+        try:
+            resultats = appliquer_en_masse(nom_transition, ids, request.user)
+        except TransitionConcurrente as e:
+            erreur, statut_http = str(e), 409
+
+    if veut_json:
+        if erreur:
+            return JsonResponse({'erreur': erreur}, status=statut_http)
+        return JsonResponse({
+            'transition': nom_transition,
+            'resultats': {
+                str(chantier_id): {'issue': r.issue, 'ancien_status': r.ancien_status}
+                for chantier_id, r in resultats.items()
+            },
+        })
+
+    if erreur:
+        messages.error(request, f"❌ {erreur}")
+    else:
+        transition = TRANSITIONS[nom_transition]
+        par_issue = {}
+        for r in resultats.values():
+            par_issue[r.issue] = par_issue.get(r.issue, 0) + 1
+        for issue, nombre in par_issue.items():
+            niveau, libelle = LIBELLES_ISSUE[issue]
+            messages.add_message(request, niveau, f"{transition.libelle}: {nombre} chantier(s) {libelle}")
+
+    url_liste = reverse("chantier_app:liste-chantier")
+    if request.headers.get('HX-Request'):
+        reponse = HttpResponse(status=204)
+        reponse['HX-Redirect'] = url_liste
+        return reponse
+    return redirect(url_liste)
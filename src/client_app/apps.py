@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ClientAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'client_app'
+    
+    def ready(self):
+        #stats dénormalisées des clients tenues à jour par les contrats et chantiers
+        from . import signals  # noqa: F401
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from client_app.models import Client
+from client_app.stats import recalculer_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les stats dénormalisées des clients (nombre de contrats, CA, "
+        "chantiers actifs, dernier contrat) à partir des contrats et chantiers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--client", type=int, action="append", dest="clients", help="Id d'un client (répétable); tous par défaut")
+        parser.add_argument("--taille-lot", type=int, default=500, help="Clients lus et écrits par lot (défaut 500)")
+
+    def handle(self, *args, **options):
+        total = Client.objects.filter(pk__in=options["clients"]).count() if options["clients"] else Client.objects.count()
+        modifies = recalculer_stats(options["clients"], taille_lot=options["taille_lot"])
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} client(s) vérifié(s), {modifies} mis à jour"))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def remplir_anniversaires(apps, schema_editor):
+    Client = apps.get_model('client_app', 'Client')
+    clients = list(Client.objects.filter(date_de_naissance__isnull=False).only('id', 'date_de_naissance'))
+    for client in clients:
+        client.anniversaire_mmdd = client.date_de_naissance.strftime("%m%d")
+    Client.objects.bulk_update(clients, ['anniversaire_mmdd'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_app', '0002_client_client_contact_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='anniversaire_mmdd',
+            field=models.CharField(blank=True, editable=False, max_length=4, null=True),
+        ),
+        migrations.RunPython(remplir_anniversaires, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['anniversaire_mmdd'], name='client_anniversaire_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:37
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def remplir_stats(apps, schema_editor):
+    """Premier calcul des stats: deux GROUP BY, puis bulk_update"""
+    Client = apps.get_model('client_app', 'Client')
+    Contrat = apps.get_model('contrat_app', 'Contrat')
+    Chantier = apps.get_model('chantier_app', 'Chantier')
+    contrats = {
+        ligne['chantier__client']: ligne
+        for ligne in Contrat.objects.values('chantier__client').annotate(
+            nombre=Count('id'), ca=Sum('montant_total'), dernier=Max('date_signature'))
+    }
+    actifs = dict(
+        Chantier.objects.filter(status_chantier='en_cours').values('client').annotate(
+            nombre=Count('id')).values_list('client', 'nombre')
+    )
+    clients = list(Client.objects.filter(pk__in=set(contrats) | set(actifs)))
+    for client in clients:
+        ligne = contrats.get(client.pk, {})
+        client.total_contrats = ligne.get('nombre') or 0
+        client.chiffre_affaires_total = ligne.get('ca') or 0
+        client.date_dernier_contrat = ligne.get('dernier')
+        client.chantiers_actifs = actifs.get(client.pk, 0)
+    Client.objects.bulk_update(
+        clients, ['total_contrats', 'chiffre_affaires_total', 'date_dernier_contrat', 'chantiers_actifs'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client_app', '0003_client_anniversaire_mmdd'),
+        ('chantier_app', '0003_chantier_chantier_statut_fin_idx_and_more'),
+        ('contrat_app', '0002_contrat_contrat_signature_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='chantiers_actifs',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='date_dernier_contrat',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='total_contrats',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='client',
+            name='chiffre_affaires_total',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(remplir_stats, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,122 @@
+import calendar
+import logging
+from datetime import date, timedelta
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Case, CharField, Count, DecimalField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Concat, ExtractDay, ExtractMonth, LPad
 from django.utils import timezone
+from chantier_app.models import Chantier
 from contrat_app.models import Contrat
 from auth_app.models import Personnel
 
+
+logger = logging.getLogger(__name__)
+
+
+def mmdd(jour):
+    """date -> 'MMJJ' (ex: 0315 pour le 15 mars), comparable comme une chaîne"""
+    return jour.strftime("%m%d")
+
+
+def prochain_anniversaire(naissance, aujourdhui):
+    """Date du prochain anniversaire (aujourd'hui compris); 29 février -> 28 les années non bissextiles"""
+    for annee in (aujourdhui.year, aujourdhui.year + 1):
+        try:
+            jour = naissance.replace(year=annee)
+        except ValueError:
+            jour = date(annee, 2, 28)
+        if jour >= aujourdhui:
+            return jour
+
+
+#colonne de stats -> annotation de with_stats() qui la recalcule
+STATS = {
+    'total_contrats': 'stats_total_contrats',
+    'chiffre_affaires_total': 'stats_chiffre_affaires',
+    'chantiers_actifs': 'stats_chantiers_actifs',
+    'date_dernier_contrat': 'stats_dernier_contrat',
+}
+
+SEUIL_CLIENT_PREMIUM = 1000000  # Plus d'1 million
+
+
+def _par_client(queryset, champ_client, expression):
+    """Sous-requête corrélée: agrégat de queryset pour le client de la ligne courante
+    (pas de jointure chantiers/contrats qui multiplierait les lignes clients)"""
+    return Subquery(
+        queryset.filter(**{champ_client: OuterRef('pk')}).order_by().values(champ_client).annotate(
+            valeur=expression
+        ).values('valeur')[:1]
+    )
+
+
+class ClientQuerySet(models.QuerySet):
+    
+    def update(self, **kwargs):
+        #update() ne passe pas par save(): anniversaire_mmdd suit date_de_naissance ici aussi
+        if 'date_de_naissance' in kwargs and 'anniversaire_mmdd' not in kwargs:
+            naissance = kwargs['date_de_naissance']
+            if hasattr(naissance, 'resolve_expression'):
+                #F('...') etc.: 'MMJJ' calculé par la base
+                kwargs['anniversaire_mmdd'] = Concat(
+                    LPad(Cast(ExtractMonth(naissance), CharField()), 2, Value('0')),
+                    LPad(Cast(ExtractDay(naissance), CharField()), 2, Value('0')),
+                    output_field=CharField(),
+                )
+            else:
+                naissance = self.model._meta.get_field('date_de_naissance').to_python(naissance)
+                kwargs['anniversaire_mmdd'] = mmdd(naissance) if naissance else None
+        return super().update(**kwargs)
+    
+    def with_stats(self):
+        """Stats recalculées en SQL à la lecture, dans la même requête que les clients:
+        stats_total_contrats, stats_chiffre_affaires, stats_chantiers_actifs, stats_dernier_contrat
+        (utilisé par le recalcul, et par les écrans qui ne veulent pas des colonnes dénormalisées)
+        """
+        contrats = Contrat.objects.all()
+        chantiers_en_cours = Chantier.objects.filter(status_chantier='en_cours')
+        return self.annotate(
+            stats_total_contrats=Coalesce(_par_client(contrats, 'chantier__client', Count('id')), 0),
+            stats_chiffre_affaires=Coalesce(
+                _par_client(contrats, 'chantier__client', Sum('montant_total')),
+                Value(Decimal('0')), output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+            stats_chantiers_actifs=Coalesce(_par_client(chantiers_en_cours, 'client', Count('id')), 0),
+            stats_dernier_contrat=_par_client(contrats, 'chantier__client', Max('date_signature')),
+        )
+    
+    def anniversaires_entre(self, debut, fin):
+        """Clients dont l'anniversaire tombe entre debut et fin (dates incluses)
+        Une seule requête de plage sur l'index client_anniversaire_idx; si la période
+        passe le 31 décembre, elle est coupée en deux plages (debut..1231 OU 0101..fin)
+        """
+        if fin < debut:
+            return self.none()
+        if (fin - debut).days >= 365:
+            return self.filter(anniversaire_mmdd__isnull=False)
+        
+        debut_mmdd, fin_mmdd = mmdd(debut), mmdd(fin)
+        #né un 29 février: fêté le 28 les années non bissextiles
+        if fin.month == 2 and fin.day == 28 and not calendar.isleap(fin.year):
+            fin_mmdd = "0229"
+        
+        if debut_mmdd <= fin_mmdd:
+            return self.filter(anniversaire_mmdd__gte=debut_mmdd, anniversaire_mmdd__lte=fin_mmdd)
+        return self.filter(Q(anniversaire_mmdd__gte=debut_mmdd) | Q(anniversaire_mmdd__lte=fin_mmdd))
+    
+    def anniversaires_a_venir(self, jours=0, aujourdhui=None):
+        """Anniversaires d'aujourd'hui à aujourd'hui + jours, dans l'ordre du calendrier
+        (ceux de janvier après ceux de décembre quand la période passe la fin d'année)
+        """
+        aujourdhui = aujourdhui or timezone.localdate()
+        debut_mmdd = mmdd(aujourdhui)
+        return self.anniversaires_entre(aujourdhui, aujourdhui + timedelta(days=jours)).annotate(
+            annee_suivante=Case(When(anniversaire_mmdd__lt=debut_mmdd, then=Value(1)), default=Value(0))
+        ).order_by('annee_suivante', 'anniversaire_mmdd', 'id')
+
+
 class Client(models.Model):
     """
     toutes les informations relatives aux clients
@@ -53,6 +167,8 @@ class Client(models.Model):
     quartier = models.CharField(max_length=100, null=True, blank=True)
     pays = models.CharField(max_length=100)
     date_de_naissance = models.DateField(null=True, blank=True)
+    #'MMJJ' de date_de_naissance, recopié par save() et update() (indexé, voir anniversaires_entre)
+    anniversaire_mmdd = models.CharField(max_length=4, null=True, blank=True, editable=False)
     
     
     
@@ -82,17 +198,40 @@ class Client(models.Model):
     #est fidel = un client qui revient souvent
     est_fidel = models.BooleanField(default=False)
     
-    #STATS AUTOMATIQUES
-    #total_contrats = nombre total de contrats signés avec ce client
-    total_contrats = models.IntegerField(default=0)
+    #STATS AUTOMATIQUES (tenues à jour par client_app.signals, recalcul: recompute_client_stats)
+    #total_contrats = nombre total de contrats (tous les chantiers du client)
+    total_contrats = models.IntegerField(default=0, editable=False)
     
     #chiffre_affaires = montant total facturé à ce client
-    chiffre_affaires_total = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    chiffre_affaires_total = models.DecimalField(max_digits=12, decimal_places=2, default=0.00, editable=False)
+    
+    #chantiers_actifs = chantiers en cours
+    chantiers_actifs = models.IntegerField(default=0, editable=False)
+    
+    #date de signature du dernier contrat
+    date_dernier_contrat = models.DateField(null=True, blank=True, editable=False)
+    
+    objects = ClientQuerySet.as_manager()
     
     class Meta:
         """configuration spécial pour django"""
         verbose_name = "Client"
         verbose_name_plural = "Clients"
+        indexes = [
+            #nouveaux clients du mois + liste paginée par curseur (-date_premier_contact, -id)
+            models.Index(fields=['date_premier_contact', 'id'], name='client_contact_idx'),
+            #anniversaires du jour / à venir: plage sur 'MMJJ' au lieu de __month/__day
+            models.Index(fields=['anniversaire_mmdd'], name='client_anniversaire_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        #save(update_fields=[..., 'date_de_naissance']) doit aussi écrire anniversaire_mmdd
+        #(les update() en masse passent par ClientQuerySet.update)
+        self.anniversaire_mmdd = mmdd(self.date_de_naissance) if self.date_de_naissance else None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'date_de_naissance' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'anniversaire_mmdd'}
+        super().save(*args, **kwargs)
     
     def __str__(self):
         if self.type_client == 'entreprise':
@@ -111,60 +250,20 @@ class Client(models.Model):
             return Contrat.objects.filter(chantier__client=self).select_related('chantier')
         except Exception as e:
             # En cas d'erreur (table inexistante, etc.)
-            print(f"Erreur dans contrats_signes: {e}")
+            logger.error("Erreur dans contrats_signes: %s", e)
             return Contrat.objects.none()  # Retourne vide
 
-    @property
-    def total_contrats(self):
-        """Nombre total de contrats signés"""
-        try:
-            count = self.contrats_signes.count()
-            return count if count is not None else 0
-        except Exception:
-            return 0  # Retourne 0 en cas d'erreur
-
+    #total_contrats, chiffre_affaires_total, chantiers_actifs et date_dernier_contrat
+    #sont des colonnes (voir client_app.stats): les propriétés ci-dessous ne font plus de requête
+    
     @property
     def chiffre_daff_total(self):
         """CA total généré par ce client"""
-        from django.db.models import Sum
-        
-        if self.total_contrats == 0:
-            return 0  # Si pas de contrats, CA = 0
-        
-        try:
-            # Aggregate peut retourner None si pas de données
-            result = self.contrats_signes.aggregate(
-                total=Sum('montant_total')
-            )
-            
-            # Vérifie que 'total' existe et n'est pas None
-            total = result.get('total')
-            
-            # Retourne 0 si total est None ou 0
-            return float(total) if total is not None else 0.0
-            
-        except Exception as e:
-            # Log l'erreur en développement
-            import sys
-            print(f"Erreur dans chiffre_daffaire_total: {e}", file=sys.stderr)
-            return 0.0
-
+        return self.chiffre_affaires_total
+    
     @property
-    def chantiers_actifs(self):
-        """Nombre de chantiers actifs"""
-        # Vérifie que le client existe
-        if not self.pk:
-            return 0
-        
-        try:
-            # Vérifie si le modèle Chantier existe et a le champ status
-            count = self.chantiers.filter(status='en_cours').count()
-            return count if count is not None else 0
-        except Exception as e:
-            # Gère le cas où 'chantiers' n'existe pas
-            # ou où 'status' n'est pas un champ valide
-            print(f"Erreur dans chantiers_actifs: {e}")
-            return 0
+    def chiffre_daffaire_total(self):
+        return self.chiffre_affaires_total
 
     @property
     def a_des_contrats(self):
@@ -185,22 +284,13 @@ class Client(models.Model):
     def contrat_moyen(self):
         """Montant moyen par contrat"""
         if self.total_contrats > 0:
-            try:
-                return self.chiffre_daffaire_total / self.total_contrats
-            except (ZeroDivisionError, TypeError):
-                return 0
+            return self.chiffre_affaires_total / self.total_contrats
         return 0
 
     @property
     def dernier_contrat(self):
         """Date du dernier contrat signé"""
-        if self.total_contrats > 0:
-            try:
-                dernier = self.contrats_signes.order_by('-date_signature').first()
-                return dernier.date_signature if dernier else None
-            except Exception:
-                return None
-        return None
+        return self.date_dernier_contrat
 
     @property
     def statut_client(self):
@@ -212,7 +302,7 @@ class Client(models.Model):
             return "Prospect"
         elif self.total_contrats == 1:
             return "Premier contrat"
-        elif self.chiffre_daffaire_total > 1000000:  # Plus d'1 million
+        elif self.chiffre_affaires_total > SEUIL_CLIENT_PREMIUM:
             return "Client premium"
         elif self.chantiers_actifs > 0:
             return "Client actif"
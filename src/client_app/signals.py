@@ -0,0 +1,102 @@
+"""MISE A JOUR DES STATS CLIENT
+Un save/delete de Contrat ou de Chantier recalcule les stats du client concerné
+après le commit (une seule fois par client et par transaction, voir client_app.stats).
+"""
+import logging
+import threading
+
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from chantier_app.models import Chantier
+from chantier_app.transitions import statuts_modifies
+from contrat_app.models import Contrat
+from .stats import recalculer_stats
+
+
+logger = logging.getLogger(__name__)
+
+
+def _recalculer(client_ids):
+    try:
+        recalculer_stats(client_ids)
+    except Exception as e:
+        #les stats seront corrigées par recompute_client_stats; la requête ne doit pas échouer
+        logger.error(f"Erreur recalcul stats clients {client_ids}: {e}")
+
+
+#clients à recalculer au prochain commit, par thread (une connexion par thread)
+_en_attente = threading.local()
+
+
+def _clients_en_attente():
+    if not hasattr(_en_attente, 'ids'):
+        _en_attente.ids = set()
+    return _en_attente.ids
+
+
+def _recalculer_en_attente():
+    #un callback par modification, mais le premier vide l'ensemble: un seul recalcul par client.
+    #Après un rollback, les ids restés là sont recalculés au commit suivant (sans effet, stats relues en base)
+    client_ids = _clients_en_attente()
+    _en_attente.ids = set()
+    if client_ids:
+        _recalculer(client_ids)
+
+
+def planifier_recalcul(*client_ids):
+    client_ids = {client_id for client_id in client_ids if client_id}
+    if not client_ids:
+        return
+    if not connection.in_atomic_block:
+        _recalculer(client_ids)
+        return
+    _clients_en_attente().update(client_ids)
+    transaction.on_commit(_recalculer_en_attente)
+
+
+def _client_du_contrat(contrat):
+    try:
+        return contrat.chantier.client_id
+    except Chantier.DoesNotExist:
+        return None
+
+
+@receiver(post_save, sender=Contrat, dispatch_uid="stats_client_contrat_save")
+@receiver(post_delete, sender=Contrat, dispatch_uid="stats_client_contrat_delete")
+def contrat_modifie(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    planifier_recalcul(_client_du_contrat(instance), getattr(instance, '_client_initial', None))
+
+
+@receiver(pre_save, sender=Contrat, dispatch_uid="stats_client_contrat_pre_save")
+def contrat_change_de_chantier(sender, instance, **kwargs):
+    #contrat déplacé sur le chantier d'un autre client: l'ancien client doit aussi être recalculé
+    if instance.pk and not kwargs.get('raw'):
+        instance._client_initial = Contrat.objects.filter(pk=instance.pk).values_list(
+            'chantier__client_id', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Chantier, dispatch_uid="stats_client_chantier_save")
+@receiver(post_delete, sender=Chantier, dispatch_uid="stats_client_chantier_delete")
+def chantier_modifie(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    planifier_recalcul(instance.client_id, getattr(instance, '_client_initial', None))
+
+
+@receiver(pre_save, sender=Chantier, dispatch_uid="stats_client_chantier_pre_save")
+def chantier_change_de_client(sender, instance, **kwargs):
+    if instance.pk and not kwargs.get('raw'):
+        instance._client_initial = Chantier.objects.filter(pk=instance.pk).values_list(
+            'client_id', flat=True
+        ).first()
+
+
+@receiver(statuts_modifies, dispatch_uid="stats_client_transitions")
+def chantiers_changent_de_statut(sender, client_ids, **kwargs):
+    #chantiers_actifs dépend du statut
+    planifier_recalcul(*client_ids)
@@ -0,0 +1,47 @@
+"""STATS DENORMALISEES DES CLIENTS
+Colonnes de Client (total_contrats, chiffre_affaires_total, chantiers_actifs,
+date_dernier_contrat) recalculées depuis Client.objects.with_stats():
+
+    - par client, après chaque modification d'un contrat ou d'un chantier (client_app.signals)
+    - pour tous les clients: `manage.py recompute_client_stats`
+
+La liste des clients affiche alors badges et CA sans aucune requête par ligne.
+"""
+from django.db import transaction
+
+from sanba_finflow.cache import invalider_modele
+from .models import Client, STATS
+
+
+def recalculer_stats(client_ids=None, taille_lot=500):
+    """Recalcule les stats (de tous les clients si client_ids vaut None)
+    Une requête de lecture par lot + un bulk_update des seuls clients modifiés;
+    retourne le nombre de clients modifiés
+    """
+    clients = Client.objects.with_stats().only('id', *STATS).order_by('id')
+    if client_ids is not None:
+        clients = clients.filter(pk__in=list(client_ids))
+
+    modifies = 0
+    a_ecrire = []
+    for client in clients.iterator(chunk_size=taille_lot):
+        change = False
+        for champ, annotation in STATS.items():
+            valeur = getattr(client, annotation)
+            if getattr(client, champ) != valeur:
+                setattr(client, champ, valeur)
+                change = True
+        if change:
+            a_ecrire.append(client)
+        if len(a_ecrire) >= taille_lot:
+            Client.objects.bulk_update(a_ecrire, list(STATS))
+            modifies += len(a_ecrire)
+            a_ecrire = []
+    if a_ecrire:
+        Client.objects.bulk_update(a_ecrire, list(STATS))
+        modifies += len(a_ecrire)
+
+    if modifies:
+        #bulk_update ne déclenche pas post_save: les caches qui dépendent des clients sont invalidés ici
+        transaction.on_commit(lambda: invalider_modele(Client))
+    return modifies
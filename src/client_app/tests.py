@@ -1,3 +1,114 @@
+from datetime import date
+from unittest import mock
+
+from django.db import transaction
+from django.db.models import F
 from django.test import TestCase
 
-# Create your tests here.
+from chantier_app.models import Chantier
+from contrat_app.models import Contrat
+
+from . import signals
+from .models import Client
+
+
+def creer_client(nom='Nom', naissance=None):
+    return Client.objects.create(
+        type_client='particulier', nom=nom, prenom='Test', telephone='1', adresse='a', ville='Ouaga', pays='BF',
+        date_de_naissance=naissance,
+    )
+
+
+class PlanificationStatsTests(TestCase):
+
+    def setUp(self):
+        self.client_a, self.client_b = creer_client('A'), creer_client('B')
+        self.chantier = Chantier.objects.create(
+            client=self.client_a, reference='CH1', nom_chantier='C', adresse_chantier='x',
+            type_travaux='decoration', type_batiment='autre',
+        )
+
+    def test_un_seul_recalcul_par_transaction(self):
+        with mock.patch.object(signals, 'recalculer_stats') as recalcul:
+            with self.captureOnCommitCallbacks(execute=True):
+                for numero in range(3):
+                    chantier = Chantier.objects.create(
+                        client=self.client_a, reference=f'CH{numero + 2}', nom_chantier='C', adresse_chantier='x',
+                        type_travaux='decoration', type_batiment='autre',
+                    )
+                    Contrat.objects.create(chantier=chantier, reference_contrat=f'C{numero}', montant_total=1000)
+                self.chantier.client = self.client_b
+                self.chantier.save()
+        recalcul.assert_called_once_with({self.client_a.pk, self.client_b.pk})
+
+    def test_un_rollback_n_empeche_pas_le_recalcul_suivant(self):
+        with mock.patch.object(signals, 'recalculer_stats') as recalcul:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        Contrat.objects.create(chantier=self.chantier, reference_contrat='ANNULE', montant_total=1)
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                Contrat.objects.create(chantier=self.chantier, reference_contrat='C1', montant_total=1000)
+        recalcul.assert_called_once_with({self.client_a.pk})
+
+
+class AnniversairesTests(TestCase):
+
+    def noms(self, clients):
+        return sorted(client.nom for client in clients)
+
+    def test_anniversaire_mmdd_rempli_par_save_et_update(self):
+        client = creer_client(naissance=date(1990, 3, 15))
+        self.assertEqual(client.anniversaire_mmdd, '0315')
+
+        Client.objects.filter(pk=client.pk).update(date_de_naissance=date(1985, 11, 2))
+        client.refresh_from_db()
+        self.assertEqual(client.anniversaire_mmdd, '1102')
+
+        Client.objects.filter(pk=client.pk).update(date_de_naissance=None)
+        client.refresh_from_db()
+        self.assertIsNone(client.anniversaire_mmdd)
+
+    def test_update_avec_expression(self):
+        source = creer_client(naissance=date(1990, 7, 4))
+        cible = creer_client('Nom1')
+
+        Client.objects.filter(pk=cible.pk).update(
+            date_de_naissance=Client.objects.filter(pk=source.pk).values('date_de_naissance')[:1]
+        )
+        Client.objects.filter(pk=source.pk).update(date_de_naissance=F('date_de_naissance'))
+
+        cible.refresh_from_db()
+        source.refresh_from_db()
+        self.assertEqual((cible.anniversaire_mmdd, source.anniversaire_mmdd), ('0704', '0704'))
+
+    def test_periode_qui_passe_le_31_decembre(self):
+        creer_client('Nom1', date(1980, 12, 30))
+        creer_client('Nom2', date(1981, 1, 2))
+        creer_client('Nom3', date(1982, 1, 10))
+        creer_client('Nom4', date(1983, 12, 1))
+
+        clients = Client.objects.anniversaires_entre(date(2024, 12, 28), date(2025, 1, 3))
+        self.assertEqual(self.noms(clients), ['Nom1', 'Nom2'])
+
+        #ordre du calendrier: décembre avant janvier
+        a_venir = Client.objects.anniversaires_a_venir(jours=6, aujourdhui=date(2024, 12, 28))
+        self.assertEqual([client.nom for client in a_venir], ['Nom1', 'Nom2'])
+
+    def test_29_fevrier_fete_le_28_les_annees_non_bissextiles(self):
+        creer_client('Nom1', date(2000, 2, 29))
+        creer_client('Nom2', date(2001, 3, 1))
+
+        self.assertEqual(self.noms(Client.objects.anniversaires_entre(date(2025, 2, 28), date(2025, 2, 28))), ['Nom1'])
+        #année bissextile: le 29 existe, rien le 28
+        self.assertEqual(self.noms(Client.objects.anniversaires_entre(date(2024, 2, 28), date(2024, 2, 28))), [])
+        self.assertEqual(self.noms(Client.objects.anniversaires_entre(date(2024, 2, 29), date(2024, 3, 1))), ['Nom1', 'Nom2'])
+
+    def test_periode_d_un_an_ou_plus(self):
+        creer_client('Nom1', date(1990, 6, 1))
+        creer_client('Nom2')
+
+        clients = Client.objects.anniversaires_entre(date(2025, 1, 1), date(2026, 1, 1))
+        self.assertEqual(self.noms(clients), ['Nom1'])
@@ -10,6 +10,7 @@ urlpatterns = [
     path("<int:pk>/", views.ClientDetailView.as_view(), name="detail-client"),
     path("<int:pk>/modifier-client/", views.ClientUpdateView.as_view(), name="modifier-client"),
     path("<int:pk>/supprimer-client/", views.ClientDeleteView.as_view(), name="supprimer-client"),
+    path("anniversaires/", views.AnniversairesAVenirView.as_view(), name="anniversaires-a-venir"),
    
          ]
 
@@ -1,15 +1,20 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin #Sécurité
+from django.views import View
 from django.views.generic import ListView, CreateView , DetailView, UpdateView, DeleteView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils import timezone
 from django.http import JsonResponse
 from django.contrib import messages
 from django.db.models import Q
 
 from chantier_app.models import Chantier
-from .models import Client  # Import the Client model
+from sanba_finflow.pagination import KeysetPaginationMixin
+from recherche_app.index import rechercher
+from .models import Client, prochain_anniversaire  # Import the Client model
 from .forms import ClientForm # Import the ClientForm
 from contrat_app.models import Contrat
+from contrat_app.finances import metriques_pour_requete
 from secretaire_app.forms import DemandeDecaissementForm
 from secretaire_app.models import DemandeDecaissement
 from directeur_app.models import FondDisponible
@@ -17,7 +22,7 @@ from auth_app.form import ChangeCredentialsForm
 
 
 
-class ClientListView(LoginRequiredMixin, ListView):
+class ClientListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """Récupère tous les liste de la base ,
         Les envoie au templates,
         Affiche le template
@@ -27,6 +32,7 @@ class ClientListView(LoginRequiredMixin, ListView):
     template_name = "client_templates/client.html"
     context_object_name = "clients" #comment on l'appel dans le templates
     paginate_by = 20 # 20 clients par page 
+    keyset_ordering = ('-date_premier_contact', '-id') #pagination par curseur (pas d'OFFSET)
     
     def get_template_names(self):
         """retourne le template partials si requete HTMX"""
@@ -71,7 +77,8 @@ class ClientListView(LoginRequiredMixin, ListView):
     ########################__ # 3️⃣ RECHERCHE TEXTE (nom chantier Ou client) __############################
       search_query = self.request.GET.get('q')
       if search_query:
-          queryset = queryset.filter(
+          #index plein texte (recherche_app): plus de doublons via la jointure chantiers
+          queryset = rechercher(queryset, search_query,
               
               Q(chantiers__nom_chantier__icontains=search_query)|
               Q(chantiers__reference__icontains=search_query)|
@@ -201,7 +208,9 @@ class ClientDetailView(LoginRequiredMixin, DetailView):
         context["client_all_contrats"] = Contrat.objects.filter(
             chantier__client=client
         )
-        context["client_all_chantiers"] = client.chantiers.all()
+        context["finances"] = metriques_pour_requete(self.request, context["client_all_contrats"])
+        #état de paiement et retard calculés en SQL (ChantierQuerySet), pas de requête par chantier
+        context["client_all_chantiers"] = client.chantiers.with_payment_state().with_delay_state()
         return context
        
     
@@ -250,4 +259,34 @@ class ClientDeleteView(LoginRequiredMixin, DeleteView):
         client = self.get_object()
         messages.success(self.request, f"Client {client.nom} à été supprimé avec succès")
         
-        return super().delete(request, *args, **kwargs)
\ No newline at end of file
+        return super().delete(request, *args, **kwargs)
+
+class AnniversairesAVenirView(LoginRequiredMixin, View):
+    """API JSON: anniversaires des N prochains jours (?jours=30, 0 = aujourd'hui)
+    Une seule requête de plage sur l'index client_anniversaire_idx
+    """
+    jours_max = 366
+    
+    def get(self, request, *args, **kwargs):
+        try:
+            jours = min(max(int(request.GET.get('jours', 30)), 0), self.jours_max)
+        except ValueError:
+            return JsonResponse({'erreur': "le paramètre jours doit être un entier"}, status=400)
+        
+        aujourdhui = timezone.localdate()
+        clients = Client.objects.anniversaires_a_venir(jours, aujourdhui).only(
+            'id', 'nom', 'prenom', 'raison_sociale', 'type_client', 'telephone', 'date_de_naissance', 'anniversaire_mmdd'
+        )
+        anniversaires = []
+        for client in clients:
+            prochain = prochain_anniversaire(client.date_de_naissance, aujourdhui)
+            anniversaires.append({
+                'id': client.pk,
+                'client': str(client),
+                'telephone': client.telephone,
+                'date': prochain.isoformat(),
+                'dans_jours': (prochain - aujourdhui).days,
+                'age': prochain.year - client.date_de_naissance.year,
+                'lien': reverse('client_app:detail-client', args=[client.pk]),
+            })
+        return JsonResponse({'jours': jours, 'nombre': len(anniversaires), 'anniversaires': anniversaires})
@@ -3,7 +3,9 @@ from django.shortcuts import render
 from auth_app.form import ChangeCredentialsForm
 from auth_app.form import PersonnelRegisterForm
 from django.shortcuts import render, get_object_or_404, redirect
-from directeur_app.models import FondDisponible, Historique_dajout_fond
+from directeur_app.models import FondDisponible
+from directeur_app import fonds
+from alerte_app.scanner import alertes_actives
 from secretaire_app.models import DemandeDecaissement
 from employee_app.models import RapportDepense
 from django.contrib import messages
@@ -22,28 +24,27 @@ def comptable_view(request):
             "list_demande": list_demande,
             "fond":fond.montant,
             "ch_form":ChangeCredentialsForm(request.user),
-            "form":PersonnelRegisterForm()
+            "form":PersonnelRegisterForm(),
+            "alertes":alertes_actives('comptable')[:10],
            }
     return render(request, "comptable_templates/comptable.html", ctx)
 
 
 
 def ajouter_fond(request):
-    fond = get_object_or_404(FondDisponible, id=1)
-    
     if request.method == 'POST':
         try:
             fond_aj = request.POST.get("montant")
-            fond.montant +=int(fond_aj)
-            fond.save()
-            historique_de_fond = Historique_dajout_fond.objects.create(nom=request.user, montant=fond_aj)
-            historique_de_fond.save()
-            print('Fond ajouté avec succès')
-            messages.success(request, f"vous venez d'ajouter la somme de {fond_aj} au fond disponible ! Nouveau Capitale est de : {fond.montant}")
+            #UPDATE atomique + ligne dans le journal des mouvements (directeur_app/fonds.py)
+            nouveau_solde = fonds.deposer(request.user, fond_aj)
+            messages.success(request, f"vous venez d'ajouter la somme de {fond_aj} au fond disponible ! Nouveau Capitale est de : {nouveau_solde}")
             return redirect("comptable_app:comptable-view")
             
+        except fonds.OperationFondImpossible as e:
+            messages.info(request, str(e))
         except Exception as e:
-            logger.error(f"error{e}")
+            logger.exception(f"Ajout au fond impossible: {e}")
+            messages.error(request, f"❌ Erreur lors de l'ajout au fond: {e}")
             
     return render(request, "partials/ajouter_fond.html")
             
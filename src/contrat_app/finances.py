@@ -0,0 +1,82 @@
+"""METRIQUES FINANCIERES DES CONTRATS
+Taux d'encaissement, soldes restants et ancienneté des impayés
+calculés en UN seul aller-retour base de données par jeu de filtres.
+Partagé par le dashboard, la liste des contrats et le détail client.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Sum, Q, F, Value, DecimalField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Contrat
+
+
+MONTANT = DecimalField(max_digits=14, decimal_places=2)
+ZERO = Value(Decimal('0'))
+
+#Tranches d'ancienneté des impayés (en jours depuis la signature)
+TRANCHES_ANCIENNETE = [
+    ('0_30', 0, 30),
+    ('31_60', 31, 60),
+    ('61_90', 61, 90),
+    ('plus_90', 91, None),
+]
+
+
+def _somme(expression, condition=None):
+    return Coalesce(Sum(expression, filter=condition), ZERO, output_field=MONTANT)
+
+
+def calculer_metriques(queryset=None):
+    """Toutes les métriques financières d'un queryset de contrats en une requête
+    queryset = None -> tous les contrats
+    """
+    if queryset is None:
+        queryset = Contrat.objects.all()
+    
+    aujourdhui = timezone.now().date()
+    solde = F('montant_total') - F('montant_encaisse')
+    impaye = Q(montant_encaisse__lt=F('montant_total'))
+    
+    agregats = {
+        'nombre_contrats': Count('id'),
+        'contrats_signes': Count('id', filter=Q(date_signature__isnull=False)),
+        'chiffre_affaires': _somme('montant_total'),
+        'encaisse': _somme('montant_encaisse'),
+        'solde_restant': _somme(solde, impaye),
+        'contrats_impayes': Count('id', filter=impaye),
+        'solde_non_signe': _somme(solde, impaye & Q(date_signature__isnull=True)),
+    }
+    for nom, debut, fin in TRANCHES_ANCIENNETE:
+        periode = Q(date_signature__lte=aujourdhui - timedelta(days=debut))
+        if fin is not None:
+            periode &= Q(date_signature__gte=aujourdhui - timedelta(days=fin))
+        agregats[f'solde_{nom}'] = _somme(solde, impaye & periode)
+    
+    # ORDER BY inutile pour un agrégat
+    resultat = queryset.order_by().aggregate(**agregats)
+    
+    chiffre_affaires = resultat['chiffre_affaires']
+    resultat['taux_encaissement'] = (
+        float(resultat['encaisse'] / chiffre_affaires * 100) if chiffre_affaires > 0 else 0
+    )
+    resultat['anciennete'] = [
+        {'tranche': nom, 'solde': resultat[f'solde_{nom}']}
+        for nom, _debut, _fin in TRANCHES_ANCIENNETE
+    ]
+    return resultat
+
+
+def metriques_pour_requete(request, queryset=None):
+    """Version mémorisée pour la durée de la requête HTTP
+    Deux appels avec le même jeu de filtres = une seule requête SQL
+    """
+    if queryset is None:
+        queryset = Contrat.objects.all()
+    cache = request.__dict__.setdefault('_metriques_finance', {})
+    cle = str(queryset.order_by().query)  #le SQL identifie le jeu de filtres
+    if cle not in cache:
+        cache[cle] = calculer_metriques(queryset)
+    return cache[cle]
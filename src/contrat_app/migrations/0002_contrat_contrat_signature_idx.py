@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chantier_app', '0003_chantier_chantier_statut_fin_idx_and_more'),
+        ('contrat_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contrat',
+            index=models.Index(fields=['date_signature'], name='contrat_signature_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:56
+
+import stockage_app.stockage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contrat_app', '0002_contrat_contrat_signature_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contrat',
+            name='contrat_pdf',
+            field=models.FileField(blank=True, null=True, storage=stockage_app.stockage.stockage_blobs, upload_to='contrats/'),
+        ),
+        migrations.AlterField(
+            model_name='contrat',
+            name='devis_initial',
+            field=models.FileField(blank=True, null=True, storage=stockage_app.stockage.stockage_blobs, upload_to='devis/'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from chantier_app.models import Chantier
+from stockage_app.stockage import stockage_blobs
 from django.utils import timezone
 
 class Contrat(models.Model):
@@ -41,10 +42,10 @@ class Contrat(models.Model):
     date_du_dernier_paiement = models.DateField(null=True, blank=True)
     
     #DOCUMENTS IMPOERTANTS
-    contrat_pdf = models.FileField(upload_to="contrats/", null=True, blank=True)
+    contrat_pdf = models.FileField(upload_to="contrats/", storage=stockage_blobs, null=True, blank=True)
     
     #devis_initial = le premier qu'on a fait
-    devis_initial = models.FileField(upload_to="devis/", null=True, blank=True)
+    devis_initial = models.FileField(upload_to="devis/", storage=stockage_blobs, null=True, blank=True)
     
     #CLAUSES SPECIALES
     # garanttie_mois = combien de mois on garantis notre travail
@@ -57,6 +58,10 @@ class Contrat(models.Model):
         """configuration spécial pour django"""
         verbose_name = "Contrat"
         verbose_name_plural = "Contrats"
+        indexes = [
+            #CA par mois (date_signature >= début de fenêtre) et contrats non signés (IS NULL)
+            models.Index(fields=['date_signature'], name='contrat_signature_idx'),
+        ]
         
     def __str__(self):
         """affichage dans l'admin"""
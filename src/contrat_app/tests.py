@@ -1,3 +1,113 @@
+import csv
+import io
+import zipfile
+from decimal import Decimal
+from xml.etree import ElementTree
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from auth_app.models import Personnel
+from chantier_app.models import Chantier
+from client_app.models import Client
+from sanba_finflow.export import _valeur_csv
+
+from .finances import calculer_metriques
+from .models import Contrat
+
+
+class MetriquesContratsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_test = Client.objects.create(
+            type_client='particulier', nom='Nom', prenom='Test', telephone='1', adresse='a', ville='Ouaga', pays='BF',
+        )
+        chantiers = [
+            Chantier.objects.create(
+                client=cls.client_test, reference=f'CH{i}', nom_chantier=f'C{i}', adresse_chantier='x',
+                type_travaux='decoration', type_batiment='autre',
+            )
+            for i in range(3)
+        ]
+        aujourdhui = timezone.now().date()
+        #signé, partiellement payé / signé, payé en trop / non signé, rien payé
+        for chantier, signe, total, encaisse in [
+            (chantiers[0], True, 100000, 40000),
+            (chantiers[1], True, 50000, 60000),
+            (chantiers[2], False, 30000, 0),
+        ]:
+            Contrat.objects.create(
+                chantier=chantier, reference_contrat=chantier.reference,
+                date_signature=aujourdhui if signe else None,
+                montant_total=Decimal(total), montant_encaisse=Decimal(encaisse),
+            )
+        cls.utilisateur = Personnel.objects.create_superuser(username='boss', password='pw', email='b@x.com')
+
+    def test_contrats_signes_et_solde_restant(self):
+        metriques = calculer_metriques()
+        self.assertEqual(metriques['nombre_contrats'], 3)
+        self.assertEqual(metriques['contrats_signes'], 2)
+        #le trop-perçu d'un contrat ne diminue pas ce que doivent les autres
+        self.assertEqual(metriques['solde_restant'], Decimal('90000'))
+
+    def test_liste_et_detail_client_affichent_le_meme_solde(self):
+        self.client.force_login(self.utilisateur)
+        liste = self.client.get(reverse('contrat_app:liste-contrats'))
+        detail = self.client.get(reverse('client_app:detail-client', args=[self.client_test.pk]))
+        self.assertEqual(liste.context['all_solde_total_rest'], detail.context['finances']['solde_restant'])
+        self.assertContains(detail, "dont 2 signé(s)")
+
+
+class ExportContratsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        client_test = Client.objects.create(
+            type_client='particulier', nom='Nom', prenom='Test', telephone='1', adresse='a', ville='Ouaga', pays='BF',
+        )
+        for i, (reference, mode) in enumerate([('=HYPERLINK("x")', 'credit'), ('C-2', 'credit'), ('C-3', 'comptant')]):
+            chantier = Chantier.objects.create(
+                client=client_test, reference=f'CH{i}', nom_chantier=f'C{i}', adresse_chantier='x',
+                type_travaux='decoration', type_batiment='autre',
+            )
+            Contrat.objects.create(
+                chantier=chantier, reference_contrat=reference, mode_paiement=mode,
+                montant_total=Decimal('1000.50'), montant_encaisse=Decimal('0'),
+            )
+        cls.utilisateur = Personnel.objects.create_superuser(username='boss', password='pw', email='b@x.com')
+
+    def exporter(self, **parametres):
+        self.client.force_login(self.utilisateur)
+        reponse = self.client.get(reverse('contrat_app:liste-contrats'), parametres)
+        self.assertEqual(reponse.status_code, 200)
+        return b"".join(reponse.streaming_content)
+
+    def test_valeurs_csv_neutralisees(self):
+        for valeur, attendu in [
+            ('=1+1', "'=1+1"),
+            ('@SUM(A1)', "'@SUM(A1)"),
+            ('\t=cmd', "'\t=cmd"),
+            ('\r=cmd', "'\r=cmd"),
+            ('ciment', 'ciment'),
+            (Decimal('-5.5'), '-5,5'),
+        ]:
+            with self.subTest(valeur=valeur):
+                self.assertEqual(_valeur_csv(valeur), attendu)
+
+    def test_csv_reprend_les_filtres_de_la_page(self):
+        contenu = self.exporter(mode_paiement='credit', export='csv').decode('utf-8-sig')
+        entetes, *lignes = csv.reader(io.StringIO(contenu), delimiter=';')
+
+        self.assertEqual(entetes[0], 'Référence')
+        self.assertEqual(sorted(ligne[0] for ligne in lignes), ["'=HYPERLINK(\"x\")", 'C-2'])
+        self.assertEqual({ligne[entetes.index('Mode de paiement')] for ligne in lignes}, {'Crédit'})
+
+    def test_xlsx_archive_valide(self):
+        archive = zipfile.ZipFile(io.BytesIO(self.exporter(export='xlsx')))
 
-# Create your tests here.
+        self.assertIsNone(archive.testzip())
+        feuille = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        ns = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        self.assertEqual(len(feuille.findall('x:sheetData/x:row', ns)), 1 + 3)
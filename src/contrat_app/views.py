@@ -3,16 +3,40 @@ from django.urls import reverse_lazy
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import CreateView, ListView,  UpdateView, DetailView, DeleteView
-from django.db.models import Q, Sum
+from django.db.models import F, Q
 
 from .models import Contrat
+from .finances import metriques_pour_requete
+from sanba_finflow.pagination import KeysetPaginationMixin
+from sanba_finflow.export import ExportMixin, libelle
+from recherche_app.index import rechercher
 from .forms import ContratForm
 
 
-class ContratView(LoginRequiredMixin, ListView):
+class ContratView(LoginRequiredMixin, ExportMixin, KeysetPaginationMixin, ListView):
     model = Contrat
     template_name = 'contrat_templates/list_contrat.html'
     context_object_name = "contrats"
+    paginate_by = 20
+    keyset_ordering = ('-id',) #pagination par curseur (pas d'OFFSET)
+    
+    #?export=csv / ?export=xlsx: liste filtrée en flux (sanba_finflow.export)
+    export_nom = "contrats"
+    export_colonnes = [
+        ("Référence", "reference_contrat"),
+        ("Chantier", "chantier__reference"),
+        ("Nom du chantier", "chantier__nom_chantier"),
+        ("Client", "chantier__client__nom"),
+        ("Prénom", "chantier__client__prenom"),
+        ("Raison sociale", "chantier__client__raison_sociale"),
+        ("Date signature", "date_signature"),
+        ("Mode de paiement", "mode_paiement", libelle(Contrat.MODE_PAIEMENT_CHOICES)),
+        ("Montant total", "montant_total"),
+        ("Encaissé", "montant_encaisse"),
+        ("Reste à encaisser", "reste_export"),
+        ("Dernier paiement", "date_du_dernier_paiement"),
+    ]
+    export_annotations = {"reste_export": F("montant_total") - F("montant_encaisse")}
     
     def get_template_names(self) -> list[str]:
         """ retourne le template partials si requete HTMX """
@@ -39,7 +63,8 @@ class ContratView(LoginRequiredMixin, ListView):
         #########################__RECHERCHE DE CONTRAT PAR NON CHANTIER__###########################
         search_query = self.request.GET.get('q')
         if search_query:
-            queryset = queryset.filter(
+            #index plein texte (recherche_app), icontains seulement hors SQLite
+            queryset = rechercher(queryset, search_query,
                 Q(chantier__client__nom__icontains=search_query)|
                  Q(chantier__client__prenom__icontains=search_query)|
                 Q(chantier__nom_chantier__icontains=search_query)|
@@ -52,19 +77,17 @@ class ContratView(LoginRequiredMixin, ListView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        queryset = self.get_queryset()
-        
-        # Calculs des statistiques
-        total = queryset.count()
-        somme_montants = queryset.aggregate(Sum('montant_total'))['montant_total__sum'] or 0
-        somme_encaisses = queryset.aggregate(Sum('montant_encaisse'))['montant_encaisse__sum'] or 0
-        somme_soldes = somme_montants - somme_encaisses
+        # Calculs des statistiques (une seule requête, partagée avec le dashboard)
+        metriques = metriques_pour_requete(self.request, self.object_list)
         
         context.update({
-            'all_total_contrats': total,
-            'all_montant_total': somme_montants,
-            'all_montant_encaisse': somme_encaisses,
-            'all_solde_total_rest': somme_soldes,
+            'all_total_contrats': metriques['nombre_contrats'],
+            'all_montant_total': metriques['chiffre_affaires'],
+            'all_montant_encaisse': metriques['encaisse'],
+            #même définition que le détail client: somme des restes dus des contrats impayés
+            'all_solde_total_rest': metriques['solde_restant'],
+            'all_taux_encaissement': metriques['taux_encaissement'],
+            'all_anciennete': metriques['anciennete'],
             'MODE_PAIEMENT_CHOICES': Contrat.MODE_PAIEMENT_CHOICES,
         })
         return context
@@ -1,3 +1,6 @@
 from django.contrib import admin
+from .models import KpiSnapshot
 
-# Register your models here.
+@admin.register(KpiSnapshot)
+class AdminKpiSnapshot(admin.ModelAdmin):
+    list_display = ["total_client", "total_chantiers", "chiffre_affaire_total", "date_reference", "date_mise_a_jour"]
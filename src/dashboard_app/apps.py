@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class DashboardAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard_app'
+    
+    def ready(self):
+        #branche les signaux du snapshot KPI
+        from . import signals  # noqa: F401
+        #branche l'invalidation des clés de cache versionnées par modèle
+        from sanba_finflow import cache  # noqa: F401
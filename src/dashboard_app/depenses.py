@@ -0,0 +1,86 @@
+"""ANALYTICS DES DEPENSES
+Requêtes annotées qui retournent des dict simples (pas d'objets modèles).
+Le nombre de requêtes ne dépend pas du nombre de catégories:
+    - 1 requête pour les dépenses par catégorie (couleur jointe par sous-requête)
+    - 1 requête pour les dépenses par type
+Les pourcentages sont calculés en une seule passe Python.
+Les résultats sont mis en cache (partagé entre workers) jusqu'au prochain
+changement d'un TypeDepense ou d'un RapportDepense.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Sum, Q, F, Value, DecimalField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from employee_app.models import TypeDepense, RapportDepense
+from sanba_finflow.cache import cached_query
+
+
+COULEUR_PAR_DEFAUT = '#CCCCCC'
+MONTANT_RAPPORTS = F('rapports__prix_unitaire') * F('rapports__quantité')
+
+
+def _pourcentages(lignes, champ_total, total_general):
+    """Ajoute 'total_pourcentage' à chaque ligne (part du total général)"""
+    for ligne in lignes:
+        montant = ligne[champ_total] or Decimal('0')
+        ligne['total_pourcentage'] = (
+            montant * Decimal('100') / total_general if total_general > 0 else Decimal('0')
+        )
+    return lignes
+
+
+@cached_query(TypeDepense, RapportDepense, timeout=600)
+def depenses_par_categorie():
+    """Dépenses validées par catégorie avec couleur et pourcentage
+    Retourne (lignes, total_general)
+    """
+    #couleur = celle du premier type actif de la catégorie (même ordre que les listes)
+    couleur = TypeDepense.objects.filter(
+        categorie=OuterRef('categorie'),
+        est_actif=True,
+    ).order_by('ordre_affichage', 'nom').values('couleur')[:1]
+    
+    lignes = list(
+        TypeDepense.objects.filter(
+            est_actif=True
+        ).values('categorie').annotate(
+            total_depenses=Coalesce(
+                Sum(MONTANT_RAPPORTS, filter=Q(rapports__status='valide')),
+                Value(Decimal('0')),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+            couleur=Coalesce(Subquery(couleur), Value(COULEUR_PAR_DEFAUT)),
+        ).order_by('-total_depenses')
+    )
+    
+    total_general = sum((ligne['total_depenses'] for ligne in lignes), Decimal('0'))
+    return _pourcentages(lignes, 'total_depenses', total_general), total_general
+
+
+@cached_query(TypeDepense, RapportDepense, timeout=600)
+def depenses_par_type(total_general):
+    """Dépenses validées par type détaillé (nom, catégorie, couleur)"""
+    lignes = list(
+        TypeDepense.objects.filter(
+            est_actif=True,
+            rapports__status='valide'
+        ).values("nom", "categorie", "couleur").annotate(
+            total_depenses_sum=Sum(MONTANT_RAPPORTS),
+            nombre_utilisation=Count("rapports"),
+        ).order_by('-total_depenses_sum')
+    )
+    for ligne in lignes:
+        ligne['total_depenses'] = ligne['total_depenses_sum']
+    return _pourcentages(lignes, 'total_depenses_sum', total_general)
+
+
+def analyser_depenses():
+    """Toutes les analytics de dépenses par catégorie et par type (2 requêtes)"""
+    par_categorie, total_general = depenses_par_categorie()
+    return {
+        'depenses_par_categorie': par_categorie,
+        'total_general_depenses': total_general,
+        'depense_par_type': depenses_par_type(total_general),
+        'couleurs_categories': {ligne['categorie']: ligne['couleur'] for ligne in par_categorie},
+    }
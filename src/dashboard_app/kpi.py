@@ -0,0 +1,276 @@
+"""SERVICE KPI
+Calcule les indicateurs clés du dashboard et les range dans KpiSnapshot.
+
+Un save/delete ne relit que la ligne modifiée (avant et après) et ajoute au
+snapshot la différence de son apport: UPDATE ... SET champ = champ + delta.
+Le calcul complet (une requête d'agrégat par section) ne sert qu'à la création
+du snapshot, au changement de jour (sections datées) et à rebuild_kpis.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Sum, Q, F, Value, DecimalField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from client_app.models import Client
+from chantier_app.models import Chantier, q_en_retard
+from contrat_app.models import Contrat
+from employee_app.models import RapportDepense, TypeDepense
+
+from .models import KpiSnapshot
+
+
+SNAPSHOT_ID = 1
+
+ZERO = Value(Decimal('0'))
+MONTANT = DecimalField(max_digits=14, decimal_places=2)
+
+
+def calculer_clients():
+    """KPI clients en une requête"""
+    aujourdhui = timezone.now().date()
+    return Client.objects.aggregate(
+        total_client=Count('id'),
+        nouveaux_clients_mois=Count('id', filter=Q(date_premier_contact__year=aujourdhui.year,
+                                                   date_premier_contact__month=aujourdhui.month)),
+        clients_fideles=Count('id', filter=Q(est_fidel=True)),
+    )
+
+
+def calculer_chantiers():
+    """KPI chantiers en une requête"""
+    aujourdhui = timezone.now().date()
+    return Chantier.objects.aggregate(
+        total_chantiers=Count('id'),
+        chantiers_actifs=Count('id', filter=Q(status_chantier='en_cours')),
+        chantiers_termines=Count('id', filter=Q(status_chantier='termine')),
+        chantiers_termine_mois=Count('id', filter=Q(status_chantier='termine',
+                                                    date_fin_reelle__year=aujourdhui.year,
+                                                    date_fin_reelle__month=aujourdhui.month)),
+        chantiers_en_retard=Count('id', filter=q_en_retard(aujourdhui)),
+    )
+
+
+def calculer_contrats():
+    """KPI financiers en une requête"""
+    return Contrat.objects.aggregate(
+        chiffre_affaire_total=Coalesce(Sum('montant_total'), ZERO, output_field=MONTANT),
+        montant_encaisse_total=Coalesce(Sum('montant_encaisse'), ZERO, output_field=MONTANT),
+        contrats_non_signes=Count('id', filter=Q(date_signature__isnull=True)),
+    )
+
+
+def calculer_depenses():
+    """KPI dépenses validées en une requête (types de dépense actifs seulement)"""
+    return RapportDepense.objects.filter(status='valide').aggregate(
+        total_depenses_valides=Coalesce(
+            Sum(F('prix_unitaire') * F('quantité'), filter=Q(type_depense__est_actif=True)),
+            ZERO,
+            output_field=MONTANT
+        ),
+        rapports_avec_lien=Count('id', filter=Q(demande_decaissement__isnull=False)),
+        rapports_sans_lien=Count('id', filter=Q(demande_decaissement__isnull=True)),
+    )
+
+
+SECTIONS = {
+    'clients': calculer_clients,
+    'chantiers': calculer_chantiers,
+    'contrats': calculer_contrats,
+    'depenses': calculer_depenses,
+}
+
+#Sections qui dépendent de la date du jour (mois courant, retards)
+SECTIONS_DATEES = ('clients', 'chantiers')
+
+
+def calculer_tout():
+    """Recalcule toutes les sections depuis les tables (source de vérité)"""
+    valeurs = {}
+    for calcul in SECTIONS.values():
+        valeurs.update(calcul())
+    return valeurs
+
+
+def _ecrire(valeurs):
+    """Écrit les valeurs dans la ligne unique du snapshot
+    Si la ligne n'existe pas encore (1re écriture venant d'un signal), elle est créée
+    avec TOUTES les sections: sinon les autres resteraient à 0 jusqu'au prochain rebuild
+    """
+    if KpiSnapshot.objects.filter(id=SNAPSHOT_ID).update(**valeurs):
+        return
+    complet = calculer_tout()
+    complet['date_reference'] = timezone.now().date()
+    complet.update(valeurs)
+    _, cree = KpiSnapshot.objects.get_or_create(id=SNAPSHOT_ID, defaults=complet)
+    if not cree:
+        #créée entre-temps par un autre worker
+        KpiSnapshot.objects.filter(id=SNAPSHOT_ID).update(**valeurs)
+
+
+def mettre_a_jour(*sections):
+    """Recalcule seulement les sections demandées (une requête d'agrégat chacune)
+    Ex: mettre_a_jour(*SECTIONS_DATEES) au premier affichage d'un nouveau jour
+    """
+    valeurs = {}
+    for section in sections:
+        valeurs.update(SECTIONS[section]())
+    if set(SECTIONS_DATEES) <= set(sections):
+        valeurs['date_reference'] = timezone.now().date()
+    _ecrire(valeurs)
+
+
+def reconstruire():
+    """Recalcul complet (commande rebuild_kpis)"""
+    valeurs = calculer_tout()
+    valeurs['date_reference'] = timezone.now().date()
+    _ecrire(valeurs)
+    return KpiSnapshot.objects.get(id=SNAPSHOT_ID)
+
+
+def lire_snapshot():
+    """Retourne le snapshot à jour
+    Si la ligne manque ou date d'un autre jour, les sections datées sont recalculées
+    """
+    snapshot = KpiSnapshot.objects.filter(id=SNAPSHOT_ID).first()
+    if snapshot is None:
+        return reconstruire()
+    if snapshot.date_reference != timezone.now().date():
+        mettre_a_jour(*SECTIONS_DATEES)
+        snapshot.refresh_from_db()
+    return snapshot
+
+
+#####__ MISE A JOUR INCREMENTALE __####
+
+#colonnes lues sur la ligne modifiée (une requête par pk, avant et après l'écriture)
+COLONNES = {
+    Client: ('date_premier_contact', 'est_fidel'),
+    Chantier: ('status_chantier', 'date_fin_reelle', 'date_fin_prevue'),
+    Contrat: ('montant_total', 'montant_encaisse', 'date_signature'),
+    RapportDepense: ('status', 'prix_unitaire', 'quantité', 'demande_decaissement_id', 'type_depense__est_actif'),
+    TypeDepense: ('est_actif',),
+}
+
+
+def _du_mois(jour, aujourdhui):
+    return jour is not None and (jour.year, jour.month) == (aujourdhui.year, aujourdhui.month)
+
+
+def apport_client(ligne, aujourdhui):
+    return {
+        'total_client': 1,
+        'nouveaux_clients_mois': int(_du_mois(ligne['date_premier_contact'], aujourdhui)),
+        'clients_fideles': int(ligne['est_fidel']),
+    }
+
+
+def apport_chantier(ligne, aujourdhui):
+    statut = ligne['status_chantier']
+    fin_prevue = ligne['date_fin_prevue']
+    return {
+        'total_chantiers': 1,
+        'chantiers_actifs': int(statut == 'en_cours'),
+        'chantiers_termines': int(statut == 'termine'),
+        'chantiers_termine_mois': int(statut == 'termine' and _du_mois(ligne['date_fin_reelle'], aujourdhui)),
+        'chantiers_en_retard': int(statut == 'en_cours' and fin_prevue is not None and fin_prevue < aujourdhui),
+    }
+
+
+def apport_contrat(ligne, aujourdhui):
+    return {
+        'chiffre_affaire_total': ligne['montant_total'],
+        'montant_encaisse_total': ligne['montant_encaisse'],
+        'contrats_non_signes': int(ligne['date_signature'] is None),
+    }
+
+
+def apport_depense(ligne, aujourdhui):
+    if ligne['status'] != 'valide':
+        return {}
+    lien = ligne['demande_decaissement_id'] is not None
+    return {
+        'total_depenses_valides': ligne['prix_unitaire'] * ligne['quantité'] if ligne['type_depense__est_actif'] else 0,
+        'rapports_avec_lien': int(lien),
+        'rapports_sans_lien': int(not lien),
+    }
+
+
+APPORTS = {
+    Client: apport_client,
+    Chantier: apport_chantier,
+    Contrat: apport_contrat,
+    RapportDepense: apport_depense,
+}
+
+
+def lire_ligne(modele, pk):
+    """Colonnes utiles aux KPI de la ligne `pk` (None si elle n'existe pas)"""
+    if pk is None:
+        return None
+    return modele.objects.filter(pk=pk).values(*COLONNES[modele]).first()
+
+
+def lire_lignes(modele, pks):
+    """{pk: colonnes utiles aux KPI} d'un lot de lignes (une requête)"""
+    return {
+        ligne.pop('pk'): ligne
+        for ligne in modele.objects.filter(pk__in=pks).values('pk', *COLONNES[modele])
+    }
+
+
+def delta(modele, avant, apres, aujourdhui=None):
+    """Différence d'apport au snapshot entre deux états d'une ligne (None = ligne absente)
+    Ex: chantier en_cours -> termine: {'chantiers_actifs': -1, 'chantiers_termines': 1, ...}
+    """
+    aujourdhui = aujourdhui or timezone.now().date()
+    apport = APPORTS[modele]
+    deltas = {}
+    for ligne, signe in ((apres, 1), (avant, -1)):
+        if ligne is not None:
+            for champ, valeur in apport(ligne, aujourdhui).items():
+                deltas[champ] = deltas.get(champ, 0) + signe * valeur
+    return {champ: valeur for champ, valeur in deltas.items() if valeur}
+
+
+def additionner(*deltas):
+    """Somme champ par champ de plusieurs deltas (les champs à 0 disparaissent)"""
+    total = {}
+    for d in deltas:
+        for champ, valeur in d.items():
+            total[champ] = total.get(champ, 0) + valeur
+    return {champ: valeur for champ, valeur in total.items() if valeur}
+
+
+def delta_type_depense(type_id, avant, apres):
+    """(Dés)activer un type ajoute ou retire ses dépenses validées du total (index du FK)"""
+    if avant is None or apres is None or avant['est_actif'] == apres['est_actif']:
+        return {}
+    total = RapportDepense.objects.filter(type_depense_id=type_id, status='valide').aggregate(
+        total=Coalesce(Sum(F('prix_unitaire') * F('quantité')), ZERO, output_field=MONTANT)
+    )['total']
+    return {'total_depenses_valides': total if apres['est_actif'] else -total} if total else {}
+
+
+def appliquer_deltas(deltas):
+    """Ajoute les deltas aux compteurs du snapshot (F(): pas de lecture, pas d'écrasement)
+    Appelé après le commit: si la ligne n'existe pas encore, le calcul complet
+    inclut déjà la modification
+    """
+    if not deltas:
+        return
+    if not KpiSnapshot.objects.filter(id=SNAPSHOT_ID).update(**{champ: F(champ) + valeur for champ, valeur in deltas.items()}):
+        reconstruire()
+
+
+def verifier_coherence():
+    """Compare le snapshot aux agrégats en direct (dérive des deltas, écritures par update()...)
+    Retourne la liste des écarts: [(champ, valeur_snapshot, valeur_reelle), ...]
+    """
+    snapshot = KpiSnapshot.objects.filter(id=SNAPSHOT_ID).first()
+    ecarts = []
+    for champ, reel in calculer_tout().items():
+        stocke = getattr(snapshot, champ, None) if snapshot else None
+        if stocke != reel:
+            ecarts.append((champ, stocke, reel))
+    return ecarts
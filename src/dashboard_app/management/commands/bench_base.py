@@ -0,0 +1,168 @@
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+
+from sanba_finflow import database
+
+
+PROFILS = ('sqlite-defaut', 'sqlite', 'postgres')
+
+#tables propres au bench: jamais les tables de l'application
+TABLES = ('bench_mouvement', 'bench_compte')
+
+
+def _configuration(profil, dossier):
+    if profil == 'sqlite-defaut':
+        return database.sqlite(Path(dossier) / 'defaut.sqlite3', reglages=False)
+    if profil == 'sqlite':
+        return database.sqlite(Path(dossier) / 'regle.sqlite3')
+    if profil == 'postgres':
+        return database.postgres()
+    raise CommandError(f"Profil inconnu: {profil} ({', '.join(PROFILS)})")
+
+
+def _centile(valeurs, p):
+    if not valeurs:
+        return 0
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * p / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les profils de base de données (sqlite-defaut = réglages Django d'origine, "
+        "sqlite = WAL + pragmas, postgres) sous charge mixte: des lecteurs et des écrivains "
+        "en parallèle sur des tables de test, puis débit et latences par profil"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profils", default=",".join(PROFILS), help=f"Profils à comparer (défaut {','.join(PROFILS)})")
+        parser.add_argument("--duree", type=float, default=10, help="Secondes de charge par profil (défaut 10)")
+        parser.add_argument("--lecteurs", type=int, default=8, help="Threads qui lisent (défaut 8)")
+        parser.add_argument("--ecrivains", type=int, default=2, help="Threads qui écrivent (défaut 2)")
+        parser.add_argument("--lignes", type=int, default=20000, help="Lignes de départ de la table lue (défaut 20000)")
+
+    #####__ PREPARATION __####
+
+    def preparer(self, alias, lignes):
+        connexion = connections[alias]
+        cle = "BIGSERIAL PRIMARY KEY" if connexion.vendor == 'postgresql' else "INTEGER PRIMARY KEY AUTOINCREMENT"
+        with connexion.cursor() as curseur:
+            for table in TABLES:
+                curseur.execute(f"DROP TABLE IF EXISTS {table}")
+            curseur.execute("CREATE TABLE bench_compte (id INTEGER PRIMARY KEY, solde BIGINT NOT NULL)")
+            curseur.execute(f"CREATE TABLE bench_mouvement (id {cle}, groupe INTEGER NOT NULL, montant BIGINT NOT NULL)")
+            curseur.execute("CREATE INDEX bench_mouvement_groupe ON bench_mouvement (groupe)")
+            curseur.execute("INSERT INTO bench_compte (id, solde) VALUES (1, 0)")
+            curseur.executemany(
+                "INSERT INTO bench_mouvement (groupe, montant) VALUES (%s, %s)",
+                [(i % 100, i) for i in range(lignes)],
+            )
+        connexion.close()
+
+    def nettoyer(self, alias):
+        connexion = connections[alias]
+        with connexion.cursor() as curseur:
+            for table in TABLES:
+                curseur.execute(f"DROP TABLE IF EXISTS {table}")
+        connexion.close()
+
+    #####__ CHARGE __####
+
+    def lire(self, alias, numero):
+        #requêtes du type liste/dashboard: agrégat filtré par index + dernière page
+        with connections[alias].cursor() as curseur:
+            curseur.execute("SELECT COUNT(*), SUM(montant) FROM bench_mouvement WHERE groupe = %s", [numero % 100])
+            curseur.fetchone()
+            curseur.execute("SELECT id, montant FROM bench_mouvement ORDER BY id DESC LIMIT 20")
+            curseur.fetchall()
+
+    def ecrire(self, alias, numero):
+        #comme un décaissement: lecture du solde puis écriture dans la même transaction
+        with transaction.atomic(using=alias):
+            with connections[alias].cursor() as curseur:
+                curseur.execute("SELECT solde FROM bench_compte WHERE id = 1")
+                curseur.fetchone()
+                curseur.execute("UPDATE bench_compte SET solde = solde + 1 WHERE id = 1")
+                curseur.execute("INSERT INTO bench_mouvement (groupe, montant) VALUES (%s, %s)", [numero % 100, numero])
+
+    def travailleur(self, alias, operation, depart, fin, latences, erreurs):
+        numero = 0
+        try:
+            depart.wait()
+            while time.perf_counter() < fin[0]:
+                numero += 1
+                debut = time.perf_counter()
+                try:
+                    operation(alias, numero)
+                except DatabaseError:
+                    erreurs.append(1)  # "database is locked" & co
+                    continue
+                latences.append(time.perf_counter() - debut)
+        finally:
+            connections[alias].close()
+
+    def mesurer(self, alias, options):
+        resultats = {'lecture': ([], []), 'ecriture': ([], [])}
+        depart = threading.Barrier(options["lecteurs"] + options["ecrivains"] + 1)
+        fin = [0]
+        threads = [
+            threading.Thread(target=self.travailleur, args=(alias, self.lire, depart, fin, *resultats['lecture']))
+            for _ in range(options["lecteurs"])
+        ] + [
+            threading.Thread(target=self.travailleur, args=(alias, self.ecrire, depart, fin, *resultats['ecriture']))
+            for _ in range(options["ecrivains"])
+        ]
+        for thread in threads:
+            thread.start()
+        fin[0] = time.perf_counter() + options["duree"]
+        depart.wait()
+        for thread in threads:
+            thread.join()
+        return resultats
+
+    #####__ COMMANDE __####
+
+    def handle(self, *args, **options):
+        profils = [p.strip() for p in options["profils"].split(",") if p.strip()]
+        lignes = []
+        with tempfile.TemporaryDirectory(prefix="bench_base_") as dossier:
+            for profil in profils:
+                alias = f"bench_{profil.replace('-', '_')}"
+                #configure_settings complète les clés par défaut (TIME_ZONE, TEST...) d'une entrée 'default'
+                connections.settings[alias] = connections.configure_settings(
+                    {DEFAULT_DB_ALIAS: _configuration(profil, dossier)}
+                )[DEFAULT_DB_ALIAS]
+                try:
+                    self.preparer(alias, options["lignes"])
+                except (ImproperlyConfigured, DatabaseError) as e:
+                    self.stdout.write(self.style.WARNING(f"⏭️ {profil} ignoré: {e}"))
+                    del connections.settings[alias]
+                    continue
+
+                self.stdout.write(f"⏱️ {profil}: {options['lecteurs']} lecteur(s), {options['ecrivains']} écrivain(s), {options['duree']:g}s")
+                try:
+                    resultats = self.mesurer(alias, options)
+                finally:
+                    self.nettoyer(alias)
+                    del connections.settings[alias]
+                lignes.append((profil, resultats))
+
+        if not lignes:
+            raise CommandError("Aucun profil n'a pu être mesuré")
+
+        self.stdout.write("")
+        self.stdout.write(f"{'profil':<15}{'type':<10}{'ops/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'erreurs':>9}")
+        for profil, resultats in lignes:
+            for type_operation, (latences, erreurs) in resultats.items():
+                ms = [l * 1000 for l in latences]
+                self.stdout.write(
+                    f"{profil:<15}{type_operation:<10}{len(latences) / options['duree']:>9.0f}"
+                    f"{(statistics.median(ms) if ms else 0):>9.1f}{_centile(ms, 95):>9.1f}{_centile(ms, 99):>9.1f}{len(erreurs):>9}"
+                )
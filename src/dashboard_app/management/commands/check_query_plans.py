@@ -0,0 +1,102 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.utils import timezone
+
+from alerte_app.regles import demandes_sans_rapport
+from alerte_app.scanner import alertes_actives
+from chantier_app.models import Chantier, DureeStatut, TransitionChantier
+from chantier_app.views import ChantierListeView
+from client_app.models import Client
+from client_app.views import ClientListView
+from contrat_app.models import Contrat
+from dashboard_app.series import debut_de_periode
+from directeur_app.views import ListRapportDepenseView
+from employee_app.factures import rapports_sans_miniature
+from employee_app.models import RapportDepense
+from secretaire_app.models import DemandeDecaissement
+from secretaire_app.views import HistoriqueDemandeView
+
+
+#"SCAN table" sans "USING INDEX" = lecture de toute la table
+SCAN_COMPLET = re.compile(r'\bSCAN (\w+)(?! USING (?:COVERING )?INDEX)\s*$')
+
+
+def queryset_de_liste(vue, parametres=None):
+    """Requête réelle d'une ListView paginée par curseur: get_queryset + tri + LIMIT"""
+    instance = vue()
+    instance.setup(RequestFactory().get("/", parametres or {}))
+    return instance.get_queryset().order_by(*instance.keyset_ordering)[:instance.paginate_by + 1]
+
+
+def requetes_critiques():
+    """(nom, queryset) des requêtes filtrées du dashboard et des listes"""
+    aujourdhui = timezone.now().date()
+    debut_fenetre = debut_de_periode(aujourdhui, 'mois') - timedelta(days=365)
+    return [
+        #dashboard
+        ("Chantiers en retard", Chantier.objects.en_retard(aujourdhui)),
+        ("Dépenses validées par mois", RapportDepense.objects.filter(
+            status='valide', date_depense__gte=debut_fenetre).values('date_depense')),
+        ("CA par mois", Contrat.objects.filter(
+            date_signature__gte=debut_fenetre).values('date_signature')),
+        ("Contrats non signés", Contrat.objects.filter(date_signature__isnull=True)),
+        ("Demandes décaissées", DemandeDecaissement.objects.filter(
+            decaisse=True, date_decaissement__lte=timezone.now())),
+        ("Durées réelles en cours (radar)", DureeStatut.objects.filter(status_chantier='en_cours', chantiers__gt=0)),
+        ("Anniversaires du jour", Client.objects.anniversaires_a_venir(0)),
+        ("Anniversaires sur fin d'année", Client.objects.anniversaires_entre(
+            aujourdhui.replace(month=12, day=20), aujourdhui.replace(year=aujourdhui.year + 1, month=1, day=10))),
+        ("Alertes actives", alertes_actives()),
+        ("Alertes actives secrétaire", alertes_actives('secretaire')),
+        #pages d'accueil (directeur, comptable, secrétaire, client)
+        ("Dernières demandes", DemandeDecaissement.objects.select_related(
+            "demandeur", "chantier", "approuve_par").order_by("-date_demande")[:5]),
+        #scanner d'alertes
+        ("Demandes décaissées sans rapport", demandes_sans_rapport(timezone.now())),
+        #worker de miniatures
+        ("Factures sans miniature", rapports_sans_miniature()[:50]),
+        #transitions
+        ("Historique d'un chantier", TransitionChantier.objects.filter(chantier_id=1).order_by('-date_transition')),
+        #listes
+        ("Liste chantiers", queryset_de_liste(ChantierListeView)),
+        ("Liste chantiers en retard", queryset_de_liste(ChantierListeView, {'status': 'retard'})),
+        ("Liste clients", queryset_de_liste(ClientListView)),
+        ("Liste rapports", queryset_de_liste(ListRapportDepenseView)),
+        ("Historique demandes", queryset_de_liste(HistoriqueDemandeView)),
+        ("Historique demandes par statut", queryset_de_liste(HistoriqueDemandeView, {'status': 'en_attente'})),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Lance EXPLAIN QUERY PLAN sur les requêtes critiques (dashboard, listes) "
+        "et échoue si l'une d'elles lit une table entière"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verbose-plans", action="store_true", help="Affiche le plan complet de chaque requête")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("EXPLAIN QUERY PLAN n'est vérifié que sur SQLite")
+
+        echecs = []
+        for nom, queryset in requetes_critiques():
+            plan = queryset.explain()
+            scans = [m.group(1) for ligne in plan.splitlines() if (m := SCAN_COMPLET.search(ligne))]
+            if scans:
+                echecs.append(nom)
+                self.stdout.write(f"❌ {nom}: scan complet de {', '.join(scans)}")
+            else:
+                self.stdout.write(f"✅ {nom}")
+            if options["verbose_plans"] or scans:
+                for ligne in plan.splitlines():
+                    self.stdout.write(f"      {ligne}")
+
+        if echecs:
+            raise CommandError(f"{len(echecs)} requête(s) sans index: {', '.join(echecs)}")
+        self.stdout.write(self.style.SUCCESS("✅ Toutes les requêtes critiques utilisent un index"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard_app import kpi
+
+
+class Command(BaseCommand):
+    help = "Recalcule entièrement le snapshot KPI du dashboard (ou vérifie sa cohérence avec --check)"
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Compare le snapshot aux agrégats en direct sans rien modifier",
+        )
+    
+    def handle(self, *args, **options):
+        if options["check"]:
+            ecarts = kpi.verifier_coherence()
+            if ecarts:
+                for champ, stocke, reel in ecarts:
+                    self.stdout.write(f"❌ {champ}: snapshot={stocke} réel={reel}")
+                raise CommandError(f"{len(ecarts)} indicateur(s) incohérent(s), lancez rebuild_kpis")
+            self.stdout.write(self.style.SUCCESS("✅ Snapshot KPI cohérent"))
+            return
+        
+        snapshot = kpi.reconstruire()
+        self.stdout.write(self.style.SUCCESS(f"✅ Snapshot KPI reconstruit ({snapshot.date_mise_a_jour:%d/%m/%Y %H:%M})"))
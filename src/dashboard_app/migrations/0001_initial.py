@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KpiSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_client', models.IntegerField(default=0)),
+                ('nouveaux_clients_mois', models.IntegerField(default=0)),
+                ('clients_fideles', models.IntegerField(default=0)),
+                ('total_chantiers', models.IntegerField(default=0)),
+                ('chantiers_actifs', models.IntegerField(default=0)),
+                ('chantiers_termines', models.IntegerField(default=0)),
+                ('chantiers_termine_mois', models.IntegerField(default=0)),
+                ('chantiers_en_retard', models.IntegerField(default=0)),
+                ('chiffre_affaire_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('montant_encaisse_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('contrats_non_signes', models.IntegerField(default=0)),
+                ('total_depenses_valides', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('rapports_avec_lien', models.IntegerField(default=0)),
+                ('rapports_sans_lien', models.IntegerField(default=0)),
+                ('date_reference', models.DateField(blank=True, null=True)),
+                ('date_mise_a_jour', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Snapshot KPI',
+                'verbose_name_plural': 'Snapshots KPI',
+            },
+        ),
+    ]
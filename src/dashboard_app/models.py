@@ -1,3 +1,40 @@
 from django.db import models
 
-# Create your models here.
+
+class KpiSnapshot(models.Model):
+    """Photo des indicateurs clés du dashboard
+    Une seule ligne (id=1) tenue à jour par les signaux (voir dashboard_app.signals)
+    Le dashboard lit cette ligne au lieu de recompter toutes les tables
+    """
+    #CLIENTS
+    total_client = models.IntegerField(default=0)
+    nouveaux_clients_mois = models.IntegerField(default=0)
+    clients_fideles = models.IntegerField(default=0)
+    
+    #CHANTIERS
+    total_chantiers = models.IntegerField(default=0)
+    chantiers_actifs = models.IntegerField(default=0)
+    chantiers_termines = models.IntegerField(default=0)
+    chantiers_termine_mois = models.IntegerField(default=0)
+    chantiers_en_retard = models.IntegerField(default=0)
+    
+    #FINANCES
+    chiffre_affaire_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    montant_encaisse_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    contrats_non_signes = models.IntegerField(default=0)
+    
+    #DEPENSES
+    total_depenses_valides = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    rapports_avec_lien = models.IntegerField(default=0)
+    rapports_sans_lien = models.IntegerField(default=0)
+    
+    #date_reference = jour de calcul des indicateurs qui dépendent de la date (mois courant, retard)
+    date_reference = models.DateField(null=True, blank=True)
+    date_mise_a_jour = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Snapshot KPI"
+        verbose_name_plural = "Snapshots KPI"
+    
+    def __str__(self):
+        return f"KPI au {self.date_mise_a_jour}"
@@ -0,0 +1,74 @@
+"""MOTEUR DE SERIES TEMPORELLES
+Une seule requête GROUP BY (TruncMonth / TruncWeek) par série,
+les périodes sans données sont complétées à zéro.
+Les mois sont calculés avec relativedelta: pas de timedelta(days=30)
+qui saute ou double des mois.
+"""
+import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Count, DateField, DateTimeField
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone, formats
+
+
+PERIODES = {
+    #periode: (fonction de troncature, pas entre deux périodes, format du label)
+    'mois': (TruncMonth, relativedelta(months=1), "M y"),
+    'semaine': (TruncWeek, relativedelta(weeks=1), "d M"),
+}
+
+#Fenêtres proposées sur le dashboard (en mois)
+FENETRES_MOIS = (6, 12, 24, 36)
+
+
+def debut_de_periode(jour, periode='mois'):
+    """Premier jour de la période qui contient `jour`"""
+    if periode == 'mois':
+        return jour.replace(day=1)
+    return jour - datetime.timedelta(days=jour.weekday())  #lundi
+
+
+def serie_temporelle(queryset, champ_date, valeur=None, periode='mois', nombre=6, fin=None):
+    """Série de `nombre` périodes se terminant par celle qui contient `fin`
+    (lignes datées après `fin` ignorées)
+    
+    queryset   = les lignes à agréger (déjà filtrées: status='valide', etc.)
+    champ_date = champ DateField ou DateTimeField du modèle
+    valeur     = agrégat à calculer par période (Count('id') par défaut)
+    
+    Retourne [{'periode': date, 'label': 'oct. 25', 'valeur': float}, ...]
+    """
+    troncature, pas, format_label = PERIODES[periode]
+    valeur = valeur if valeur is not None else Count('id')
+    fin = fin or timezone.localdate()
+    
+    derniere = debut_de_periode(fin, periode)
+    premiere = derniere - pas * (nombre - 1)
+    
+    #bornes au bon type (datetime aware pour un DateTimeField), haute exclue: lendemain de `fin`
+    borne, limite = premiere, fin + datetime.timedelta(days=1)
+    if isinstance(queryset.model._meta.get_field(champ_date), DateTimeField):
+        borne = timezone.make_aware(datetime.datetime.combine(borne, datetime.time.min))
+        limite = timezone.make_aware(datetime.datetime.combine(limite, datetime.time.min))
+    
+    lignes = queryset.filter(
+        **{f'{champ_date}__gte': borne, f'{champ_date}__lt': limite}
+    ).annotate(
+        periode=troncature(champ_date, output_field=DateField())
+    ).values('periode').annotate(
+        valeur=valeur
+    ).order_by('periode')
+    
+    totaux = {ligne['periode']: ligne['valeur'] or 0 for ligne in lignes}
+    
+    serie = []
+    courante = premiere
+    while courante <= derniere:
+        serie.append({
+            'periode': courante,
+            'label': formats.date_format(courante, format_label),
+            'valeur': float(totaux.get(courante, 0)),
+        })
+        courante += pas
+    return serie
@@ -0,0 +1,47 @@
+"""Mise à jour incrémentale du snapshot KPI
+pre_save/pre_delete relisent la ligne avant l'écriture, post_save/post_delete
+en déduisent le delta de sa section (voir kpi.delta), ajouté au snapshot après
+le commit. Une écriture coûte deux lectures par pk et un UPDATE, quelle que soit
+la taille des tables.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import receiver
+
+from chantier_app.models import Chantier
+from chantier_app.transitions import statuts_modifies
+from employee_app.models import TypeDepense
+
+from . import kpi
+
+
+@receiver([pre_save, pre_delete], dispatch_uid="dashboard_kpi_avant")
+def memoriser_avant(sender, instance, **kwargs):
+    if sender not in kpi.COLONNES or kwargs.get('raw'):
+        return
+    instance._kpi_avant = kpi.lire_ligne(sender, instance.pk)
+
+
+@receiver([post_save, post_delete], dispatch_uid="dashboard_kpi_snapshot")
+def actualiser_kpi(sender, instance, signal, **kwargs):
+    if sender not in kpi.COLONNES or kwargs.get('raw'):
+        return
+    avant = getattr(instance, '_kpi_avant', None)
+    apres = kpi.lire_ligne(sender, instance.pk) if signal is post_save else None
+    if sender is TypeDepense:
+        deltas = kpi.delta_type_depense(instance.pk, avant, apres)
+    else:
+        deltas = kpi.delta(sender, avant, apres)
+    if deltas:
+        #après le commit: rien n'est ajouté pour une transaction annulée
+        transaction.on_commit(lambda: kpi.appliquer_deltas(deltas))
+
+
+@receiver(statuts_modifies, dispatch_uid="dashboard_kpi_transitions")
+def actualiser_kpi_transition(sender, ids, anciennes, **kwargs):
+    #changement de statut en masse (update(), pas de post_save), déjà après le commit:
+    #état d'avant = ligne relue + anciennes valeurs des colonnes modifiées par la transition
+    apres = kpi.lire_lignes(Chantier, ids)
+    kpi.appliquer_deltas(kpi.additionner(*(
+        kpi.delta(Chantier, {**ligne, **anciennes[pk]}, ligne) for pk, ligne in apres.items()
+    )))
@@ -1,3 +1,397 @@
-from django.test import TestCase
+import datetime
+import logging
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from auth_app.models import Personnel, Post
+from chantier_app import transitions
+from chantier_app.models import Chantier
+from client_app.models import Client
+from contrat_app.models import Contrat
+from directeur_app.models import FondDisponible
+from employee_app.models import RapportDepense, TypeDepense
+from secretaire_app.models import DemandeDecaissement
+
+from sanba_finflow import cache as cache_projet
+from sanba_finflow import profilage
+from sanba_finflow.profilage import JournalPartage
+
+from . import kpi
+from .depenses import analyser_depenses
+from .widgets import WIDGETS
+from .models import KpiSnapshot
+from .series import FENETRES_MOIS, serie_temporelle
+
+
+def creer_client(numero=0):
+    return Client.objects.create(
+        type_client='particulier', nom=f'Nom{numero}', prenom='Test', telephone='1',
+        adresse='a', ville='Ouaga', pays='BF',
+    )
+
+
+class KpiSnapshotTests(TestCase):
+
+    def test_premiere_ecriture_partielle_cree_toutes_les_sections(self):
+        """Un signal qui ne recalcule que 'chantiers' ne doit pas laisser les clients à 0"""
+        client = creer_client()
+        creer_client(1)
+        Chantier.objects.create(
+            client=client, reference='CH1', nom_chantier='C', adresse_chantier='x',
+            type_travaux='decoration', type_batiment='autre', status_chantier='en_cours',
+            date_fin_prevue=datetime.date.today(),
+        )
+        KpiSnapshot.objects.all().delete()
+
+        kpi.mettre_a_jour('chantiers')
+
+        snapshot = KpiSnapshot.objects.get(id=kpi.SNAPSHOT_ID)
+        self.assertEqual(snapshot.total_client, 2)
+        self.assertEqual(snapshot.total_chantiers, 1)
+        self.assertEqual(kpi.verifier_coherence(), [])
+
+
+class KpiIncrementalTests(TestCase):
+    """Chaque écriture ajoute son delta au snapshot, sans agrégat sur la table"""
+
+    def setUp(self):
+        kpi.reconstruire()
+
+    def ecrire(self, action):
+        sans_agregat = mock.Mock(side_effect=AssertionError("agrégat complet sur une écriture"))
+        with mock.patch.dict(kpi.SECTIONS, {nom: sans_agregat for nom in kpi.SECTIONS}):
+            with self.captureOnCommitCallbacks(execute=True):
+                resultat = action()
+        self.assertEqual(kpi.verifier_coherence(), [])
+        return resultat
+
+    def snapshot(self):
+        return KpiSnapshot.objects.get(id=kpi.SNAPSHOT_ID)
+
+    def test_chantier_cree_termine_supprime(self):
+        client = self.ecrire(creer_client)
+        chantier = self.ecrire(lambda: Chantier.objects.create(
+            client=client, reference='CH1', nom_chantier='C', adresse_chantier='x',
+            type_travaux='decoration', type_batiment='autre', status_chantier='en_cours',
+            date_fin_prevue=datetime.date.today() - datetime.timedelta(days=1),
+        ))
+        self.assertEqual((self.snapshot().chantiers_actifs, self.snapshot().chantiers_en_retard), (1, 1))
+
+        chantier.status_chantier = 'termine'
+        chantier.date_fin_reelle = datetime.date.today()
+        self.ecrire(chantier.save)
+        snapshot = self.snapshot()
+        self.assertEqual((snapshot.chantiers_actifs, snapshot.chantiers_en_retard), (0, 0))
+        self.assertEqual((snapshot.chantiers_termines, snapshot.chantiers_termine_mois), (1, 1))
+
+        self.ecrire(chantier.delete)
+        self.assertEqual(self.snapshot().total_chantiers, 0)
+
+    def test_transition_en_masse(self):
+        client = self.ecrire(creer_client)
+        chantiers = [
+            self.ecrire(lambda status=status: Chantier.objects.create(
+                client=client, reference=status, nom_chantier='C', adresse_chantier='x',
+                type_travaux='decoration', type_batiment='autre', status_chantier=status,
+                date_fin_prevue=datetime.date.today() - datetime.timedelta(days=1),
+            ))
+            for status in ('en_cours', 'suspendu', 'devis')
+        ]
+
+        self.ecrire(lambda: transitions.appliquer_en_masse('terminer', [chantier.pk for chantier in chantiers]))
+
+        snapshot = self.snapshot()
+        self.assertEqual((snapshot.chantiers_actifs, snapshot.chantiers_en_retard), (0, 0))
+        self.assertEqual((snapshot.chantiers_termines, snapshot.chantiers_termine_mois), (2, 2))
+
+    def test_montants_et_depenses(self):
+        client = self.ecrire(creer_client)
+        self.assertEqual((self.snapshot().total_client, self.snapshot().nouveaux_clients_mois), (1, 1))
+        chantier = self.ecrire(lambda: Chantier.objects.create(
+            client=client, reference='CH1', nom_chantier='C', adresse_chantier='x',
+            type_travaux='decoration', type_batiment='autre',
+        ))
+        contrat = self.ecrire(lambda: Contrat.objects.create(
+            chantier=chantier, reference_contrat='CT1', montant_total=Decimal('1000'),
+        ))
+        contrat.montant_encaisse = Decimal('400')
+        contrat.date_signature = datetime.date.today()
+        self.ecrire(contrat.save)
+        snapshot = self.snapshot()
+        self.assertEqual((snapshot.chiffre_affaire_total, snapshot.montant_encaisse_total), (1000, 400))
+        self.assertEqual(snapshot.contrats_non_signes, 0)
+
+        type_depense = TypeDepense.objects.create(nom='Ciment')
+        rapport = self.ecrire(lambda: RapportDepense.objects.create(
+            employee=Personnel.objects.create_user(username='employe', password='pw'),
+            type_depense=type_depense, prix_unitaire=Decimal('250'), quantité=2,
+            date_depense=datetime.date.today(), status='valide',
+        ))
+        self.assertEqual((self.snapshot().total_depenses_valides, self.snapshot().rapports_sans_lien), (500, 1))
+
+        #désactiver un type retire ses dépenses (agrégat limité à ce type)
+        type_depense.est_actif = False
+        self.ecrire(type_depense.save)
+        self.assertEqual(self.snapshot().total_depenses_valides, 0)
+
+        rapport.status = 'rejete'
+        self.ecrire(rapport.save)
+        self.assertEqual(self.snapshot().rapports_sans_lien, 0)
+
+
+class SerieTemporelleTests(TestCase):
+
+    def setUp(self):
+        self.client_chantier = creer_client()
+        self.numero = 0
+
+    def creer_chantier(self, debut):
+        self.numero += 1
+        return Chantier.objects.create(
+            client=self.client_chantier, reference=f'CH{self.numero}', nom_chantier='C',
+            adresse_chantier='x', type_travaux='decoration', type_batiment='autre',
+            status_chantier='en_cours', date_debut_reelle=debut,
+        )
+
+    def serie(self, **kwargs):
+        return serie_temporelle(Chantier.objects.all(), 'date_debut_reelle', **kwargs)
+
+    def test_mois_sans_donnees_completes_a_zero(self):
+        self.creer_chantier(datetime.date(2025, 1, 31))
+        self.creer_chantier(datetime.date(2025, 1, 1))
+        self.creer_chantier(datetime.date(2025, 3, 1))
+
+        serie = self.serie(nombre=3, fin=datetime.date(2025, 3, 15))
+
+        self.assertEqual(
+            [(point['periode'], point['valeur']) for point in serie],
+            [(datetime.date(2025, 1, 1), 2.0), (datetime.date(2025, 2, 1), 0.0), (datetime.date(2025, 3, 1), 1.0)],
+        )
+
+    def test_mois_calendaires_fin_de_mois_et_changement_d_annee(self):
+        """Pas de mois sauté ni doublé depuis un 31 (timedelta(days=30) le faisait)"""
+        serie = self.serie(nombre=4, fin=datetime.date(2025, 1, 31))
+        self.assertEqual(
+            [point['periode'] for point in serie],
+            [datetime.date(2024, 10, 1), datetime.date(2024, 11, 1), datetime.date(2024, 12, 1), datetime.date(2025, 1, 1)],
+        )
+
+    def test_semaines_commencent_le_lundi(self):
+        self.creer_chantier(datetime.date(2025, 1, 5))   # dimanche: semaine du 30/12
+        self.creer_chantier(datetime.date(2025, 1, 6))   # lundi
+        self.creer_chantier(datetime.date(2025, 1, 12))  # dimanche
+
+        serie = self.serie(periode='semaine', nombre=2, fin=datetime.date(2025, 1, 12))
+
+        self.assertEqual(
+            [(point['periode'], point['valeur']) for point in serie],
+            [(datetime.date(2024, 12, 30), 1.0), (datetime.date(2025, 1, 6), 2.0)],
+        )
+
+    def test_lignes_apres_fin_ignorees(self):
+        self.creer_chantier(datetime.date(2025, 3, 10))
+        self.creer_chantier(datetime.date(2025, 3, 20))  # même mois, après `fin`
+        self.creer_chantier(datetime.date(2025, 5, 1))
+
+        serie = self.serie(nombre=2, fin=datetime.date(2025, 3, 10))
+
+        self.assertEqual([point['valeur'] for point in serie], [0.0, 1.0])
+
+    def test_champ_datetime(self):
+        chantier = self.creer_chantier(None)
+        Chantier.objects.filter(id=chantier.id).update(
+            date_creation=timezone.make_aware(datetime.datetime(2025, 2, 28, 23, 30))
+        )
+
+        serie = serie_temporelle(
+            Chantier.objects.all(), 'date_creation', Count('id'), nombre=2, fin=datetime.date(2025, 3, 1)
+        )
+
+        self.assertEqual([point['valeur'] for point in serie], [1.0, 0.0])
+
+    def test_fenetres_du_dashboard(self):
+        fin = datetime.date(2025, 6, 15)
+        self.creer_chantier(datetime.date(2022, 7, 1))   # premier mois de la fenêtre de 36 mois
+        self.creer_chantier(datetime.date(2022, 6, 30))  # juste avant
+
+        for nombre in FENETRES_MOIS:
+            with self.subTest(mois=nombre):
+                serie = self.serie(nombre=nombre, fin=fin)
+                self.assertEqual(len(serie), nombre)
+                self.assertEqual(serie[-1]['periode'], datetime.date(2025, 6, 1))
+                self.assertEqual(serie[0]['periode'], datetime.date(2025, 6, 1) - relativedelta(months=nombre - 1))
+                self.assertEqual(sum(point['valeur'] for point in serie), 1.0 if nombre == 36 else 0.0)
+
+
+#cache factice: chaque appel refait les requêtes, c'est elles qu'on compte
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class AnalyseDepensesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employee = Personnel.objects.create_user(username='employe', password='pw')
+
+    def creer_types(self, categories):
+        for numero, categorie in enumerate(categories):
+            type_depense = TypeDepense.objects.create(nom=f'Type {numero}', categorie=categorie)
+            for status in ('valide', 'valide', 'soumis'):
+                RapportDepense.objects.create(
+                    employee=self.employee, type_depense=type_depense, prix_unitaire=Decimal('1000'),
+                    quantité=2, date_depense=datetime.date.today(), status=status,
+                )
+
+    def test_deux_requetes_pour_une_categorie(self):
+        self.creer_types(['materiaux'])
+        with self.assertNumQueries(2):
+            analyse = analyser_depenses()
+        self.assertEqual(analyse['total_general_depenses'], Decimal('4000'))
+
+    def test_deux_requetes_pour_toutes_les_categories(self):
+        categories = [choix for choix, _ in TypeDepense.CATEGORIE_CHOICES]
+        self.creer_types(categories * 2)
+        with self.assertNumQueries(2):
+            analyse = analyser_depenses()
+        self.assertEqual(len(analyse['depenses_par_categorie']), len(categories))
+        self.assertEqual(len(analyse['depense_par_type']), len(categories) * 2)
+        self.assertEqual(analyse['total_general_depenses'], Decimal('4000') * len(categories) * 2)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class StatistiquesCacheTests(TestCase):
+
+    def test_noms_declares_sans_liste_dans_le_cache(self):
+        cache_projet.remettre_stats_a_zero()
+        cache_projet.compter('dashboard.widget.alertes', True)
+        cache_projet.compter('dashboard.widget.alertes', False)
+        cache_projet.compter('dashboard_app.depenses.depenses_par_categorie', True)
+
+        stats = {ligne['nom']: ligne for ligne in cache_projet.lire_stats()}
+        self.assertEqual((stats['dashboard.widget.alertes']['hits'], stats['dashboard.widget.alertes']['misses']), (1, 1))
+        self.assertEqual(stats['dashboard_app.depenses.depenses_par_categorie']['hits'], 1)
+        #les widgets non encore lus figurent quand même (noms fixés à l'import)
+        self.assertEqual(stats['dashboard.widget.tableaux']['hits'] + stats['dashboard.widget.tableaux']['misses'], 0)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class VersionsModeleTests(TestCase):
+
+    def evincer(self):
+        cache.delete(cache_projet._cle_version(Client))
+
+    def test_version_evincee_ne_ressert_pas(self):
+        deja_servies = {cache_projet.version_modele(Client)}
+        cache_projet.invalider_modele(Client)
+        deja_servies.add(cache_projet.version_modele(Client))
+
+        self.evincer()
+        relue = cache_projet.version_modele(Client)
+        self.assertNotIn(relue, deja_servies)
+        deja_servies.add(relue)
+
+        self.evincer()
+        cache_projet.invalider_modele(Client)
+        self.assertNotIn(cache_projet.version_modele(Client), deja_servies)
+
+
+#cache factice: le budget doit tenir même quand rien n'est en cache
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class BudgetsRequetesTests(TestCase):
+    """Chaque vue de settings.QUERY_BUDGETS, appelée avec des données; le lanceur de tests
+    active QUERY_BUDGETS_STRICT, un dépassement lève BudgetRequetesDepasse"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.directeur = Personnel.objects.create_superuser(
+            username='boss', password='pw', email='b@x.com', post=Post.objects.create(nom="Directeur"),
+        )
+        FondDisponible.objects.create(id=1, montant=Decimal('500000'))
+        types = [TypeDepense.objects.create(nom=f'Type {numero}', categorie=categorie)
+                 for numero, categorie in enumerate(['materiaux', 'transport', 'autre'])]
+        clients = [creer_client(numero) for numero in range(4)]
+        for numero in range(6):
+            chantier = Chantier.objects.create(
+                client=clients[numero % 3], reference=f'CH{numero}', nom_chantier=f'Chantier {numero}',
+                adresse_chantier='x', type_travaux='decoration', type_batiment='autre', status_chantier='en_cours',
+            )
+            Contrat.objects.create(chantier=chantier, reference_contrat=f'C{numero}', montant_total=Decimal('100000'))
+            demande = DemandeDecaissement.objects.create(
+                demandeur=cls.directeur, chantier=chantier, montant=Decimal('1000'), motif='m', reference_demande=f'D{numero}',
+            )
+            for type_depense in types:
+                RapportDepense.objects.create(
+                    employee=cls.directeur, type_depense=type_depense, chantier=chantier, demande_decaissement=demande,
+                    prix_unitaire=Decimal('100'), date_depense=datetime.date.today(), status='valide',
+                )
+        cls.chantier, cls.client_detail = chantier, clients[0]
+        #régime normal: le snapshot KPI existe (les signaux le tiennent à jour après commit)
+        kpi.reconstruire()
+
+    def urls(self):
+        yield 'dashboard_app:dashboard-view', reverse('dashboard_app:dashboard-view')
+        for nom in WIDGETS:
+            yield 'dashboard_app:dashboard-widget', reverse('dashboard_app:dashboard-widget', args=[nom])
+        yield 'chantier_app:liste-chantier', reverse('chantier_app:liste-chantier')
+        yield 'chantier_app:detail-chantier', reverse('chantier_app:detail-chantier', args=[self.chantier.pk])
+        yield 'client_app:liste-client', reverse('client_app:liste-client')
+        yield 'client_app:detail-client', reverse('client_app:detail-client', args=[self.client_detail.pk])
+        yield 'directeur_app:directeur-view', reverse('directeur_app:directeur-view')
+        yield 'secretaire_app:secretaire-view', reverse('secretaire_app:secretaire-view')
+
+    def test_chaque_vue_tient_son_budget(self):
+        self.assertTrue(settings.QUERY_BUDGETS_STRICT)
+        self.client.force_login(self.directeur)
+        testees = set()
+        for nom, url in self.urls():
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+            testees.add(nom)
+        self.assertEqual(testees, set(settings.QUERY_BUDGETS))
+
+
+class JournalPartageTests(TestCase):
+
+    def test_rotation_suivie_par_les_autres_processus(self):
+        """Deux handlers sur le même fichier = deux workers gunicorn"""
+        with tempfile.TemporaryDirectory() as dossier:
+            fichier = os.path.join(dossier, 'logs', 'requetes.jsonl')
+            workers = [JournalPartage(fichier, maxBytes=200, backupCount=2, encoding='utf-8') for _ in range(2)]
+            try:
+                for numero in range(40):
+                    record = logging.makeLogRecord({'msg': f'{{"ligne": {numero}}}'})
+                    workers[numero % 2].emit(record)
+            finally:
+                for worker in workers:
+                    worker.close()
+
+            self.assertTrue(os.path.exists(f"{fichier}.1"))
+            self.assertFalse(os.path.exists(f"{fichier}.3"))
+            #aucun worker n'écrit dans un fichier tourné: la dernière ligne est dans le fichier courant
+            with open(fichier, encoding='utf-8') as f:
+                self.assertIn('"ligne": 39', f.read())
+            self.assertLessEqual(os.path.getsize(f"{fichier}.1"), 200 + 20)
+
+    def test_sans_fcntl_verrou_msvcrt(self):
+        """Windows: pas de module fcntl, la rotation se verrouille avec msvcrt"""
+        msvcrt = mock.Mock(LK_LOCK=1)
+        with tempfile.TemporaryDirectory() as dossier, mock.patch.object(profilage, 'fcntl', None), \
+                mock.patch.object(profilage, 'msvcrt', msvcrt, create=True):
+            fichier = os.path.join(dossier, 'requetes.jsonl')
+            worker = JournalPartage(fichier, maxBytes=200, backupCount=2, encoding='utf-8')
+            try:
+                for numero in range(20):
+                    worker.emit(logging.makeLogRecord({'msg': f'{{"ligne": {numero}}}'}))
+            finally:
+                worker.close()
+
+            self.assertTrue(os.path.exists(f"{fichier}.1"))
+        msvcrt.locking.assert_called_with(mock.ANY, msvcrt.LK_LOCK, 1)
@@ -3,5 +3,6 @@ from . import views
 
 app_name = "dashboard_app"
 urlpatterns = [
-    path("", views.DashboardView.as_view(), name="dashboard-view")
+    path("", views.DashboardView.as_view(), name="dashboard-view"),
+    path("widget/<str:nom>/", views.DashboardWidgetView.as_view(), name="dashboard-widget"),
 ]
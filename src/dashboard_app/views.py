@@ -1,22 +1,25 @@
 
-from PIL.Image import item
-from django.shortcuts import render, get_object_or_404
+from django.http import HttpResponse, Http404
+from django.shortcuts import redirect
+from django.conf import settings
+from django.template.loader import render_to_string
 from django.views.generic import TemplateView #pour les vues basées sur template
 from django.contrib.auth.mixins import LoginRequiredMixin #Sécurité : Oblige la connexion
-from django.db.models import F, Count, Sum, Avg, Q, Value, Max, DecimalField#Magie des requetes Django
-from decimal import Decimal
-from django.utils import timezone # Gestion du temps dans Django
-from django.db.models.functions import TruncMonth, Coalesce
-from datetime import timedelta #calcul des dates
-from pprint import pprint
-
+from django.db.models import F, Count, Sum, Avg, Q #Magie des requetes Django
 
 from client_app.models import Client #Modèles
-from chantier_app.models import Chantier
+from chantier_app.models import Chantier, DureeStatut
 from contrat_app.models import Contrat
-from directeur_app.models import FondDisponible
-from employee_app.models import TypeDepense, RapportDepense, Fournisseur
+from contrat_app.finances import metriques_pour_requete
+from employee_app.models import RapportDepense, Fournisseur
 from auth_app.models import Personnel
+from alerte_app.scanner import alertes_actives
+from . import kpi
+from .series import serie_temporelle, FENETRES_MOIS
+from .depenses import analyser_depenses
+from .widgets import WIDGETS, cle_widget
+from sanba_finflow.cache import lire_ou_calculer, lire_stats, remettre_stats_a_zero
+from sanba_finflow.profilage import lire_rapport
 
 import logging
  
@@ -33,122 +36,79 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     
     def get_context_data(self, **kwargs):
         """Methode Magique : Injecte des données dans le template
-        Appelée automatiquement avant d'afficjer le template
+        La page n'est plus qu'une coquille: chaque widget (alertes, KPI, graphiques,
+        tableaux) est chargé en parallèle par HTMX depuis DashboardWidgetView
         """
         # Récupère le contexte de base (toujous faire ça en premier)
         context = super().get_context_data(**kwargs)
-        
-        aujourdhui = timezone.now().date()
-        mois_courant = aujourdhui.month
-        annee_courante = aujourdhui.year 
-        
-        # 1.KPI - INDICATEURS CLES (chiffres importants)
-        context.update(self.get_kpi_metrics())
-        
-        # 2. ANALYTICS FINANCIERS(argent, CA etc.)
-        context.update(self.get_financial_analytics())
-        
-        # 3. ANALYTICS CLIENTS (qui sont nos clients)
-        context.update(self.get_client_analytics())
-        
-        # 4. ANALYTICS CHANTIERS(Performance des projets)
-        context.update(self.get_chantier_analytics())
-        
-        # 5 ANALYTICS_DEPENSE(suivis des sdepense)
-        context.update(self.get_depense_analytics())
-        
-        # 6 ALERTE & NOTIFICATIONS (ce qui nécessite attention)
-        context.update(self.get_alerts())
-        
-        
+        context['nombre_mois'] = self.get_nombre_mois()
         
         return context #Retourne tout au template
     
     def get_kpi_metrics(self):
         """INDICATEURS CLES DE PERFORMANCE (KPI = Key Performance Indicators)
         Ce sont les chiffres les plus important pour le boss
-        
+        Lus depuis le snapshot KPI (une seule ligne) au lieu de compter chaque table
         """
+        snapshot = self.get_snapshot()
         return {
             #CLIENTS
-            "total_client": Client.objects.count(), #Compte tous les cients
-            "nouveaux_clients_mois":Client.objects.filter(date_premier_contact__month=timezone.now().month).count(), # filtre nombre Clients ce mois-ci
-            'clients_fideles': Client.objects.filter(est_fidel=True).count(), #Filtre le nombre de client fidèles
+            "total_client": snapshot.total_client, #Compte tous les cients
+            "nouveaux_clients_mois": snapshot.nouveaux_clients_mois, # Clients ce mois-ci
+            'clients_fideles': snapshot.clients_fideles, #nombre de client fidèles
             
             #CHANTIERS
-            'total_chantiers': Chantier.objects.count(), #Compte tous les chantiers
-            'chantiers_actifs':Chantier.objects.filter(status_chantier="en_cours").count(), #Filtre le nombre de chantier  par status = en cours
-            'chantiers_termine_mois': Chantier.objects.filter(status_chantier="termine",date_fin_reelle__month=timezone.now().month).count(),#Filtre le nombre de chantier  par status terminée et ce mois 
+            'total_chantiers': snapshot.total_chantiers, #Compte tous les chantiers
+            'chantiers_actifs': snapshot.chantiers_actifs, #chantiers en cours
+            'chantiers_termine_mois': snapshot.chantiers_termine_mois, #chantiers terminés ce mois
             
             #FINANCES
-            'chiffre_affaire_total': Contrat.objects.aggregate(total=Sum('montant_total'))['total'] or 0,
-            'montant_encaisse_total':Contrat.objects.aggregate(total=Sum("montant_encaisse"))['total'] or 0,
+            'chiffre_affaire_total': snapshot.chiffre_affaire_total,
+            'montant_encaisse_total': snapshot.montant_encaisse_total,
+            'taux_encaisse_moyen': self.calculate_taux_encaisse(),
+            
+            #RETARDS
+            'nombre_chantier_en_retard': snapshot.chantiers_en_retard,
             
         }
+    
+    def get_nombre_mois(self):
+        """Fenêtre des graphiques en mois (?mois=12), 6 par défaut"""
+        try:
+            nombre = int(self.request.GET.get('mois', 6))
+        except ValueError:
+            nombre = 6
+        return nombre if nombre in FENETRES_MOIS else 6
+    
+    def get_snapshot(self):
+        """Snapshot KPI lu une seule fois par requête"""
+        if not hasattr(self, '_snapshot'):
+            self._snapshot = kpi.lire_snapshot()
+        return self._snapshot
         
     def get_financial_analytics(self):
         """ANALYTICS FINANCIERS AVANCES - VERSION AMÉLIORÉE"""
         
         # ===========================================
-        # 1. CA PAR MOIS (6 DERNIERS MOIS CALENDAIRES)
+        # 1. CA PAR MOIS (N DERNIERS MOIS CALENDAIRES, UNE SEULE REQUETE)
         # ===========================================
-        ca_par_mois = []
-        
-        # Obtenir la date du jour
-        today = timezone.now()
-        
-        for i in range(5, -1, -1):  # 6 derniers mois
-            # Calculer le mois cible
-            # PROBLEME: timedelta(days=30*i) donne des approximations
-            # Si aujourd'hui = 31 mars, -30 jours = 1 mars (OK)
-            # Si aujourd'hui = 31 janvier, -30 jours = 1 janvier (Problème!)
-            
-            target_date = today - timedelta(days=30*i)
-            
-            # Alternative plus précise (si tu as dateutil)
-            # target_date = today - relativedelta(months=i)
-            
-            # Filtrer les contrats du mois
-            ca_mois = Contrat.objects.filter(
-                date_signature__year=target_date.year,
-                date_signature__month=target_date.month
-            ).aggregate(
-                total=Sum('montant_total')
-            )["total"]
-            
-            # Si aucun contrat, ca_mois = None -> convertir en 0
-            ca_mois_float = float(ca_mois if ca_mois is not None else 0)
-            
-            # Format du mois : "Janv 25", "Fév 25", etc.
-            mois_formate = target_date.strftime("%b %y")
-            
-            # Stocker les données
-            ca_par_mois.append({
-                "mois": mois_formate,
-                "ca": ca_mois_float
-            })
-            
-            # DEBUG: Pour vérifier les dates
-            print(f"Mois {i}: {mois_formate}, CA: {ca_mois_float}")
-        
-        # ===========================================
-        # 2. TOP CLIENTS
-        # ===========================================
-        top_clients_ca = Client.objects.annotate(
-            total_ca=Sum('chantiers__contrats__montant_total')
-        ).exclude(
-            total_ca=None  # ou total_ca__isnull=True
-        ).order_by(
-            '-total_ca'
-        )[:5]  # Les 5 premiers seulement
+        ca_par_mois = [
+            {"mois": point['label'], "ca": point['valeur']}
+            for point in serie_temporelle(
+                Contrat.objects.all(),
+                'date_signature',
+                Sum('montant_total'),
+                nombre=self.get_nombre_mois(),
+            )
+        ]
         
         # ===========================================
-        # 3. PRÉPARER LES DONNÉES POUR TEMPLATE
+        # 2. PRÉPARER LES DONNÉES POUR TEMPLATE
         # ===========================================
         return {
             'ca_par_mois': ca_par_mois,
-            'top_clients_ca': top_clients_ca,
-            'taux_encaisse_moyen': self.calculate_taux_encaisse(),
+            'nombre_mois': self.get_nombre_mois(),
+            'fenetres_mois': FENETRES_MOIS,
         }
         
     def get_client_analytics(self):
@@ -187,10 +147,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         # ===========================================
         # 2. CHANTIERS EN RETARD (en cours + date dépassée)
         # ===========================================
-        chantiers_retard = Chantier.objects.filter(
-            status_chantier='en_cours',
-            date_fin_prevue__lt=timezone.now().date()
-        ).count()
+        chantiers_retard = self.get_snapshot().chantiers_en_retard
         
         # ===========================================
         # 3. PERFORMANCE PAR TYPE DE TRAVAUX
@@ -200,11 +157,18 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         ).values('type_travaux').annotate(
             total=Count('id'),
             budget_moyen=Avg("budget_total"),
-            duree_moyenne=Avg("duree_estimee"),
+            duree_estimee_moyenne=Avg("duree_estimee"),
             # Ajout du budget total pour référence
             budget_total=Sum("budget_total")
         ).order_by('-total')
         
+        # Durées RÉELLES: temps passé 'en cours' par chantier, précalculé par type de
+        # travaux à chaque transition (DureeStatut, une ligne par type: lecture indexée)
+        durees_reelles = {
+            ligne.type_travaux: ligne.duree_moyenne.total_seconds() / 86400
+            for ligne in DureeStatut.objects.filter(status_chantier='en_cours', chantiers__gt=0)
+        }
+        
         # ===========================================
         # 4. DONNÉES POUR RADAR CHART
         # ===========================================
@@ -214,7 +178,10 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             # Récupérer les valeurs avec gestion des None
             total = perf['total'] or 0
             budget_moyen = perf['budget_moyen'] or 0
-            duree_moyenne = perf['duree_moyenne'] or 0
+            # durée réelle si au moins un chantier de ce type a fini un passage 'en cours', sinon l'estimation
+            duree_reelle = perf['type_travaux'] in durees_reelles
+            duree_moyenne = durees_reelles[perf['type_travaux']] if duree_reelle else (perf['duree_estimee_moyenne'] or 0)
+            perf['duree_moyenne'] = duree_moyenne
             
             # Calcul de l'efficacité (budget par jour)
             if duree_moyenne > 0:
@@ -229,6 +196,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
                 'nombre': total,
                 'budget_moyen': float(budget_moyen),
                 'duree_moyenne': float(duree_moyenne),
+                'duree_reelle': duree_reelle,
                 'efficacite': float(efficacite),
                 # Données originales pour référence
                 'budget_total': float(perf['budget_total'] or 0)
@@ -271,9 +239,9 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             "performance_type_travaux": list(performance_travaux),
             "radar_performance_data": radar_data,  # AVEC LES VALEURS NORMALISÉES
             # Statistiques supplémentaires
-            "total_chantiers": Chantier.objects.count(),
-            "chantiers_actifs": Chantier.objects.filter(status_chantier='en_cours').count(),
-            "chantiers_termines": Chantier.objects.filter(status_chantier='termine').count(),
+            "total_chantiers": self.get_snapshot().total_chantiers,
+            "chantiers_actifs": self.get_snapshot().chantiers_actifs,
+            "chantiers_termines": self.get_snapshot().chantiers_termines,
         }
         
 
@@ -284,141 +252,39 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     def get_depense_analytics(self):
         """Analytics DES DEPENSES"""
        
-        # 1-################__DEPENSE PAR CATEGORIE__##############
-        fond_disponible = get_object_or_404(FondDisponible, id=1)
-        
-        # 1. DÉPENSES PAR CATÉGORIE (avec Decimal)
-        depenses_par_categorie = TypeDepense.objects.filter(
-            est_actif=True
-            ).values('categorie').annotate(
-            total_depenses=Coalesce(
-                Sum(F('rapports__prix_unitaire') * F('rapports__quantité'), 
-                    filter=Q(rapports__status='valide')),
-                Value(Decimal('0')),
-                output_field=DecimalField(max_digits=12, decimal_places=2)
-            )
-        ).filter(total_depenses__gte=0).order_by('-total_depenses')
-              
-        
-        # Calculer le TOTAL GÉNÉRAL des dépenses validées
-        total_general_depenses = Decimal('0')
-        for item in depenses_par_categorie:
-            total_general_depenses += item['total_depenses'] or Decimal('0')   
+        # 1/2-################__DEPENSE PAR CATEGORIE ET PAR TYPE (2 requêtes)__##############
+        analytics = analyser_depenses()
+        total_general_depenses = analytics['total_general_depenses']
             
-        print(f"=== DEBUG ===")
-        print(f"Total général dépenses validées: {total_general_depenses}")
-        
-        print(f"Fond disponible: {fond_disponible.montant}")    
-        
-        
-        # Ajout couleur et pourcentage
-        for item in depenses_par_categorie:
-            categorie = item['categorie'] 
-            # Couleur
-            type_dep = TypeDepense.objects.filter(
-                categorie=categorie,
-                est_actif=True
-            ).first()
-            item['couleur'] = type_dep.couleur if type_dep else '#CCCCCC'
-            
-            
-            # Pourcentage en Decimal - CORRECTION ICI
-            total_dep = item['total_depenses'] or Decimal('0')
-            
-            # Calculez le pourcentage par rapport au TOTAL DES DÉPENSES
-            if total_general_depenses > Decimal('0'):
-                # C'est ça la formule correcte pour un donut/chart
-                item['total_pourcentage'] = (total_dep * Decimal('100')) / total_general_depenses
-            else:
-                item['total_pourcentage'] = Decimal('0')
-            
-            
-            
-            # 2-################__DEPENSE PAR TYPE DETAILLE__##############
-            depense_par_type = TypeDepense.objects.filter(
-                est_actif=True,
-                rapports__status='valide'
-            ).values("nom","categorie", "couleur").annotate(
-                total_depenses_sum = Sum(F("rapports__prix_unitaire") * F("rapports__quantité")),
-                nombre_utilisation = Count("rapports"),
-                total_depenses=Sum(F("rapports__prix_unitaire") * F("rapports__quantité"))
-            ).annotate(
-                total_pourcentage =(
-                    F('total_depenses_sum')*100/total_general_depenses
-                )
-                ).order_by('-total_depenses_sum')
-            
-        # 3-################__TOTAL DEPENSES DU MOIS COURANT__##############
-        mois_courant =timezone.now().month
-        total_depenses_mois = RapportDepense.objects.filter(
-            status='valide',
-            date_depense__month=mois_courant
-        ).aggregate(
-            total = Coalesce(
+        # 4-################__ DEPENSES PAR MOIS (N derniers mois, mois vides à zéro)__##############
+        depense_par_mois_list = [
+            {'mois': point['periode'], 'total': point['valeur']}
+            for point in serie_temporelle(
+                RapportDepense.objects.filter(status='valide'),
+                'date_depense',
                 Sum(F("prix_unitaire") * F("quantité")),
-                0,
-                output_field=DecimalField(max_digits=12, decimal_places=2)
+                nombre=self.get_nombre_mois(),
             )
-        )['total'] or 0
-        
-        # 4-################__ DEPENSES PAR MOIS (6 derniers mois)__##############
-        depense_par_mois = RapportDepense.objects.filter(
-            status='valide',
-            date_depense__gte=timezone.now() - timedelta(days=180)
-        ).annotate(
-            mois = TruncMonth('date_depense')
-        ).values('mois').annotate(
-            total = Coalesce(
-                Sum(F("prix_unitaire") * F("quantité")),
-                0,
-                output_field=DecimalField(max_digits=12, decimal_places=2)
-            )
-        ).order_by('mois')
-        
-        print(f"=== NOMBRE DE MOIS DANS LA REQUÊTE: {depense_par_mois.count()} ===")
-        depense_par_mois_list = []
-        for item in depense_par_mois:
-            print(f"🔍 Mois SQL: {item['mois']}, Total: {item['total']}")
-            total_float = float(item['total'])
-            # FILTRE les totaux > 0
-            if total_float > 0:
-                depense_par_mois_list.append({
-                    'mois': item['mois'],
-                    'total': total_float
-                })
+        ]
         
         # 5-################__TOP EMPLOYES DEPENSIERS__##############
         top_employes_depense = Personnel.objects.values("username").annotate(
             employes_total_depense_sum=Sum(F("rapports_depense__prix_unitaire")*F('rapports_depense__quantité'))
         ).exclude(employes_total_depense_sum=None).order_by("-employes_total_depense_sum")
         
-        # 6-################__TOP FOURNISSEUR__##############
-        top_fournisseur = Fournisseur.objects.values('nom').annotate(
-            total_achats_sum = Sum(F("achats__prix_unitaire")*F("achats__quantité"), filter=Q(achats__status='valide')),
-            nombre_achats = Count("achats", filter=Q(achats__status='valide'))
-        ).exclude(total_achats_sum=None).order_by("-total_achats_sum")[:5] 
-        
-        
         # 7-################__RAPPORT AVEC LIEN DEMANDE DECAISSEMENT__############## 
-        rapports_avec_lien = RapportDepense.objects.filter(
-            demande_decaissement__isnull=False,
-            status='valide'
-        ).count()
+        rapports_avec_lien = self.get_snapshot().rapports_avec_lien
 
         # 7-################__RAPPORT SANS LIEN DEMANDE DECAISSEMENT__############## 
-        rapports_sans_lien = RapportDepense.objects.filter(
-            demande_decaissement__isnull=True,
-            status='valide'
-        ).count()
+        rapports_sans_lien = self.get_snapshot().rapports_sans_lien
         
         return {
-            'depenses_par_categorie':list(depenses_par_categorie),
+            'depenses_par_categorie':analytics['depenses_par_categorie'],
             'depenses_mensuelles_list':depense_par_mois_list,
             'total_depenses_mois':total_general_depenses, # Correction ici pour afficher le total général des dépenses validées du mois courant
-            'depense_par_type':depense_par_type,
+            'depense_par_type':analytics['depense_par_type'],
             'top_employes_depense':top_employes_depense,
-            'top_fournisseur':top_fournisseur,
-            'couleurs_categories':self.get_couleurs_categories(),
+            'couleurs_categories':analytics['couleurs_categories'],
             'rapports_avec_lien': rapports_avec_lien,
             'rapports_sans_lien': rapports_sans_lien,
             'taux_lien': (rapports_avec_lien / max(rapports_avec_lien + rapports_sans_lien, 1)) * 100
@@ -428,115 +294,111 @@ class DashboardView(LoginRequiredMixin, TemplateView):
 
 
     
-    def get_alerts(self):
-        """ALERTES INTELLIGENTES
-        Attire l'attention sur les problèmes importants
-        """
-        alerts = [] #list pour stocker les alertes
+    def get_classements(self):
+        """CLASSEMENTS - top clients, types de dépense et fournisseurs"""
         
-        #Chantier en retard
-        chantiers_retard = Chantier.objects.filter(Q(status_chantier="en_cours") & #filtre chantier en cours
-                                                   Q(date_fin_prevue__lt=timezone.now().date())
-                                                   )
-        if chantiers_retard.exists():
-            alerts.append({
-                'type':'warning',
-                'message':f'🚨{chantiers_retard.count()} chantier(s) en retard',
-                'lien': "https://sanba-finflow.pro/chantier/chantier/",
-            })
-            
-        #contrats non signés 
-        contrats_non_signes = Contrat.objects.filter(
-            date_signature__isnull=True #pas de date de signature
-        ).count()
-        if contrats_non_signes >0:
-            alerts.append({
-                "type":'info',
-                'message':f'{contrats_non_signes} contrats(s) en attente de signature',
-                'lien':'https://sanba-finflow.pro/contrat/contrats/' 
-            })
+        #################__TOP CLIENTS PAR CA__##############
+        top_clients_ca = Client.objects.annotate(
+            total_ca=Sum('chantiers__contrats__montant_total')
+        ).exclude(
+            total_ca=None  # ou total_ca__isnull=True
+        ).order_by(
+            '-total_ca'
+        )[:5]  # Les 5 premiers seulement
         
-        #client sans chantiers (opportunités manquées)
-        client_sans_chantiers = Client.objects.filter(chantiers__isnull=True).count()
-        if client_sans_chantiers > 0:
-            alerts.append({
-                'type':'info',
-                "message":f"{client_sans_chantiers} client(s) sans chantier",
-                'lien':'https://sanba-finflow.pro/client/client/'
-            })
+        #################__DEPENSES PAR TYPE__##############
+        analytics = analyser_depenses()
         
-        #Fonds bas
-        fond_disponible = FondDisponible.objects.get(id=1)
-        if fond_disponible.montant < 100000:
-            alerts.append({
-                "type":'danger',
-                "message":"Fonds très bas!",
-            })
-            
-        #Client Anniversaires aujourd'hui
-        clients_anniversaire = Client.objects.filter(
-            date_de_naissance__month=timezone.now().month,
-            date_de_naissance__day=timezone.now().day            
-        )
-        if clients_anniversaire.exists():
-            for nom_aniv in clients_anniversaire:
-                alerts.append({
-                    "type":"info",
-                    'message':f" Souhaitons un joyeux anniversaire au client {nom_aniv.nom}"
-                })
-                
-        # Rapports sans demande après 48h
-        from datetime import timedelta
-        rapports_tardifs = RapportDepense.objects.filter(
-            demande_decaissement__isnull=True,
-            date_creation__lte=timezone.now() - timedelta(hours=48),
-            status__in=['soumis', 'brouillon']
-        ).count()
-
-        if rapports_tardifs > 0:
-            alerts.append({
-                'type': 'warning',
-                'message': f'🚨 {rapports_tardifs} rapport(s) sans lien à une demande (>48h)',  
-                'lien': ''
-            })        
+        #################__TOP FOURNISSEUR__##############
+        top_fournisseur = Fournisseur.objects.values('nom').annotate(
+            total_achats_sum = Sum(F("achats__prix_unitaire")*F("achats__quantité"), filter=Q(achats__status='valide')),
+            nombre_achats = Count("achats", filter=Q(achats__status='valide'))
+        ).exclude(total_achats_sum=None).order_by("-total_achats_sum")[:5] 
         
         return {
-            "alerts":alerts,
-            "chantiers_en_retard":chantiers_retard,
-            "contrats_non_signes":contrats_non_signes,
-            "client_sans_chantiers":client_sans_chantiers,
-            "fond_disponible_bas":fond_disponible,
-            "clients_anniversaire":clients_anniversaire,
-            
+            'top_clients_ca': top_clients_ca,
+            'depense_par_type': analytics['depense_par_type'],
+            'top_fournisseur': top_fournisseur,
         }
+    
+    def get_alerts(self):
+        """ALERTES INTELLIGENTES
+        Attire l'attention sur les problèmes importants
+        Précalculées par alerte_app (règles + signaux + scanner): une seule requête indexée
+        """
+        return {"alerts": list(alertes_actives())}
 
 
 #Methode complement 
     def calculate_taux_encaisse(self):
-        """Calcule le taux d'encaissement moyen"""
-        contrats = Contrat.objects.all()
-        if not contrats.exists():
-            return 0
-        total_montant = sum(c.montant_total for c in contrats)
-        total_encaisse = sum(c.montant_encaisse for c in contrats)
-        
-        return (total_encaisse/total_montant*100) if total_montant>0 else 0 
+        """Calcule le taux d'encaissement moyen (un seul agrégat SQL)"""
+        return metriques_pour_requete(self.request)['taux_encaissement']
 
-    def get_couleurs_categories(self):
-       #Récupère les couleurs depuis la base
-       categories_couleurs = {}
-       
-       #Query optimisé: récupère totutes les catégories avec leur couleur
-       types = TypeDepense.objects.filter(
-           est_actif = True
-       ).values('categorie', 'couleur').distinct()
-       
-       for type_item in types:
-           categorie = type_item['categorie']
-           couleur = type_item['couleur']
-           
-           #si la catégorie n'a pas encore de couleur ou si cette couleur est définie
-           if categorie not in categories_couleurs or couleur:
-               categories_couleurs[categorie]=couleur
-               
-       return couleur
\ No newline at end of file
+
+class DashboardWidgetView(DashboardView):
+    """Un widget du dashboard rendu seul (appelé par HTMX depuis la coquille)
+    Le fragment HTML est mis en cache par widget et par fenêtre de mois;
+    la clé change dès qu'un modèle dont dépend le widget est modifié (voir signals.py)
+    """
+    
+    def get(self, request, nom, *args, **kwargs):
+        widget = WIDGETS.get(nom)
+        if widget is None:
+            raise Http404("Widget inconnu")
+        
+        def rendre():
+            context = {}
+            for section in widget['sections']:
+                context.update(getattr(self, section)())
+            return render_to_string(widget['template'], context, request=request)
+        
+        html = lire_ou_calculer(
+            f"dashboard.widget.{nom}",
+            cle_widget(nom, self.get_nombre_mois()),
+            rendre,
+            widget['ttl'],
+        )
+        return HttpResponse(html)
+
+
+class StatistiquesCacheView(TemplateView):
+    """Page d'admin (staff): succès/échecs du cache par widget ou requête
+    Branchée via admin.site.admin_view dans sanba_finflow/urls.py
+    """
+    template_name = 'dashboard_templates/cache_stats.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        stats = lire_stats()
+        context.update({
+            'title': "Statistiques du cache",
+            'stats': stats,
+            'total_hits': sum(s['hits'] for s in stats),
+            'total_misses': sum(s['misses'] for s in stats),
+            'backend': settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1],
+        })
+        return context
+    
+    def post(self, request, *args, **kwargs):
+        #remise à zéro des compteurs
+        remettre_stats_a_zero()
+        return redirect(request.path)
+
+
+class RapportRequetesView(TemplateView):
+    """Page d'admin (staff): requêtes SQL, doublons et temps de rendu par vue
+    Lit le journal de QueryProfilerMiddleware (settings.PROFILAGE_FICHIER)
+    """
+    template_name = 'dashboard_templates/profilage.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        rapport = lire_rapport()
+        context.update({
+            'title': "Profilage des requêtes",
+            'rapport': rapport,
+            'fichier': settings.PROFILAGE_FICHIER,
+            'actif': settings.PROFILAGE_ACTIF,
+            'vues_hors_budget': sum(1 for ligne in rapport if ligne['depassements']),
+        })
+        return context
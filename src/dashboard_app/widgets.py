@@ -0,0 +1,50 @@
+"""WIDGETS DU DASHBOARD
+Chaque widget (fragment HTML) a son template, sa durée de cache et la liste
+des modèles dont il dépend. La clé contient la version de chacun de ces modèles
+(sanba_finflow.cache): quand l'un d'eux change, l'ancien fragment n'est plus lu.
+"""
+from sanba_finflow.cache import cle_versionnee, declarer_stats
+
+from alerte_app.models import Alerte
+
+from client_app.models import Client
+from chantier_app.models import Chantier, DureeStatut
+from contrat_app.models import Contrat
+from employee_app.models import TypeDepense, RapportDepense, Fournisseur
+
+
+WIDGETS = {
+    'alertes': {
+        'template': 'dashboard_templates/dash_partials/_alerts.html',
+        'sections': ('get_alerts',),
+        'ttl': 60,
+        #alertes précalculées par alerte_app: le widget ne lit que cette table
+        'modeles': (Alerte,),
+    },
+    'kpi': {
+        'template': 'dashboard_templates/dash_partials/_kpi_cards.html',
+        'sections': ('get_kpi_metrics',),
+        'ttl': 300,
+        'modeles': (Client, Chantier, Contrat, RapportDepense, TypeDepense),
+    },
+    'graphiques': {
+        'template': 'dashboard_templates/dash_partials/_financial_charts.html',
+        'sections': ('get_financial_analytics', 'get_chantier_analytics', 'get_depense_analytics'),
+        'ttl': 600,
+        'modeles': (Contrat, Chantier, DureeStatut, RapportDepense, TypeDepense),
+    },
+    'tableaux': {
+        'template': 'dashboard_templates/dash_partials/_analytics_tables.html',
+        'sections': ('get_classements',),
+        'ttl': 600,
+        'modeles': (Client, Chantier, Contrat, RapportDepense, TypeDepense, Fournisseur),
+    },
+}
+
+#noms sous lesquels WidgetView compte les succès/échecs (page admin/cache-stats/)
+declarer_stats(*(f"dashboard.widget.{nom}" for nom in WIDGETS))
+
+
+def cle_widget(nom, *variantes):
+    """Clé de cache du fragment: nom + variantes (ex: fenêtre en mois) + versions des modèles"""
+    return cle_versionnee(f"dashboard:widget:{nom}", WIDGETS[nom]['modeles'], *variantes)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import FondDisponible, Historique_dajout_fond
+from .models import FondDisponible, Historique_dajout_fond, MouvementFond, SnapshotFond
 
 @admin.register(FondDisponible)
 class AdminFondDisponible(admin.ModelAdmin):
@@ -8,3 +8,22 @@ class AdminFondDisponible(admin.ModelAdmin):
 @admin.register(Historique_dajout_fond)
 class AdminHistorique_dajout_fond(admin.ModelAdmin):
     list_display = ["nom","montant", "date_ajout"]
+
+@admin.register(MouvementFond)
+class AdminMouvementFond(admin.ModelAdmin):
+    """Journal en lecture seule: on ne corrige pas un mouvement, on en ajoute un"""
+    list_display = ["date_mouvement", "type_mouvement", "montant", "solde_apres", "auteur", "demande"]
+    list_filter = ["type_mouvement"]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(SnapshotFond)
+class AdminSnapshotFond(admin.ModelAdmin):
+    list_display = ["date_snapshot", "solde", "dernier_mouvement"]
@@ -0,0 +1,148 @@
+"""OPERATIONS SUR LE FOND DISPONIBLE
+Toute modification du fond passe par ici:
+    - le solde (FondDisponible id=1) est modifié par un UPDATE ... SET montant = montant ± x
+      exécuté par la base: deux workers gunicorn ne peuvent plus s'écraser
+    - chaque opération ajoute une ligne au journal MouvementFond dans la même transaction
+    - un décaissement ne passe que si le fond suffit (UPDATE conditionnel) et si la
+      demande n'est pas déjà décaissée (UPDATE conditionnel + contrainte unique)
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from sanba_finflow.cache import invalider_modele
+from secretaire_app.models import DemandeDecaissement
+from .models import FondDisponible, Historique_dajout_fond, MouvementFond, SnapshotFond
+
+
+FOND_ID = 1
+
+
+class OperationFondImpossible(Exception):
+    """Opération refusée; le message est affichable tel quel à l'utilisateur"""
+
+
+class FondInsuffisant(OperationFondImpossible):
+    pass
+
+
+class DejaDecaisse(OperationFondImpossible):
+    pass
+
+
+def _montant_valide(montant):
+    try:
+        montant = Decimal(str(montant))
+    except (InvalidOperation, TypeError, ValueError):
+        raise OperationFondImpossible("Impossible veillez verifier la somme")
+    if not montant.is_finite() or montant <= 0:
+        raise OperationFondImpossible("Impossible veillez verifier la somme")
+    return montant
+
+
+def _bloquer_fond():
+    """Verrouille le fond jusqu'à la fin de la transaction, avant toute lecture
+    Un UPDATE sans effet plutôt que select_for_update (ignoré par SQLite, où une transaction
+    commence en lecture): verrou de la ligne sur PostgreSQL, verrou d'écriture de la base sur
+    SQLite; une opération concurrente attend son tour au lieu de lire un solde périmé
+    Si le journal est vide (fond créé après la migration), il est ouvert avec le solde actuel
+    """
+    FondDisponible.objects.filter(id=FOND_ID).update(montant=F('montant'))
+    fond = FondDisponible.objects.get(id=FOND_ID)
+    if not MouvementFond.objects.exists():
+        MouvementFond.objects.create(type_mouvement='ouverture', montant=fond.montant, solde_apres=fond.montant)
+    return fond
+
+
+def _apres_modification():
+    #le fond est modifié par update(): pas de post_save, on invalide le cache à la main
+    transaction.on_commit(lambda: invalider_modele(FondDisponible))
+
+
+#####__ LECTURE __####
+
+def solde_actuel():
+    """Solde courant: une seule ligne lue (O(1))"""
+    return FondDisponible.objects.values_list('montant', flat=True).get(id=FOND_ID)
+
+
+def solde_reconstruit():
+    """Solde recalculé depuis le journal: dernier snapshot + mouvements postérieurs"""
+    snapshot = SnapshotFond.objects.first()
+    mouvements = MouvementFond.objects.all()
+    solde = Decimal('0')
+    if snapshot is not None:
+        solde = snapshot.solde
+        if snapshot.dernier_mouvement_id is not None:
+            mouvements = mouvements.filter(id__gt=snapshot.dernier_mouvement_id)
+    return solde + (mouvements.aggregate(total=Sum('montant'))['total'] or Decimal('0'))
+
+
+#####__ ECRITURE __####
+
+def deposer(auteur, montant, type_depot=None, notes=None):
+    """Ajoute un montant au fond; retourne le nouveau solde"""
+    montant = _montant_valide(montant)
+    with transaction.atomic():
+        _bloquer_fond()
+        FondDisponible.objects.filter(id=FOND_ID).update(
+            montant=F('montant') + montant,
+            type_depot=type_depot or 'cheque',
+            notes=notes,
+            date_ajout=timezone.now(),
+        )
+        solde = solde_actuel()
+        depot = Historique_dajout_fond.objects.create(
+            nom=auteur, montant=montant, type_depot=type_depot or 'cheque', notes=notes
+        )
+        MouvementFond.objects.create(
+            type_mouvement='depot', montant=montant, solde_apres=solde, auteur=auteur, depot=depot
+        )
+        _apres_modification()
+    return solde
+
+
+def decaisser(demande_id, auteur):
+    """Décaisse une demande; retourne (demande, nouveau solde)
+    Lève DejaDecaisse, FondInsuffisant ou OperationFondImpossible
+    """
+    with transaction.atomic():
+        _bloquer_fond()
+        demande = DemandeDecaissement.objects.select_for_update().select_related('demandeur').get(id=demande_id)
+        if demande.decaisse:
+            raise DejaDecaisse("⚠️ Déjà décaissé !")
+        montant = _montant_valide(demande.montant)
+
+        #UPDATE conditionnel: ne retire que si le fond suffit au moment de l'écriture
+        if not FondDisponible.objects.filter(id=FOND_ID, montant__gte=montant).update(montant=F('montant') - montant):
+            raise FondInsuffisant("Fond inssufisant")
+
+        #un autre worker a pu décaisser la même demande entre-temps
+        maintenant = timezone.now()
+        if not DemandeDecaissement.objects.filter(id=demande.id, decaisse=False).update(
+            decaisse=True, date_decaissement=maintenant
+        ):
+            raise DejaDecaisse("⚠️ Déjà décaissé !")
+        demande.decaisse = True
+        demande.date_decaissement = maintenant
+
+        solde = solde_actuel()
+        MouvementFond.objects.create(
+            type_mouvement='retrait', montant=-montant, solde_apres=solde, auteur=auteur, demande=demande
+        )
+        _apres_modification()
+        transaction.on_commit(lambda: invalider_modele(DemandeDecaissement))
+    return demande, solde
+
+
+#####__ SNAPSHOT __####
+
+def prendre_snapshot():
+    """Fige le solde du journal; retourne (snapshot, solde du fond au même instant)"""
+    with transaction.atomic():
+        fond = _bloquer_fond()
+        dernier = MouvementFond.objects.order_by('-id').first()
+        snapshot = SnapshotFond.objects.create(solde=solde_reconstruit(), dernier_mouvement=dernier)
+    return snapshot, fond.montant
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from directeur_app import fonds
+
+
+class Command(BaseCommand):
+    help = (
+        "Fige le solde du journal des mouvements (SnapshotFond) et vérifie qu'il "
+        "correspond au fond disponible. À lancer périodiquement (cron)."
+    )
+    
+    def handle(self, *args, **options):
+        snapshot, solde_fond = fonds.prendre_snapshot()
+        if snapshot.solde != solde_fond:
+            raise CommandError(
+                f"❌ Écart: journal={snapshot.solde} FCFA, fond disponible={solde_fond} FCFA"
+            )
+        self.stdout.write(self.style.SUCCESS(f"✅ Snapshot du fond: {snapshot.solde} FCFA (cohérent)"))
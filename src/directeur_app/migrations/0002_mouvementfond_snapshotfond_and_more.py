@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directeur_app', '0001_initial'),
+        ('secretaire_app', '0003_alter_demandedecaissement_reference_demande_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MouvementFond',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_mouvement', models.CharField(choices=[('ouverture', "Solde d'ouverture"), ('depot', 'Dépôt'), ('retrait', 'Décaissement')], max_length=20)),
+                ('montant', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('solde_apres', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('date_mouvement', models.DateTimeField(auto_now_add=True)),
+                ('auteur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='mouvements_fond', to=settings.AUTH_USER_MODEL)),
+                ('demande', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='mouvements_fond', to='secretaire_app.demandedecaissement')),
+                ('depot', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='mouvement', to='directeur_app.historique_dajout_fond')),
+            ],
+            options={
+                'verbose_name': 'Mouvement du fond',
+                'verbose_name_plural': 'Mouvements du fond',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotFond',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('solde', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('date_snapshot', models.DateTimeField(auto_now_add=True)),
+                ('dernier_mouvement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='directeur_app.mouvementfond')),
+            ],
+            options={
+                'verbose_name': 'Snapshot du fond',
+                'verbose_name_plural': 'Snapshots du fond',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='mouvementfond',
+            constraint=models.UniqueConstraint(condition=models.Q(('type_mouvement', 'retrait')), fields=('demande',), name='mouvement_un_retrait_par_demande'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def ouvrir_journal(apps, schema_editor):
+    """Le journal démarre avec le solde actuel du fond (mouvement 'ouverture')"""
+    FondDisponible = apps.get_model('directeur_app', 'FondDisponible')
+    MouvementFond = apps.get_model('directeur_app', 'MouvementFond')
+    SnapshotFond = apps.get_model('directeur_app', 'SnapshotFond')
+    fond = FondDisponible.objects.filter(id=1).first()
+    if fond is None or MouvementFond.objects.exists():
+        return
+    ouverture = MouvementFond.objects.create(
+        type_mouvement='ouverture', montant=fond.montant, solde_apres=fond.montant
+    )
+    SnapshotFond.objects.create(solde=fond.montant, dernier_mouvement=ouverture)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directeur_app', '0002_mouvementfond_snapshotfond_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(ouvrir_journal, migrations.RunPython.noop),
+    ]
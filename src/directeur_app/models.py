@@ -21,4 +21,56 @@ class Historique_dajout_fond(models.Model):
     date_ajout = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f'{self.nom}--{self.montant}--{self.date_ajout}'
\ No newline at end of file
+        return f'{self.nom}--{self.montant}--{self.date_ajout}'
+
+class MouvementFond(models.Model):
+    """Journal des mouvements du fond (ajout seulement, jamais modifié ni supprimé)
+    montant signé: positif pour un dépôt, négatif pour un décaissement
+    solde_apres: solde du fond juste après ce mouvement
+    """
+    TYPE_MOUVEMENT_CHOICES = [
+        ('ouverture', "Solde d'ouverture"),
+        ('depot', 'Dépôt'),
+        ('retrait', 'Décaissement'),
+    ]
+    
+    type_mouvement = models.CharField(max_length=20, choices=TYPE_MOUVEMENT_CHOICES)
+    montant = models.DecimalField(max_digits=12, decimal_places=2)
+    solde_apres = models.DecimalField(max_digits=12, decimal_places=2)
+    auteur = models.ForeignKey(Personnel, on_delete=models.PROTECT, null=True, blank=True, related_name="mouvements_fond")
+    depot = models.OneToOneField(Historique_dajout_fond, on_delete=models.PROTECT, null=True, blank=True, related_name="mouvement")
+    demande = models.ForeignKey("secretaire_app.DemandeDecaissement", on_delete=models.PROTECT, null=True, blank=True, related_name="mouvements_fond")
+    date_mouvement = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-id']
+        verbose_name = "Mouvement du fond"
+        verbose_name_plural = "Mouvements du fond"
+        constraints = [
+            #une demande ne peut être décaissée qu'une seule fois (garde-fou au niveau de la base)
+            models.UniqueConstraint(
+                fields=['demande'],
+                condition=models.Q(type_mouvement='retrait'),
+                name='mouvement_un_retrait_par_demande',
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.get_type_mouvement_display()} {self.montant} -> {self.solde_apres}'
+
+
+class SnapshotFond(models.Model):
+    """Photo périodique du solde: solde = snapshot + mouvements postérieurs
+    Permet de vérifier FondDisponible sans relire tout le journal
+    """
+    solde = models.DecimalField(max_digits=12, decimal_places=2)
+    dernier_mouvement = models.ForeignKey(MouvementFond, on_delete=models.PROTECT, null=True, blank=True, related_name="+")
+    date_snapshot = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-id']
+        verbose_name = "Snapshot du fond"
+        verbose_name_plural = "Snapshots du fond"
+    
+    def __str__(self):
+        return f'{self.solde}--{self.date_snapshot}'
@@ -1,3 +1,112 @@
-from django.test import TestCase
+import datetime
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connection, connections
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from auth_app.models import Personnel
+from employee_app.models import RapportDepense, TypeDepense
+from secretaire_app.models import DemandeDecaissement
+
+from . import fonds
+from .models import FondDisponible, MouvementFond
+
+
+#cache factice: les agrégats du haut de page sont recalculés à chaque appel, seules les lignes varient
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class ListeRapportsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = Personnel.objects.create_superuser(username='boss', password='pw', email='b@x.com')
+        cls.type_depense = TypeDepense.objects.create(nom='Ciment')
+
+    def creer_rapports(self, nombre):
+        for _ in range(nombre):
+            RapportDepense.objects.create(
+                employee=self.utilisateur, type_depense=self.type_depense, prix_unitaire=Decimal('500'),
+                date_depense=datetime.date.today(), status='soumis', fournisseur_not_db='Quincaillerie',
+            )
+
+    def compter_requetes(self):
+        with CaptureQueriesContext(connection) as requetes:
+            reponse = self.client.get(reverse('directeur_app:rapport-depense-employee'))
+        self.assertEqual(reponse.status_code, 200)
+        return len(requetes)
+
+    def test_nombre_de_requetes_independant_du_nombre_de_lignes(self):
+        self.client.force_login(self.utilisateur)
+        self.creer_rapports(2)
+        avec_2 = self.compter_requetes()
+        self.creer_rapports(18)
+        self.assertEqual(self.compter_requetes(), avec_2)
+
+
+class FondConcurrentTests(TransactionTestCase):
+    """Dépôts et décaissements depuis plusieurs threads (comme plusieurs workers gunicorn)"""
+
+    THREADS = 6
+    OPERATIONS = 6
+
+    def setUp(self):
+        self.auteur = Personnel.objects.create_user(username='comptable', password='pw')
+        FondDisponible.objects.create(id=fonds.FOND_ID, montant=Decimal('1000'))
+        fonds.prendre_snapshot()
+        self.demandes = [
+            DemandeDecaissement.objects.create(demandeur=self.auteur, montant=Decimal('700'), motif=f'Motif {numero}')
+            for numero in range(self.THREADS * self.OPERATIONS)
+        ]
+        #demandée par tous les threads: une seule fois décaissée
+        self.commune = DemandeDecaissement.objects.create(demandeur=self.auteur, montant=Decimal('100'), motif='Commune')
+
+    def executer(self, numero, depart, erreurs):
+        try:
+            depart.wait()
+            for operation in range(self.OPERATIONS):
+                try:
+                    if operation % 2:
+                        fonds.deposer(self.auteur, '300')
+                    else:
+                        fonds.decaisser(self.demandes[numero * self.OPERATIONS + operation].id, self.auteur)
+                    fonds.decaisser(self.commune.id, self.auteur)
+                except fonds.OperationFondImpossible:
+                    pass  # fond insuffisant / déjà décaissé: refus attendus
+        except Exception as e:
+            erreurs.append(e)
+        finally:
+            connections.close_all()
+
+    def test_fond_journal_et_snapshot_restent_d_accord(self):
+        depart = threading.Barrier(self.THREADS)
+        erreurs = []
+        threads = [
+            threading.Thread(target=self.executer, args=(numero, depart, erreurs))
+            for numero in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(erreurs, [])
+
+        solde = fonds.solde_actuel()
+        self.assertEqual(solde, MouvementFond.objects.aggregate(total=Sum('montant'))['total'])
+        self.assertEqual(solde, fonds.solde_reconstruit())
+        snapshot, solde_fond = fonds.prendre_snapshot()
+        self.assertEqual((snapshot.solde, solde_fond), (solde, solde))
+        self.assertGreaterEqual(solde, 0)
+
+        #un mouvement par opération réussie, la demande commune décaissée une seule fois
+        depots = MouvementFond.objects.filter(type_mouvement='depot').count()
+        retraits = MouvementFond.objects.filter(type_mouvement='retrait')
+        self.assertEqual(depots, self.THREADS * self.OPERATIONS // 2)
+        self.assertEqual(retraits.count(), DemandeDecaissement.objects.filter(decaisse=True).count())
+        self.assertEqual(retraits.filter(demande=self.commune).count(), 1)
+        self.assertEqual(
+            solde,
+            Decimal('1000') + Decimal('300') * depots + (retraits.aggregate(total=Sum('montant'))['total'] or 0),
+        )
@@ -1,11 +1,13 @@
 from django.utils import timezone
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import CreateView, UpdateView, ListView
-from django.db.models import Sum, Count, F, Q, Value, DecimalField
+from django.db.models import Sum, Count, F, Q
 from django.db.models.functions import TruncMonth, Coalesce
 from decimal import Decimal
 
 from employee_app.models import TypeDepense
+from dashboard_app.series import serie_temporelle
+from dashboard_app import depenses as analytics_depenses
 
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
@@ -14,10 +16,16 @@ from django.contrib import messages
 import logging
 
 from .models import FondDisponible, Historique_dajout_fond
+from . import fonds
+from sanba_finflow.pagination import KeysetPaginationMixin
+from sanba_finflow.export import ExportMixin, libelle
+from recherche_app.index import rechercher
 from secretaire_app.models import DemandeDecaissement
 from employee_app.models import RapportDepense, Fournisseur
+from employee_app.factures import annoter_doublons
 from employee_app.form import ValidationRapportForm, FournisseurForm, RapportDepenseForm, updateRapportFournisseurForm
 from auth_app.form import ChangeCredentialsForm, PersonnelRegisterForm
+from alerte_app.scanner import alertes_actives
 
 
 logger = logging.getLogger(__name__)
@@ -32,7 +40,8 @@ def directeur_view(request):
             "list_demande": list_demande,
             "fond":fond.montant,
             "ch_form":ChangeCredentialsForm(request.user),
-            "form":PersonnelRegisterForm()
+            "form":PersonnelRegisterForm(),
+            "alertes":alertes_actives('directeur')[:10],
            }
     return render(request, "directeur_templates/directeur.html", ctx)
 
@@ -45,31 +54,28 @@ def ajouter_fond(request):
             fond_aj = request.POST.get("montant")
             type_depot = request.POST.get("type_depot")
             notes = request.POST.get("notes")
-            print(f'Le type de depot est de : {type_depot}')
-            fond.montant +=int(fond_aj)
-            fond.type_depot = type_depot
-            fond.notes = notes
-            fond.save()
-            historique_de_fond = Historique_dajout_fond.objects.create(nom=request.user, montant=fond_aj,
-                                                                       type_depot=type_depot, notes=notes)
-            historique_de_fond.save()
-            print('Fond ajouté avec succès')
-            if request.user.post.nom == "Comptable" :
-                messages.success(request, f"vous venez d'ajouter la somme de {fond_aj} au fond disponible ! Nouveau Capitale est de : {fond.montant}")
+            #UPDATE atomique + ligne dans le journal des mouvements (directeur_app/fonds.py)
+            nouveau_solde = fonds.deposer(request.user, fond_aj, type_depot=type_depot, notes=notes)
+            if request.user.post and request.user.post.nom == "Comptable" :
+                messages.success(request, f"vous venez d'ajouter la somme de {fond_aj} au fond disponible ! Nouveau Capitale est de : {nouveau_solde}")
                 return redirect("comptable_app:comptable-view")
             else:
-                messages.success(request, f"vous venez d'ajouter la somme de {fond_aj} au fond disponible ! Nouveau Capitale est de : {fond.montant}")
+                messages.success(request, f"vous venez d'ajouter la somme de {fond_aj} au fond disponible ! Nouveau Capitale est de : {nouveau_solde}")
                 return redirect("directeur_app:directeur-view")
-            
+        
+        except fonds.OperationFondImpossible as e:
+            messages.info(request, str(e))
         except Exception as e:
-            logger.error(f"error{e}")
+            logger.exception(f"Ajout au fond impossible: {e}")
+            messages.error(request, f"❌ Erreur lors de l'ajout au fond: {e}")
             
     return render(request, "directeur_templates/directeur.html", {"fond":fond.montant})
 
 def historique_ajout_fonf(request):
     hist_fond = Historique_dajout_fond.objects.all().order_by('-date_ajout')
     
-    hist_fond_chart=Historique_dajout_fond.objects.all().order_by('date_ajout')
+    # Ajouts de fonds par mois sur 12 mois (une seule requête GROUP BY)
+    hist_fond_chart = serie_temporelle(Historique_dajout_fond.objects.all(), 'date_ajout', Sum('montant'), nombre=12)
     # Calcul des stats
     total_ajoutes = hist_fond.aggregate(total=Sum('montant'))['total'] or 0
     moyenne_ajout = total_ajoutes / hist_fond.count() if hist_fond.count() > 0 else 0
@@ -135,10 +141,34 @@ def directeur_refuse_demande_view(request, demande_id):
 
 
 
-class ListRapportDepenseView(LoginRequiredMixin, ListView):
+class ListRapportDepenseView(LoginRequiredMixin, ExportMixin, KeysetPaginationMixin, ListView):
     model= RapportDepense
     template_name = "directeur_templates/rapport_employee.html"
     context_object_name="list_rapport_depense"
+    paginate_by = 25
+    keyset_ordering = ('-date_creation', '-id') #pagination par curseur (pas d'OFFSET)
+    
+    #?export=csv / ?export=xlsx: liste filtrée en flux (sanba_finflow.export)
+    export_nom = "rapports_depense"
+    export_colonnes = [
+        ("Date dépense", "date_depense"),
+        ("Employé", "employee__username"),
+        ("Type de dépense", "type_depense__nom"),
+        ("Catégorie", "type_depense__categorie", libelle(TypeDepense.CATEGORIE_CHOICES)),
+        ("Chantier", "chantier__reference"),
+        ("Demande", "demande_decaissement__reference_demande"),
+        ("Article", "materiau_article"),
+        ("Prix unitaire", "prix_unitaire"),
+        ("Quantité", "quantité"),
+        ("Total", "total_export"),
+        ("Fournisseur", "fournisseur_export"),
+        ("Statut", "status", libelle(RapportDepense.STATUS_RAPPORT_CHOICES)),
+        ("Créé le", "date_creation"),
+    ]
+    export_annotations = {
+        "total_export": F("prix_unitaire") * F("quantité"),
+        "fournisseur_export": Coalesce("fournisseur__nom", "fournisseur_not_db"),
+    }
     
     def get_template_names(self) -> list[str]:
         if self.request.headers.get('HX-request'):
@@ -151,51 +181,45 @@ class ListRapportDepenseView(LoginRequiredMixin, ListView):
        context["TYPE_DEPENSE_CHOICES"]=TypeDepense.CATEGORIE_CHOICES
        context['validation_form'] = ValidationRapportForm()
        context["fournisseur_form"] = FournisseurForm()
-       context["form"] = updateRapportFournisseurForm()
+       #le même formulaire est rendu dans la modale de chaque ligne: fournisseurs lus une seule fois
+       form = updateRapportFournisseurForm()
+       form.fields["fournisseur"].choices = list(form.fields["fournisseur"].choices)
+       context["form"] = form
        context["rapport_soumis"] = RapportDepense.objects.filter(status="soumis").count()
        context["fournisseur"]= RapportDepense.objects.filter(fournisseur__isnull=False).count()
-       context["depenses_par_categorie"] = depenses_par_categorie= TypeDepense.objects.filter(
-            est_actif=True
-            ).values('categorie').annotate(
-            total_depenses=Coalesce(
-                Sum(F('rapports__prix_unitaire') * F('rapports__quantité'), 
-                    filter=Q(rapports__status='valide')),
-                Value(Decimal('0')),
-                output_field=DecimalField(max_digits=12, decimal_places=2)
-            )
-        ).filter(total_depenses__gte=0).order_by('-total_depenses')
-       
-       # Calculer le TOTAL GÉNÉRAL des dépenses validées
-       total_general_depenses = Decimal('0')
-       for item in depenses_par_categorie:
-            total_general_depenses += item['total_depenses'] or Decimal('0')  
+       # dépenses validées par catégorie + total général (une requête)
+       depenses_par_categorie, total_general_depenses = analytics_depenses.depenses_par_categorie()
+       context["depenses_par_categorie"] = depenses_par_categorie
        context['total_general_depenses_valide']=total_general_depenses
        
-       queryset = self.get_queryset()
-       total_general_depenses_filter = queryset.aggregate(
+       #total sur toute la liste filtrée (pas seulement la page affichée)
+       total_general_depenses_filter = self.object_list.order_by().aggregate(
             total=(Sum(F('prix_unitaire') * F('quantité')))
        )
        context['total_general_depenses_filter'] = total_general_depenses_filter['total'] or Decimal('0')
        return context
 
     def get_queryset(self):
-        queryset= RapportDepense.objects.all().order_by("-date_creation")
+        queryset= RapportDepense.objects.select_related(
+            'employee', 'type_depense', 'chantier', 'demande_decaissement', 'fournisseur',
+        ).order_by("-date_creation")
         #filtrer rapport par status
         status = self.request.GET.get('status')
         if status:
-            queryset = RapportDepense.objects.filter(status=status)
+            queryset = queryset.filter(status=status)
             
             
             
         #filter par type depense 
         type_depense = self.request.GET.get('type_depense') 
         if type_depense:
-            queryset = RapportDepense.objects.filter(type_depense__categorie=type_depense)    
+            queryset = queryset.filter(type_depense__categorie=type_depense)    
             
         #recherche
         search = self.request.GET.get('q')
         if search:
-            queryset = RapportDepense.objects.filter(
+            #index plein texte (recherche_app), icontains seulement hors SQLite
+            queryset = rechercher(queryset, search,
                 Q(demande_decaissement__reference_demande__icontains=search)|
                 Q(employee__username__icontains=search)|
                 Q(chantier__client__nom__icontains=search)|
@@ -204,7 +228,8 @@ class ListRapportDepenseView(LoginRequiredMixin, ListView):
                 Q(type_depense__categorie__icontains=(search).lower())
             )
             
-        return queryset
+        #badge "doublon" quand la même facture figure sur un autre rapport
+        return annoter_doublons(queryset)
     
 
         
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import TypeDepense, Fournisseur, RapportDepense
+from .models import TypeDepense, Fournisseur, RapportDepense, TeleversementFacture
 
 @admin.register(TypeDepense)
 class AdminTypeDepense(admin.ModelAdmin):
@@ -17,3 +17,9 @@ class AdminRapportDepense(admin.ModelAdmin):
     #search_fields=["employee", "materiau_article"]
     list_filter=["type_depense"]
  
+
+
+@admin.register(TeleversementFacture)
+class AdminTeleversementFacture(admin.ModelAdmin):
+    list_display = ["nom_original", "employee", "rapport", "type_mime", "recu", "taille", "date_mise_a_jour"]
+    readonly_fields = ["rapport", "employee", "nom_original", "type_mime", "taille", "recu"]
@@ -0,0 +1,200 @@
+"""TRAITEMENT DES IMAGES DE FACTURE (Pillow)
+A l'upload (RapportDepenseForm.clean_facture), le type réel est lu dans les premiers
+octets (detecter_type): un PDF ou un classeur Excel est gardé tel quel, une image:
+    - l'orientation EXIF est appliquée aux pixels (photo de téléphone tournée)
+    - l'image est réduite à FACTURE_DIMENSION_MAX px et réencodée en WebP (JPEG si
+      Pillow n'a pas WebP): quelques centaines de Ko au lieu de plusieurs Mo
+    - le fichier est nommé par le hash de son contenu: son URL ne change jamais de
+      contenu, nginx peut la mettre en cache "immutable"
+Les miniatures des listes sont générées plus tard par le worker
+`manage.py generer_miniatures --boucle`.
+
+HEIC (iPhone): lu seulement si le paquet pillow-heif est installé.
+"""
+import hashlib
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Exists, OuterRef
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+try:
+    from pillow_heif import register_heif_opener
+except ImportError:
+    register_heif_opener = None
+else:
+    register_heif_opener()
+
+from stockage_app.models import Blob
+from stockage_app.stockage import empreinte
+from .models import MINIATURE_IMPOSSIBLE, RapportDepense
+
+
+logger = logging.getLogger(__name__)
+
+DIMENSION_MAX = getattr(settings, 'FACTURE_DIMENSION_MAX', 2000)
+DIMENSION_MINIATURE = getattr(settings, 'FACTURE_DIMENSION_MINIATURE', 320)
+QUALITE = 80
+
+FORMAT_SORTIE, EXTENSION = ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+#type -> extension du fichier final
+TYPES_ACCEPTES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/heic': 'heic',
+    'application/pdf': 'pdf',
+    XLSX: 'xlsx',
+}
+TYPES_IMAGE = {'image/jpeg', 'image/png', 'image/webp', 'image/heic'}
+
+
+def detecter_type(debut):
+    """Type réel d'après les premiers octets du fichier (16 suffisent), ou None"""
+    if debut.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if debut.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if debut[:4] == b'RIFF' and debut[8:12] == b'WEBP':
+        return 'image/webp'
+    if debut[4:8] == b'ftyp' and debut[8:12] in (b'heic', b'heix', b'hevc', b'mif1', b'msf1'):
+        return 'image/heic'
+    if debut.startswith(b'%PDF-'):
+        return 'application/pdf'
+    if debut.startswith(b'PK\x03\x04'):
+        return XLSX
+    return None
+
+
+class ImageIllisible(Exception):
+    """Le fichier n'est pas une image que Pillow sait lire (ou elle est trop grande)"""
+
+
+def _ouvrir(fichier, dimension):
+    try:
+        fichier.seek(0)
+        image = Image.open(fichier)
+        #JPEG: décodage directement à une échelle réduite (beaucoup moins de mémoire)
+        image.draft('RGB', (dimension, dimension))
+        return ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ImageIllisible(str(e))
+
+
+def _encoder(image, dimension):
+    image.thumbnail((dimension, dimension))  # garde les proportions, n'agrandit jamais
+    transparence = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if transparence and FORMAT_SORTIE == 'WEBP' else 'RGB')
+    tampon = BytesIO()
+    if FORMAT_SORTIE == 'WEBP':
+        image.save(tampon, 'WEBP', quality=QUALITE, method=4)
+    else:
+        image.save(tampon, 'JPEG', quality=QUALITE, optimize=True, progressive=True)
+    return tampon.getvalue()
+
+
+def _fichier_par_contenu(octets):
+    return ContentFile(octets, name=f"{hashlib.sha256(octets).hexdigest()[:32]}.{EXTENSION}")
+
+
+def normaliser(fichier):
+    """Fichier uploadé -> ContentFile WebP/JPEG borné, nommé par hash
+    Lève ImageIllisible si ce n'est pas une image lisible
+    """
+    return _fichier_par_contenu(_encoder(_ouvrir(fichier, DIMENSION_MAX), DIMENSION_MAX))
+
+
+#####__ DOUBLONS __####
+
+def rapports_meme_facture(chemin, exclure=None):
+    """Autres rapports qui pointent vers le même fichier (index rapport_facture_idx)"""
+    rapports = RapportDepense.objects.filter(facture=chemin).select_related('employee')
+    if exclure is not None:
+        rapports = rapports.exclude(pk=exclure)
+    return list(rapports.order_by('-date_creation')[:5])
+
+
+def rapports_doublons(fichier, exclure=None):
+    """Rapports déjà soumis avec exactement cette facture, avant même de l'enregistrer:
+    le hash du contenu est cherché par clé primaire dans les blobs
+    """
+    chemin = Blob.objects.filter(sha256=empreinte(fichier), references__gt=0).values_list('chemin', flat=True).first()
+    if chemin is None:
+        return []
+    return rapports_meme_facture(chemin, exclure)
+
+
+def annoter_doublons(queryset):
+    """Ajoute facture_en_double: un autre rapport a la même facture (dépense probablement déclarée deux fois)"""
+    return queryset.annotate(facture_en_double=Exists(
+        RapportDepense.objects.filter(facture=OuterRef('facture'), facture__gt='').exclude(pk=OuterRef('pk'))
+    ))
+
+
+def message_doublons(doublons):
+    references = ", ".join(
+        f"n°{r.pk} de {r.employee.username} du {r.date_creation:%d/%m/%Y}" for r in doublons
+    )
+    return f"⚠️ Cette facture a déjà été envoyée (rapport {references}): vérifiez qu'il ne s'agit pas d'une dépense en double"
+
+
+#####__ MINIATURES (worker) __####
+
+def rapports_sans_miniature():
+    #index partiel rapport_miniature_a_faire_idx: seulement les lignes en attente
+    return RapportDepense.objects.filter(miniature='', facture__gt='').order_by('id')
+
+
+def _miniature_existante(rapport):
+    """Miniature déjà faite pour la même facture (stockée une fois, partagée par plusieurs rapports)"""
+    nom = (
+        RapportDepense.objects.filter(facture=rapport.facture.name).exclude(pk=rapport.pk)
+        .exclude(miniature__in=['', MINIATURE_IMPOSSIBLE]).values_list('miniature', flat=True).first()
+    )
+    return nom if nom and rapport.miniature.storage.exists(nom) else None
+
+
+def generer_miniature(rapport):
+    """Crée (ou réutilise) la miniature d'un rapport; retourne True si elle a été attachée"""
+    storage = rapport.miniature.storage
+    nom = _miniature_existante(rapport)
+    ecrite = False
+    if nom is None:
+        try:
+            with rapport.facture.open('rb') as fichier:
+                octets = _encoder(_ouvrir(fichier, DIMENSION_MINIATURE), DIMENSION_MINIATURE)
+        except (ImageIllisible, FileNotFoundError) as e:
+            #PDF, fichier manquant...: marqué pour ne pas être retenté à chaque passage
+            logger.warning(f"Miniature impossible pour le rapport {rapport.pk}: {e}")
+            RapportDepense.objects.filter(pk=rapport.pk, facture=rapport.facture.name).update(miniature=MINIATURE_IMPOSSIBLE)
+            return False
+
+        fichier = _fichier_par_contenu(octets)
+        nom = rapport.miniature.field.generate_filename(rapport, fichier.name)
+        #nommée par hash: même contenu = même fichier, pas de copie suffixée
+        if not storage.exists(nom):
+            nom = storage.save(nom, fichier)
+            ecrite = True
+    #la facture a pu être remplacée pendant le calcul: on n'écrase que si c'est la même
+    if not RapportDepense.objects.filter(pk=rapport.pk, facture=rapport.facture.name).update(miniature=nom):
+        if ecrite:
+            storage.delete(nom)
+        return False
+    return True
+
+
+def generer_lot(taille=50):
+    """Traite un lot de rapports en attente; retourne (créées, impossibles)"""
+    creees = impossibles = 0
+    for rapport in rapports_sans_miniature()[:taille]:
+        if generer_miniature(rapport):
+            creees += 1
+        else:
+            impossibles += 1
+    return creees, impossibles
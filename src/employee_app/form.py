@@ -1,10 +1,12 @@
 from django import forms
 from .models import RapportDepense
-from django.core.mail import send_mail
+from notification_app.outbox import mettre_en_file
 from django.conf import settings
 import logging
 from chantier_app.models import Chantier
 from employee_app.models import TypeDepense, Fournisseur
+from django.core.files.uploadedfile import UploadedFile
+from .factures import TYPES_IMAGE, ImageIllisible, detecter_type, normaliser, rapports_doublons
 
 logger = logging.getLogger(__name__)
 class RapportDepenseForm(forms.ModelForm):
@@ -18,6 +20,8 @@ class RapportDepenseForm(forms.ModelForm):
                  "prix_unitaire", "quantité","fournisseur_not_db", "fournisseur", "facture",
                  "note", "chantier","date_depense",
                  ]
+        #ImageField refuserait les PDF: le type est vérifié dans clean_facture
+        field_classes = {'facture': forms.FileField}
         
         widgets= {
             'materiau_article':forms.TextInput(attrs={
@@ -43,7 +47,7 @@ class RapportDepenseForm(forms.ModelForm):
             
             'facture': forms.FileInput(attrs={
                 'class': 'file-input file-input-bordered w-full',
-                'accept': 'image/*,.pdf,.jpg,.jpeg,.png'}),
+                'accept': 'image/*,.pdf,.jpg,.jpeg,.png,.xlsx'}),
             
             "note":forms.Textarea(attrs={
                 'rows':3,
@@ -59,6 +63,8 @@ class RapportDepenseForm(forms.ModelForm):
         #Récupère l'employee connecté 
         self.employee = kwargs.pop('employee', None)
         super().__init__(*args, **kwargs)
+        #rapports qui ont déjà la même facture (rempli par clean_facture, affiché par la vue)
+        self.doublons = []
         
         self.fields['type_depense'].required=True
         self.fields['prix_unitaire'].required=True
@@ -147,6 +153,28 @@ class RapportDepenseForm(forms.ModelForm):
                 
         return cleaned_data
     
+    def clean_facture(self):
+        """Nouvelle photo: redressée, réduite et réencodée en WebP avant d'être stockée
+        Type lu dans les premiers octets: PDF et XLSX sont gardés tels quels
+        """
+        facture = self.cleaned_data.get('facture')
+        if not isinstance(facture, UploadedFile):
+            return facture  # pas de nouveau fichier (ou case "effacer" cochée)
+        facture.seek(0)
+        type_mime = detecter_type(facture.read(16))
+        facture.seek(0)
+        if type_mime is None:
+            raise forms.ValidationError("Format non accepté: image, PDF ou classeur Excel (.xlsx)")
+        #l'ancienne miniature ne correspond plus: le worker en refera une (ou notera qu'il ne peut pas)
+        self.instance.miniature = ''
+        if type_mime in TYPES_IMAGE:
+            try:
+                facture = normaliser(facture)
+            except ImageIllisible:
+                raise forms.ValidationError("Image illisible ou trop grande")
+        self.doublons = rapports_doublons(facture, exclure=self.instance.pk)
+        return facture
+    
 
 
 class ValidationRapportForm(forms.ModelForm):
@@ -191,7 +219,7 @@ class ValidationRapportForm(forms.ModelForm):
             rapport.note += f"\n[VALIDE] {commentaire}"
             try:
                 # Envoi d'un email de notification à l'employé
-                send_mail(
+                mettre_en_file(
                     subject='✅ Votre rapport de dépense a été validé',
                     message=f"""
                     Bonjour {rapport.employee.username},
@@ -217,7 +245,7 @@ class ValidationRapportForm(forms.ModelForm):
             rapport.note = f'\n[REJETE] {commentaire}'
             try:
                 # Envoi d'un email de notification à l'employé
-                send_mail(
+                mettre_en_file(
                     subject='❌ Votre rapport de dépense a été rejeté',
                     message=f"""
                     Bonjour {rapport.employee.username},
@@ -246,7 +274,7 @@ class ValidationRapportForm(forms.ModelForm):
             rapport.note = f'\n[A MODIFIER {commentaire}]'
             try:
                 # Envoi d'un email de notification à l'employé
-                send_mail(
+                mettre_en_file(
                     subject='📝 Modifications requises pour votre rapport de dépense',
                     message=f"""
                     Bonjour {rapport.employee.username},
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from employee_app.factures import generer_lot
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère les miniatures des factures qui n'en ont pas encore "
+        "(employee_app.factures). --boucle pour le lancer en continu"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--boucle", action="store_true", help="Surveille les nouvelles factures indéfiniment")
+        parser.add_argument("--intervalle", type=float, default=10, help="Secondes d'attente quand il n'y a rien à faire (défaut 10)")
+        parser.add_argument("--lot", type=int, default=50, help="Rapports traités par passage (défaut 50)")
+
+    def passage(self, lot):
+        creees, impossibles = generer_lot(lot)
+        if creees or impossibles:
+            self.stdout.write(f"🖼️ {creees} miniature(s) créée(s), {impossibles} impossible(s)")
+        return creees + impossibles
+
+    def handle(self, *args, **options):
+        if not options["boucle"]:
+            #sans --boucle: vide toute la file (ex: rattrapage des anciennes factures)
+            while self.passage(options["lot"]) == options["lot"]:
+                pass
+            return
+
+        self.stdout.write(self.style.SUCCESS("✅ Générateur de miniatures démarré (Ctrl+C pour arrêter)"))
+        try:
+            while True:
+                close_old_connections()
+                #lot plein: il en reste sûrement, on enchaîne sans attendre
+                if self.passage(options["lot"]) < options["lot"]:
+                    time.sleep(options["intervalle"])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt du générateur de miniatures")
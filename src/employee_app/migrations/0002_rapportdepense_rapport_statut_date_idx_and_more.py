@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chantier_app', '0003_chantier_chantier_statut_fin_idx_and_more'),
+        ('employee_app', '0001_initial'),
+        ('secretaire_app', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rapportdepense',
+            index=models.Index(fields=['status', 'date_depense'], name='rapport_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rapportdepense',
+            index=models.Index(fields=['date_creation', 'id'], name='rapport_creation_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chantier_app', '0005_durees_statut'),
+        ('employee_app', '0002_rapportdepense_rapport_statut_date_idx_and_more'),
+        ('secretaire_app', '0003_alter_demandedecaissement_reference_demande_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rapportdepense',
+            name='miniature',
+            field=models.ImageField(blank=True, default='', editable=False, upload_to='images/photo_facture/miniatures'),
+        ),
+        migrations.AddIndex(
+            model_name='rapportdepense',
+            index=models.Index(condition=models.Q(('facture__gt', ''), ('miniature', '')), fields=['id'], name='rapport_miniature_a_faire_idx'),
+        ),
+    ]
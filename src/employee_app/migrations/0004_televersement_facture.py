@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:53
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee_app', '0003_miniature_facture'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeleversementFacture',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nom_original', models.CharField(max_length=255)),
+                ('type_mime', models.CharField(blank=True, max_length=100)),
+                ('taille', models.PositiveBigIntegerField()),
+                ('recu', models.PositiveBigIntegerField(default=0)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_mise_a_jour', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='televersements', to=settings.AUTH_USER_MODEL)),
+                ('rapport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='televersements', to='employee_app.rapportdepense')),
+            ],
+            options={
+                'verbose_name': 'Téléversement de facture',
+                'verbose_name_plural': 'Téléversements de facture',
+                'indexes': [models.Index(fields=['date_mise_a_jour'], name='televersement_maj_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:56
+
+import stockage_app.stockage
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chantier_app', '0005_durees_statut'),
+        ('employee_app', '0004_televersement_facture'),
+        ('secretaire_app', '0003_alter_demandedecaissement_reference_demande_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rapportdepense',
+            name='facture',
+            field=models.ImageField(blank=True, null=True, storage=stockage_app.stockage.stockage_blobs, upload_to='images/photo_facture'),
+        ),
+        migrations.AddIndex(
+            model_name='rapportdepense',
+            index=models.Index(fields=['facture'], name='rapport_facture_idx'),
+        ),
+    ]
@@ -1,8 +1,14 @@
+import uuid
+
 from django.db import models
 from auth_app.models import Personnel
 from chantier_app.models import Chantier
 from django.core.validators import MinValueValidator, MaxValueValidator
 from secretaire_app.models import DemandeDecaissement
+from stockage_app.stockage import stockage_blobs
+
+#valeur de RapportDepense.miniature quand la facture n'a pas pu être réduite (PDF...)
+MINIATURE_IMPOSSIBLE = "-"
 
 
 
@@ -182,10 +188,18 @@ class RapportDepense(models.Model):
                                     related_name="achats"
                                     )
     
+    #rangée par contenu (media/blobs/): une facture envoyée deux fois n'est stockée qu'une fois
     facture = models.ImageField(upload_to="images/photo_facture", 
+                                storage=stockage_blobs,
                                 null=True, 
                                 blank=True)
     
+    #générée en arrière-plan par `manage.py generer_miniatures` (voir employee_app/factures.py)
+    miniature = models.ImageField(upload_to="images/photo_facture/miniatures",
+                                  blank=True,
+                                  default='',
+                                  editable=False)
+    
     date_depense = models.DateField()
     date_creation = models.DateTimeField(auto_now_add=True)
     
@@ -201,8 +215,31 @@ class RapportDepense(models.Model):
         ordering=['-date_creation']
         verbose_name = "Rapport de depense"
         verbose_name_plural = "Rapports de depense"
+        indexes = [
+            #dépenses validées par mois: status='valide' ET date_depense >= début de fenêtre
+            models.Index(fields=['status', 'date_depense'], name='rapport_statut_date_idx'),
+            #liste paginée par curseur (-date_creation, -id)
+            models.Index(fields=['date_creation', 'id'], name='rapport_creation_idx'),
+            #file d'attente du worker de miniatures: ne contient que les rapports à traiter
+            models.Index(fields=['id'], name='rapport_miniature_a_faire_idx',
+                         condition=models.Q(miniature='', facture__gt='')),
+            #doublons: autres rapports avec exactement la même facture
+            models.Index(fields=['facture'], name='rapport_facture_idx'),
+        ]
         
         
+    @property
+    def miniature_url(self):
+        """URL de la miniature, ou None tant qu'elle n'existe pas (le template affiche alors l'original)"""
+        if self.miniature and self.miniature.name != MINIATURE_IMPOSSIBLE:
+            return self.miniature.url
+        return None
+    
+    @property
+    def facture_format(self):
+        """Extension de la facture en majuscules (WEBP, JPG, PDF...)"""
+        return self.facture.name.rsplit('.', 1)[-1].upper() if self.facture else ''
+    
     def total(self):
         """CALCUL DU TOTAL AVEC ARRONDI"""
         return round(self.prix_unitaire*self.quantité, 2)
@@ -214,3 +251,30 @@ class RapportDepense(models.Model):
     def __str__(self):
         return f'{self.employee.username}-{self.type_depense.nom} total={self.total_affichage}'
     
+
+
+class TeleversementFacture(models.Model):
+    """Téléversement par morceaux d'une facture en cours (voir employee_app/televersement.py)
+    Les octets reçus sont dans TELEVERSEMENT_DOSSIER/<id>; la ligne disparaît une fois
+    la facture rattachée au rapport (ou après TELEVERSEMENT_EXPIRATION heures sans morceau)
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    rapport = models.ForeignKey(RapportDepense, on_delete=models.CASCADE, related_name="televersements")
+    employee = models.ForeignKey(Personnel, on_delete=models.CASCADE, related_name="televersements")
+    nom_original = models.CharField(max_length=255)
+    type_mime = models.CharField(max_length=100, blank=True)  # détecté sur le premier morceau
+    taille = models.PositiveBigIntegerField()
+    recu = models.PositiveBigIntegerField(default=0)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_mise_a_jour = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Téléversement de facture"
+        verbose_name_plural = "Téléversements de facture"
+        indexes = [
+            #purge des téléversements abandonnés
+            models.Index(fields=['date_mise_a_jour'], name='televersement_maj_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.nom_original} ({self.recu}/{self.taille} octets)"
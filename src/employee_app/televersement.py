@@ -0,0 +1,252 @@
+"""TELEVERSEMENT DES FACTURES PAR MORCEAUX (reprise après coupure)
+Pour les photos lourdes envoyées depuis le chantier sur une connexion mobile:
+
+    POST   /employee/televersement/                 rapport, nom, taille, type
+        -> 201 {"id", "offset": 0, "taille_morceau"}
+    PUT    /employee/televersement/<id>/            en-tête Upload-Offset, corps = octets bruts
+        -> 200 {"offset": nouvel offset}   |  409 {"erreur", "offset": offset attendu}
+    HEAD   /employee/televersement/<id>/            -> en-tête Upload-Offset (reprise)
+    POST   /employee/televersement/<id>/terminer/   -> {"rapport", "facture": url}
+    DELETE /employee/televersement/<id>/            -> abandon
+
+    - la taille annoncée est vérifiée à l'ouverture, le vrai type (signature des
+      premiers octets, pas l'extension) sur le premier morceau
+    - chaque morceau est lu par blocs depuis la requête et ajouté au fichier:
+      ni request.body ni fichier temporaire de Django
+    - l'offset de référence est la taille du fichier sur disque: un PUT coupé au
+      milieu garde ce qui a été écrit, le client reprend là où HEAD lui dit
+    - un PUT prend un verrou exclusif (flock, msvcrt sous Windows) sur le fichier et vérifie l'offset une fois
+      le verrou obtenu: deux PUT simultanés (retry du client) ne peuvent pas s'entremêler
+    - seul un rapport encore modifiable par l'employé (STATUTS_MODIFIABLES) accepte une
+      nouvelle facture; il repasse alors en 'soumis' pour être revalidé
+    - à la fin, une image passe par factures.normaliser; un PDF/XLSX est déplacé
+      (rename) dans MEDIA_ROOT sans être recopié
+"""
+import logging
+import os
+import shutil
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .factures import TYPES_ACCEPTES, TYPES_IMAGE, ImageIllisible, detecter_type, normaliser
+from .models import TeleversementFacture
+
+try:
+    import fcntl
+except ImportError:
+    #Windows: verrou msvcrt (voir _verrouiller)
+    fcntl = None
+    import msvcrt
+
+
+logger = logging.getLogger(__name__)
+
+DOSSIER = settings.TELEVERSEMENT_DOSSIER
+TAILLE_MAX = settings.TELEVERSEMENT_TAILLE_MAX
+TAILLE_MORCEAU = settings.TELEVERSEMENT_TAILLE_MORCEAU
+TAILLE_BLOC = 64 * 1024
+
+#types annoncés par le navigateur qui ne disent rien (le premier morceau tranchera)
+TYPES_INCONNUS = {'', 'application/octet-stream', 'image/jpg', 'image/heif'}
+
+#un rapport validé ou rejeté ne change plus de facture
+STATUTS_MODIFIABLES = ('brouillon', 'soumis', 'modifier')
+
+
+class TeleversementImpossible(Exception):
+    """Requête refusée; le message est affichable tel quel à l'utilisateur"""
+    statut_http = 400
+
+
+class DecalageIncorrect(TeleversementImpossible):
+    """Le morceau ne commence pas là où le fichier s'arrête"""
+    statut_http = 409
+
+    def __init__(self, attendu):
+        super().__init__(f"Le morceau doit commencer à l'octet {attendu}")
+        self.attendu = attendu
+
+
+class TropVolumineux(TeleversementImpossible):
+    statut_http = 413
+
+
+class TypeRefuse(TeleversementImpossible):
+    statut_http = 415
+
+
+class RapportNonModifiable(TeleversementImpossible):
+    statut_http = 403
+
+
+def verifier_modifiable(rapport):
+    if rapport.status not in STATUTS_MODIFIABLES:
+        raise RapportNonModifiable(
+            f"Le rapport est {rapport.get_status_display().lower()}: sa facture ne peut plus être changée"
+        )
+
+
+def _verrouiller(fichier):
+    """Verrou exclusif sur le fichier de réception, rendu à sa fermeture"""
+    if fcntl is not None:
+        fcntl.flock(fichier, fcntl.LOCK_EX)
+    else:
+        #premier octet du fichier (les écritures restent en fin de fichier, O_APPEND)
+        fichier.seek(0)
+        try:
+            msvcrt.locking(fichier.fileno(), msvcrt.LK_LOCK, 1)
+        except OSError:
+            #LK_LOCK abandonne après 10 s: l'autre envoi est bloqué, le client réessaiera
+            raise TeleversementImpossible("Un autre envoi de ce fichier est en cours, réessayez")
+
+
+def chemin(televersement):
+    return os.path.join(DOSSIER, televersement.id.hex)
+
+
+def octets_recus(televersement):
+    try:
+        return os.path.getsize(chemin(televersement))
+    except FileNotFoundError:
+        return 0
+
+
+#####__ OUVERTURE __####
+
+def ouvrir(rapport, employee, nom, taille, type_annonce=''):
+    """Crée le téléversement (et son fichier vide) après contrôle de la taille annoncée"""
+    try:
+        taille = int(taille)
+    except (TypeError, ValueError):
+        raise TeleversementImpossible("Taille du fichier manquante")
+    if taille <= 0:
+        raise TeleversementImpossible("Fichier vide")
+    if taille > TAILLE_MAX:
+        raise TropVolumineux(f"Le fichier est trop volumineux (max {TAILLE_MAX // (1024 * 1024)}MB)")
+    if type_annonce not in TYPES_ACCEPTES and type_annonce not in TYPES_INCONNUS:
+        raise TypeRefuse("Format non supporté. Utilisez JPG, PNG, WEBP, HEIC, PDF ou XLSX")
+    verifier_modifiable(rapport)
+
+    purger_abandonnes()
+    televersement = TeleversementFacture.objects.create(
+        rapport=rapport, employee=employee, nom_original=(nom or 'facture')[:255], taille=taille,
+    )
+    os.makedirs(DOSSIER, exist_ok=True)
+    open(chemin(televersement), 'xb').close()
+    return televersement
+
+
+#####__ RECEPTION D'UN MORCEAU __####
+
+def recevoir(televersement, offset, flux, longueur):
+    """Ajoute le corps de la requête (flux, `longueur` octets) au fichier; retourne le nouvel offset
+    offset et longueur: valeurs brutes des en-têtes Upload-Offset et Content-Length
+    """
+    try:
+        offset = int(offset)
+    except (TypeError, ValueError):
+        raise DecalageIncorrect(octets_recus(televersement))
+    try:
+        longueur = int(longueur or 0)
+    except ValueError:
+        raise TeleversementImpossible("Content-Length invalide")
+    if longueur <= 0:
+        raise TeleversementImpossible("Morceau vide (Content-Length manquant)")
+    if longueur > TAILLE_MORCEAU:
+        raise TropVolumineux(f"Morceau trop gros (max {TAILLE_MORCEAU // (1024 * 1024)}MB)")
+
+    try:
+        #sans O_CREAT: un téléversement abandonné ou purgé ne renaît pas
+        fichier = os.fdopen(os.open(chemin(televersement), os.O_WRONLY | os.O_APPEND), 'ab')
+    except FileNotFoundError:
+        raise TeleversementImpossible("Téléversement expiré, recommencez l'envoi")
+    with fichier:
+        #un autre PUT sur le même fichier (retry du client) attend que celui-ci ait fini
+        _verrouiller(fichier)
+        recu = os.fstat(fichier.fileno()).st_size
+        if offset != recu:
+            raise DecalageIncorrect(recu)
+        if recu + longueur > televersement.taille:
+            raise TropVolumineux("Le morceau dépasse la taille annoncée du fichier")
+
+        try:
+            if recu == 0:
+                debut = flux.read(min(longueur, 16))
+                type_reel = detecter_type(debut)
+                if type_reel is None:
+                    raise TypeRefuse("Format non supporté. Utilisez JPG, PNG, WEBP, HEIC, PDF ou XLSX")
+                televersement.type_mime = type_reel
+                TeleversementFacture.objects.filter(id=televersement.id).update(type_mime=type_reel)
+                fichier.write(debut)
+            shutil.copyfileobj(flux, fichier, TAILLE_BLOC)
+        except OSError as e:
+            #connexion coupée: ce qui est écrit reste, le client reprendra à l'offset sur disque
+            logger.info(f"Morceau interrompu pour le téléversement {televersement.id}: {e}")
+        finally:
+            #vidé avant de mesurer (et avant de rendre le verrou à la fermeture)
+            fichier.flush()
+            recu = os.fstat(fichier.fileno()).st_size
+            TeleversementFacture.objects.filter(id=televersement.id).update(recu=recu, date_mise_a_jour=timezone.now())
+    return recu
+
+
+#####__ FIN / ABANDON __####
+
+class _FichierRecu(File):
+    """FileSystemStorage déplace (rename) les fichiers qui ont un chemin temporaire"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def terminer(televersement):
+    """Rattache le fichier complet au rapport; retourne le rapport"""
+    recu = octets_recus(televersement)
+    if recu != televersement.taille:
+        raise DecalageIncorrect(recu)
+
+    rapport = televersement.rapport
+    #le rapport a pu être validé ou rejeté depuis l'ouverture
+    rapport.refresh_from_db(fields=['status'])
+    verifier_modifiable(rapport)
+    with open(chemin(televersement), 'rb') as fichier:
+        if televersement.type_mime in TYPES_IMAGE:
+            try:
+                facture = normaliser(fichier)
+            except ImageIllisible:
+                raise TypeRefuse("Image illisible ou trop grande")
+        else:
+            #le stockage par contenu (stockage_app) le range sous son hash en le déplaçant
+            facture = _FichierRecu(fichier, name=f"{televersement.id.hex}.{TYPES_ACCEPTES[televersement.type_mime]}")
+        rapport.facture.save(facture.name, facture, save=False)
+    #l'ancienne miniature ne correspond plus: le worker en refera une
+    rapport.miniature = ''
+    #nouvelle pièce justificative: le rapport repasse en validation (comme UpdateRapportView)
+    rapport.status = 'soumis'
+    rapport.save(update_fields=['facture', 'miniature', 'status'])
+    abandonner(televersement)
+    return rapport
+
+
+def abandonner(televersement):
+    try:
+        os.remove(chemin(televersement))
+    except FileNotFoundError:
+        pass
+    televersement.delete()
+
+
+def purger_abandonnes(maintenant=None):
+    """Supprime les téléversements sans nouveau morceau depuis TELEVERSEMENT_EXPIRATION heures
+    (et les fichiers orphelins du dossier, ex: rapport supprimé entre-temps)
+    """
+    limite = (maintenant or timezone.now()) - timedelta(hours=settings.TELEVERSEMENT_EXPIRATION)
+    TeleversementFacture.objects.filter(date_mise_a_jour__lt=limite).delete()
+    if not os.path.isdir(DOSSIER):
+        return
+    for entree in os.scandir(DOSSIER):
+        if entree.is_file() and entree.stat().st_mtime < limite.timestamp():
+            os.remove(entree.path)
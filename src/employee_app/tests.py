@@ -1,3 +1,209 @@
-from django.test import TestCase
+import datetime
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from auth_app.models import Personnel
+
+from . import factures, televersement
+from .form import RapportDepenseForm
+from .models import RapportDepense, TypeDepense
+
+
+def image_png(couleur='red', taille=(800, 600)):
+    tampon = BytesIO()
+    Image.new('RGB', taille, couleur).save(tampon, 'PNG')
+    return tampon.getvalue()
+
+
+class MediaTemporaireMixin:
+    """MEDIA_ROOT dans un dossier temporaire, supprimé après la classe"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media = tempfile.mkdtemp(prefix="sanba_media_")
+        cls._media = override_settings(MEDIA_ROOT=cls.media)
+        cls._media.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._media.disable()
+        shutil.rmtree(cls.media, ignore_errors=True)
+
+
+class RapportsMixin:
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employee = Personnel.objects.create_user(username='employe', password='pw')
+        cls.type_depense = TypeDepense.objects.create(nom='Ciment')
+
+    def creer_rapport(self, **champs):
+        return RapportDepense.objects.create(
+            employee=self.employee, type_depense=self.type_depense, prix_unitaire=Decimal('500'),
+            date_depense=datetime.date.today(), **champs,
+        )
+
+
+class MiniaturesTests(MediaTemporaireMixin, RapportsMixin, TestCase):
+
+    def test_facture_partagee_une_seule_miniature(self):
+        premier = self.creer_rapport()
+        premier.facture.save('facture.png', ContentFile(image_png()), save=True)
+        #rapports qui reprennent la même pièce justificative
+        for _ in range(2):
+            self.creer_rapport(facture=premier.facture.name)
+
+        self.assertEqual(factures.generer_lot(), (3, 0))
+
+        miniatures = set(RapportDepense.objects.values_list('miniature', flat=True))
+        self.assertEqual(len(miniatures), 1)
+        dossier = os.path.join(self.media, os.path.dirname(miniatures.pop()))
+        self.assertEqual(len(os.listdir(dossier)), 1)
+
+
+class FactureFormTests(TestCase):
+
+    def clean_facture(self, nom, octets):
+        form = RapportDepenseForm(data={}, files={'facture': SimpleUploadedFile(nom, octets)})
+        form.is_valid()
+        return form.errors.get('facture'), form.cleaned_data.get('facture')
+
+    def test_pdf_garde_tel_quel(self):
+        octets = b'%PDF-1.4\n%fake\n'
+        erreurs, facture = self.clean_facture('facture.pdf', octets)
+
+        self.assertIsNone(erreurs)
+        self.assertEqual(facture.name, 'facture.pdf')
+        self.assertEqual(facture.read(), octets)
+
+    def test_image_normalisee(self):
+        erreurs, facture = self.clean_facture('photo.png', image_png(taille=(3000, 1000)))
+
+        self.assertIsNone(erreurs)
+        self.assertTrue(facture.name.endswith(f'.{factures.EXTENSION}'))
+        self.assertEqual(Image.open(facture).size, (factures.DIMENSION_MAX, 667))
+
+    def test_format_inconnu_refuse(self):
+        erreurs, facture = self.clean_facture('facture.exe', b'MZ\x90\x00')
+
+        self.assertIsNotNone(erreurs)
+        self.assertIsNone(facture)
+
+
+class FluxCoupe:
+    """Corps de requête qui s'interrompt après `octets` octets (connexion mobile coupée)"""
+
+    def __init__(self, donnees, octets):
+        self.flux = BytesIO(donnees[:octets])
+
+    def read(self, taille=-1):
+        bloc = self.flux.read(taille)
+        if not bloc:
+            raise OSError("connexion interrompue")
+        return bloc
+
+
+class TeleversementTests(MediaTemporaireMixin, RapportsMixin, TestCase):
+
+    def setUp(self):
+        dossier = os.path.join(self.media, '.televersements')
+        patch = mock.patch.object(televersement, 'DOSSIER', dossier)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.client.force_login(self.employee)
+        self.contenu = image_png(taille=(300, 200))
+
+    def ouvrir(self, rapport, taille=None):
+        reponse = self.client.post(reverse('employee_app:televersement-ouvrir'), {
+            'rapport': rapport.id, 'nom': 'facture.png', 'taille': taille or len(self.contenu),
+        })
+        return reponse
+
+    def envoyer(self, url, donnees, offset):
+        return self.client.put(
+            url, data=donnees, content_type='application/octet-stream', headers={'Upload-Offset': str(offset)},
+        )
+
+    def test_reprise_apres_coupure(self):
+        rapport = self.creer_rapport(status='modifier')
+        reponse = self.ouvrir(rapport)
+        self.assertEqual(reponse.status_code, 201)
+        url = reponse.json()['url']
+        session = televersement.TeleversementFacture.objects.get(id=reponse.json()['id'])
+
+        #PUT coupé au milieu: ce qui est arrivé reste sur disque
+        coupe = len(self.contenu) // 2
+        recu = televersement.recevoir(session, 0, FluxCoupe(self.contenu, coupe), len(self.contenu))
+        self.assertEqual(recu, coupe)
+        reponse = self.client.head(url)
+        self.assertEqual(int(reponse['Upload-Offset']), os.path.getsize(televersement.chemin(session)))
+        self.assertEqual(int(reponse['Upload-Offset']), coupe)
+
+        #le client renvoie depuis un offset périmé: 409 avec l'offset à reprendre
+        reponse = self.envoyer(url, self.contenu, 0)
+        self.assertEqual(reponse.status_code, 409)
+        self.assertEqual(reponse.json()['offset'], coupe)
+
+        reponse = self.envoyer(url, self.contenu[coupe:], coupe)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.json()['offset'], len(self.contenu))
+
+        reponse = self.client.post(reverse('employee_app:televersement-terminer', args=[session.id]))
+        self.assertEqual(reponse.status_code, 200)
+        rapport.refresh_from_db()
+        self.assertTrue(rapport.facture)
+        self.assertEqual(rapport.status, 'soumis')
+        self.assertFalse(os.path.exists(televersement.chemin(session)))
+
+    def test_signature_inconnue_refusee(self):
+        donnees = b"bonjour, ceci n'est pas une facture" * 2
+        reponse = self.ouvrir(self.creer_rapport(), taille=len(donnees))
+        reponse = self.envoyer(reponse.json()['url'], donnees, 0)
+        self.assertEqual(reponse.status_code, 415)
+
+    def test_sans_fcntl_verrou_msvcrt(self):
+        """Windows: pas de module fcntl, l'ajout d'un morceau se verrouille avec msvcrt"""
+        session = televersement.TeleversementFacture.objects.get(id=self.ouvrir(self.creer_rapport()).json()['id'])
+        msvcrt = mock.Mock(LK_LOCK=1)
+        with mock.patch.object(televersement, 'fcntl', None), \
+                mock.patch.object(televersement, 'msvcrt', msvcrt, create=True):
+            recu = televersement.recevoir(session, 0, BytesIO(self.contenu), len(self.contenu))
+        self.assertEqual(recu, len(self.contenu))
+        msvcrt.locking.assert_called_once_with(mock.ANY, msvcrt.LK_LOCK, 1)
+
+    def test_content_length_invalide(self):
+        url = self.ouvrir(self.creer_rapport()).json()['url']
+        reponse = self.client.generic(
+            'PUT', url, self.contenu, content_type='application/octet-stream',
+            headers={'Upload-Offset': '0'}, CONTENT_LENGTH='12abc',
+        )
+        self.assertEqual(reponse.status_code, 400)
+        self.assertIn('erreur', reponse.json())
+
+    def test_rapport_valide_non_modifiable(self):
+        rapport = self.creer_rapport(status='valide')
+        self.assertEqual(self.ouvrir(rapport).status_code, 403)
+
+        #validé entre l'ouverture et la fin de l'envoi
+        rapport = self.creer_rapport(status='soumis')
+        reponse = self.ouvrir(rapport)
+        url = reponse.json()['url']
+        self.assertEqual(self.envoyer(url, self.contenu, 0).status_code, 200)
+        RapportDepense.objects.filter(id=rapport.id).update(status='valide')
+        reponse = self.client.post(reverse('employee_app:televersement-terminer', args=[reponse.json()['id']]))
+        self.assertEqual(reponse.status_code, 403)
+        rapport.refresh_from_db()
+        self.assertFalse(rapport.facture)
+        self.assertEqual(rapport.status, 'valide')
@@ -8,4 +8,7 @@ urlpatterns = [
     path('Mes-rapports', views.MesRapportsView.as_view(), name='mes-rapports'),
     path('employee/du/mois', views.BestEmployeeView.as_view(), name='employee-du-mois'),
     path("modifier/<int:pk>/rapport",views.UpdateRapportView.as_view(), name='modifier-rapport'),
+    path("televersement/", views.televersement_ouvrir_view, name='televersement-ouvrir'),
+    path("televersement/<uuid:televersement_id>/", views.televersement_view, name='televersement'),
+    path("televersement/<uuid:televersement_id>/terminer/", views.televersement_terminer_view, name='televersement-terminer'),
 ]
@@ -3,14 +3,24 @@ from django.utils import timezone
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.db.models import Sum, F, Count, Q
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_http_methods, require_POST
 
 from .form import RapportDepenseForm, FournisseurForm
 from auth_app.form import ChangeCredentialsForm
 from client_app.forms import ClientForm
-from .models import RapportDepense, Fournisseur
+from .models import RapportDepense, Fournisseur, TeleversementFacture
+from . import televersement
+from .factures import message_doublons, rapports_meme_facture
 from auth_app.models import Personnel
 
+import logging
+
+logger = logging.getLogger(__name__)
+
 
 class CreerRapportDepenseView(LoginRequiredMixin, CreateView):
     """Vue pour créer les rapport de dépense"""
@@ -34,8 +44,8 @@ class CreerRapportDepenseView(LoginRequiredMixin, CreateView):
         
         context["total_rapport"]=RapportDepense.objects.filter( employee = self.request.user).count()
         # Debug: vérifier si le form a le champ facture
-        print("Champs du form:", [f.name for f in context["rapport_form"]])
-        print("Facture field:", context["rapport_form"]["facture"])
+        logger.debug("Champs du form: %s", [f.name for f in context["rapport_form"]])
+        logger.debug("Facture field: %s", context["rapport_form"]["facture"])
            
         return context
         
@@ -50,11 +60,11 @@ class CreerRapportDepenseView(LoginRequiredMixin, CreateView):
         # Vérifier l'upload de fichier
         if 'facture' in self.request.FILES:
             uploaded_file = self.request.FILES['facture']
-            print(f"✅ Fichier uploadé: {uploaded_file.name} ({uploaded_file.size} bytes)")
+            logger.debug("✅ Fichier uploadé: %s (%s bytes)", uploaded_file.name, uploaded_file.size)
             
             # Validation du fichier
             max_size = 100 * 1024 * 1024  # 100MB
-            allowed_types = ['image/jpeg', 'image/png', 'image/jpg', 'application/pdf', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet','image/heic']
+            allowed_types = ['image/jpeg', 'image/png', 'image/jpg', 'application/pdf', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet','image/heic', 'image/webp']
             
             if uploaded_file.size > max_size:
                 form.add_error('facture', 'Le fichier est trop volumineux (max 100MB)') #J'ai augmenté la limite de taille pour permettre les fichiers HEIC qui sont souvent plus volumineux
@@ -72,14 +82,16 @@ class CreerRapportDepenseView(LoginRequiredMixin, CreateView):
             self.request,
             f'✅ Rapport de {form.instance.total_affichage} soumis avec succès!'
         )
+        if form.doublons:
+            messages.warning(self.request, message_doublons(form.doublons))
         
         return response
     
     def form_invalid(self, form):
         """Debug en cas d'erreur"""
-        print("❌ Form invalid")
-        print("Errors:", form.errors)
-        print("Files:", self.request.FILES)
+        logger.debug("❌ Form invalid")
+        logger.debug("Errors: %s", form.errors)
+        logger.debug("Files: %s", self.request.FILES)
         return super().form_invalid(form)
     
     
@@ -180,8 +192,8 @@ class UpdateRapportView(LoginRequiredMixin, UpdateView):
         
         context["total_rapport"]=RapportDepense.objects.filter( employee = self.request.user).count()
         # Debug: vérifier si le form a le champ facture
-        print("Champs du form:", [f.name for f in context["rapport_form"]])
-        print("Facture field:", context["rapport_form"]["facture"])
+        logger.debug("Champs du form: %s", [f.name for f in context["rapport_form"]])
+        logger.debug("Facture field: %s", context["rapport_form"]["facture"])
            
         return context
         
@@ -196,11 +208,11 @@ class UpdateRapportView(LoginRequiredMixin, UpdateView):
         # Vérifier l'upload de fichier
         if 'facture' in self.request.FILES:
             uploaded_file = self.request.FILES['facture']
-            print(f"✅ Fichier uploadé: {uploaded_file.name} ({uploaded_file.size} bytes)")
+            logger.debug("✅ Fichier uploadé: %s (%s bytes)", uploaded_file.name, uploaded_file.size)
             
             # Validation du fichier
             max_size = 5 * 1024 * 1024  # 5MB
-            allowed_types = ['image/jpeg', 'image/png', 'image/jpg', 'application/pdf']
+            allowed_types = ['image/jpeg', 'image/png', 'image/jpg', 'application/pdf', 'image/webp']
             
             if uploaded_file.size > max_size:
                 form.add_error('facture', 'Le fichier est trop volumineux (max 5MB)')
@@ -218,13 +230,89 @@ class UpdateRapportView(LoginRequiredMixin, UpdateView):
             self.request,
             f'✅ Rapport de {form.instance.total_affichage} soumis avec succès!'
         )
+        if form.doublons:
+            messages.warning(self.request, message_doublons(form.doublons))
         
         return response
     
     def form_invalid(self, form):
         """Debug en cas d'erreur"""
-        print("❌ Form invalid")
-        print("Errors:", form.errors)
-        print("Files:", self.request.FILES)
+        logger.debug("❌ Form invalid")
+        logger.debug("Errors: %s", form.errors)
+        logger.debug("Files: %s", self.request.FILES)
         return super().form_invalid(form)
-    
\ No newline at end of file
+    
+
+
+#####__ TELEVERSEMENT PAR MORCEAUX (API JSON, voir employee_app/televersement.py) __####
+
+def _reponse_erreur(erreur):
+    donnees = {'erreur': str(erreur)}
+    if isinstance(erreur, televersement.DecalageIncorrect):
+        donnees['offset'] = erreur.attendu
+    return JsonResponse(donnees, status=erreur.statut_http)
+
+
+@login_required
+@require_POST
+def televersement_ouvrir_view(request):
+    """Ouvre un téléversement pour la facture d'un rapport de l'employé connecté"""
+    rapport = get_object_or_404(RapportDepense, id=request.POST.get('rapport'), employee=request.user)
+    try:
+        session = televersement.ouvrir(
+            rapport, request.user, request.POST.get('nom'), request.POST.get('taille'), request.POST.get('type', ''),
+        )
+    except televersement.TeleversementImpossible as e:
+        return _reponse_erreur(e)
+    return JsonResponse({
+        'id': str(session.id),
+        'offset': 0,
+        'taille': session.taille,
+        'taille_morceau': televersement.TAILLE_MORCEAU,
+        'url': reverse('employee_app:televersement', args=[session.id]),
+    }, status=201)
+
+
+@login_required
+@require_http_methods(["HEAD", "GET", "PUT", "DELETE"])
+def televersement_view(request, televersement_id):
+    """HEAD/GET: offset où reprendre; PUT: ajoute un morceau; DELETE: abandon"""
+    session = get_object_or_404(TeleversementFacture, id=televersement_id, employee=request.user)
+
+    if request.method == 'DELETE':
+        televersement.abandonner(session)
+        return HttpResponse(status=204)
+
+    if request.method == 'PUT':
+        try:
+            offset = televersement.recevoir(
+                session, request.headers.get('Upload-Offset'), request, request.META.get('CONTENT_LENGTH'),
+            )
+        except televersement.TeleversementImpossible as e:
+            return _reponse_erreur(e)
+    else:
+        offset = televersement.octets_recus(session)
+
+    reponse = JsonResponse({'offset': offset, 'taille': session.taille})
+    reponse['Upload-Offset'] = offset
+    reponse['Cache-Control'] = 'no-store'
+    return reponse
+
+
+@login_required
+@require_POST
+def televersement_terminer_view(request, televersement_id):
+    """Fichier complet: rattaché au rapport comme facture"""
+    session = get_object_or_404(
+        TeleversementFacture.objects.select_related('rapport'), id=televersement_id, employee=request.user,
+    )
+    try:
+        rapport = televersement.terminer(session)
+    except televersement.TeleversementImpossible as e:
+        return _reponse_erreur(e)
+    return JsonResponse({
+        'rapport': rapport.id,
+        'facture': rapport.facture.url,
+        #même contenu déjà rattaché à d'autres rapports: dépense probablement déclarée deux fois
+        'doublons': [r.id for r in rapports_meme_facture(rapport.facture.name, exclure=rapport.pk)],
+    })
@@ -0,0 +1,23 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import MessageSortant
+from .outbox import CORPS_EFFACE
+
+
+@admin.register(MessageSortant)
+class AdminMessageSortant(admin.ModelAdmin):
+    list_display = ["date_creation", "sujet", "statut", "tentatives", "prochain_essai", "date_envoi"]
+    list_filter = ["statut"]
+    search_fields = ["sujet", "destinataires"]
+    readonly_fields = ["date_creation", "date_envoi", "tentatives", "derniere_erreur"]
+    #le corps peut contenir des identifiants (inscription, changement de mot de passe)
+    exclude = ["corps"]
+    actions = ["remettre_en_file"]
+
+    @admin.action(description="Remettre en file d'envoi")
+    def remettre_en_file(self, request, queryset):
+        #un message abandonné n'a plus de corps: il faut le refaire depuis l'application
+        nombre = queryset.exclude(statut='envoye').exclude(corps=CORPS_EFFACE).update(
+            statut='en_attente', tentatives=0, prochain_essai=timezone.now()
+        )
+        self.message_user(request, f"{nombre} message(s) remis en file")
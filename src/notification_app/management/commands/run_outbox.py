@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notification_app.outbox import TAILLE_LOT, envoyer_lot, purger_envoyes
+
+
+class Command(BaseCommand):
+    help = (
+        "Envoie les mails en attente de la boîte d'envoi par lots, sur une seule "
+        "connexion SMTP par lot (avec reprise et délai croissant en cas d'erreur)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--une-fois", action="store_true", help="Traite les messages dus puis s'arrête")
+        parser.add_argument("--intervalle", type=float, default=5, help="Secondes entre deux passages (défaut 5)")
+        parser.add_argument("--lot", type=int, default=TAILLE_LOT, help=f"Messages par connexion SMTP (défaut {TAILLE_LOT})")
+        parser.add_argument("--purger-jours", type=int, default=30, help="Supprime les messages envoyés depuis plus de N jours (défaut 30)")
+
+    def passage(self, lot):
+        """Vide la file des messages dus, lot après lot"""
+        total_envoyes = total_echecs = 0
+        while True:
+            envoyes, echecs = envoyer_lot(lot)
+            total_envoyes += envoyes
+            total_echecs += echecs
+            #lot incomplet: plus rien de dû (les échecs sont reprogrammés plus tard)
+            if envoyes + echecs < lot:
+                break
+        if total_envoyes or total_echecs:
+            self.stdout.write(f"📧 {total_envoyes} envoyé(s), {total_echecs} en échec")
+
+    def handle(self, *args, **options):
+        purges = purger_envoyes(options["purger_jours"])
+        if purges:
+            self.stdout.write(f"🧹 {purges} message(s) envoyé(s) purgé(s)")
+
+        if options["une_fois"]:
+            self.passage(options["lot"])
+            return
+
+        self.stdout.write(self.style.SUCCESS("✅ Worker de la boîte d'envoi démarré (Ctrl+C pour arrêter)"))
+        try:
+            while True:
+                #processus long: on ne garde pas une connexion base morte entre deux passages
+                close_old_connections()
+                self.passage(options["lot"])
+                time.sleep(options["intervalle"])
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt du worker")
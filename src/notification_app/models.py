@@ -0,0 +1,35 @@
+from django.db import models
+from django.utils import timezone
+
+
+class MessageSortant(models.Model):
+    """Boîte d'envoi: une ligne par mail à envoyer
+    Les vues ne font qu'insérer la ligne; le worker `manage.py run_outbox` envoie
+    """
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('envoye', 'Envoyé'),
+        ('echec', 'Échec définitif'),
+    ]
+
+    sujet = models.CharField(max_length=255)
+    corps = models.TextField()
+    expediteur = models.CharField(max_length=255, blank=True, null=True)
+    destinataires = models.JSONField(default=list)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='en_attente')
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    prochain_essai = models.DateTimeField(default=timezone.now)
+    derniere_erreur = models.TextField(blank=True, null=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_envoi = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Message sortant"
+        verbose_name_plural = "Messages sortants"
+        indexes = [
+            #file du worker: WHERE statut='en_attente' AND prochain_essai <= now ORDER BY prochain_essai
+            models.Index(fields=['statut', 'prochain_essai'], name='message_file_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sujet} -> {', '.join(self.destinataires)} ({self.statut})"
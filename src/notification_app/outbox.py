@@ -0,0 +1,137 @@
+"""BOITE D'ENVOI DES MAILS
+Les vues n'ouvrent plus de connexion SMTP: elles insèrent une ligne MessageSortant
+(même signature que send_mail) et le worker `manage.py run_outbox` envoie par lots
+sur une seule connexion SMTP.
+
+    mettre_en_file(subject=..., message=..., from_email=..., recipient_list=[...])
+
+En cas d'erreur le message est reprogrammé avec un délai qui double à chaque essai
+(1 min, 2 min, 4 min... plafonné), puis passe en 'echec' après OUTBOX_MAX_TENTATIVES.
+La ligne est insérée dans la transaction de la vue: si la vue échoue, rien ne part.
+Le corps (qui contient parfois des identifiants) est effacé dès que le message est
+envoyé ou abandonné: la table ne garde que l'enveloppe (sujet, destinataires, statut).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import MessageSortant
+
+
+logger = logging.getLogger(__name__)
+
+TAILLE_LOT = getattr(settings, 'OUTBOX_TAILLE_LOT', 50)
+MAX_TENTATIVES = getattr(settings, 'OUTBOX_MAX_TENTATIVES', 6)
+DELAI_BASE = timedelta(seconds=getattr(settings, 'OUTBOX_DELAI_BASE', 60))
+DELAI_MAX = timedelta(seconds=getattr(settings, 'OUTBOX_DELAI_MAX', 6 * 3600))
+#un message pris par un worker est réservé ce temps-là (un autre worker ne le reprend pas)
+DUREE_RESERVATION = timedelta(minutes=5)
+#corps d'un message envoyé ou abandonné (plus de mot de passe en clair dans la base)
+CORPS_EFFACE = ""
+
+
+#####__ COTE VUES __####
+
+def mettre_en_file(subject, message, from_email=None, recipient_list=None, fail_silently=False):
+    """Remplace send_mail dans les vues: insère le message, n'envoie rien
+    Retourne le MessageSortant créé (None s'il n'y a aucun destinataire)
+    """
+    destinataires = [adresse for adresse in (recipient_list or []) if adresse]
+    if not destinataires:
+        logger.warning(f"Mail '{subject}' ignoré: aucun destinataire")
+        return None
+    return MessageSortant.objects.create(
+        sujet=subject,
+        corps=message,
+        expediteur=from_email,
+        destinataires=destinataires,
+    )
+
+
+#####__ COTE WORKER __####
+
+def delai_avant_essai(tentatives):
+    """1er échec -> DELAI_BASE, puis double à chaque échec, plafonné à DELAI_MAX"""
+    return min(DELAI_BASE * (2 ** (tentatives - 1)), DELAI_MAX)
+
+
+def _reserver(message, maintenant):
+    """UPDATE conditionnel sur prochain_essai: un seul worker gagne le message"""
+    reserve = MessageSortant.objects.filter(
+        pk=message.pk, statut='en_attente', prochain_essai=message.prochain_essai
+    ).update(prochain_essai=maintenant + DUREE_RESERVATION)
+    return bool(reserve)
+
+
+def _echec(message, erreur):
+    tentatives = message.tentatives + 1
+    definitif = tentatives >= MAX_TENTATIVES
+    MessageSortant.objects.filter(pk=message.pk).update(
+        tentatives=tentatives,
+        statut='echec' if definitif else 'en_attente',
+        prochain_essai=timezone.now() + delai_avant_essai(tentatives),
+        derniere_erreur=str(erreur)[:2000],
+        **({'corps': CORPS_EFFACE} if definitif else {}),
+    )
+    if definitif:
+        logger.error(f"Mail #{message.pk} abandonné après {tentatives} essais: {erreur}")
+    else:
+        logger.warning(f"Mail #{message.pk} essai {tentatives} échoué: {erreur}")
+
+
+def _email(message, connexion):
+    return EmailMessage(
+        subject=message.sujet,
+        body=message.corps,
+        from_email=message.expediteur or settings.DEFAULT_FROM_EMAIL,
+        to=message.destinataires,
+        connection=connexion,
+    )
+
+
+def envoyer_lot(taille=None):
+    """Envoie les messages dus sur UNE connexion SMTP; retourne (envoyés, échecs)"""
+    maintenant = timezone.now()
+    candidats = MessageSortant.objects.filter(
+        statut='en_attente', prochain_essai__lte=maintenant
+    ).order_by('prochain_essai', 'id')[:taille or TAILLE_LOT]
+    messages = [message for message in candidats if _reserver(message, maintenant)]
+    if not messages:
+        return 0, 0
+
+    envoyes = echecs = 0
+    connexion = get_connection(fail_silently=False)
+    try:
+        connexion.open()
+    except Exception as e:
+        #serveur SMTP injoignable: tout le lot est reprogrammé
+        for message in messages:
+            _echec(message, e)
+        return 0, len(messages)
+
+    try:
+        for message in messages:
+            try:
+                _email(message, connexion).send()
+            except Exception as e:
+                _echec(message, e)
+                echecs += 1
+            else:
+                MessageSortant.objects.filter(pk=message.pk).update(
+                    statut='envoye', tentatives=message.tentatives + 1,
+                    date_envoi=timezone.now(), derniere_erreur=None, corps=CORPS_EFFACE,
+                )
+                envoyes += 1
+    finally:
+        connexion.close()
+    return envoyes, echecs
+
+
+def purger_envoyes(jours):
+    """Supprime les messages envoyés depuis plus de `jours` jours; retourne le nombre supprimé"""
+    limite = timezone.now() - timedelta(days=jours)
+    supprimes, _ = MessageSortant.objects.filter(statut='envoye', date_envoi__lt=limite).delete()
+    return supprimes
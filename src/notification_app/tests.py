@@ -0,0 +1,35 @@
+from unittest import mock
+
+from django.core import mail
+from django.test import TestCase
+
+from . import outbox
+from .models import MessageSortant
+
+
+class BoiteEnvoiTests(TestCase):
+
+    def mettre_identifiants_en_file(self):
+        return outbox.mettre_en_file(
+            subject="Identifiant Temporaire", message="mot de passe = s3cret", recipient_list=['a@x.com'],
+        )
+
+    def test_corps_efface_une_fois_envoye(self):
+        message = self.mettre_identifiants_en_file()
+        self.assertEqual(outbox.envoyer_lot(), (1, 0))
+        self.assertIn("s3cret", mail.outbox[0].body)
+        message.refresh_from_db()
+        self.assertEqual((message.statut, message.corps), ('envoye', ''))
+
+    def test_corps_efface_apres_le_dernier_echec(self):
+        message = self.mettre_identifiants_en_file()
+        MessageSortant.objects.filter(pk=message.pk).update(tentatives=outbox.MAX_TENTATIVES - 2)
+        with mock.patch.object(outbox, '_email', side_effect=OSError("smtp")):
+            outbox.envoyer_lot()
+            message.refresh_from_db()
+            #échec temporaire: le corps reste pour le prochain essai
+            self.assertEqual((message.statut, message.corps), ('en_attente', "mot de passe = s3cret"))
+            MessageSortant.objects.filter(pk=message.pk).update(prochain_essai=message.date_creation)
+            outbox.envoyer_lot()
+        message.refresh_from_db()
+        self.assertEqual((message.statut, message.corps), ('echec', ''))
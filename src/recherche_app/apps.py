@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class RechercheAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'recherche_app'
+    
+    def ready(self):
+        #branche la synchronisation de l'index plein texte
+        from . import signals  # noqa: F401
@@ -0,0 +1,203 @@
+"""INDEX DE RECHERCHE PLEIN TEXTE (SQLite FTS5)
+Une ligne par objet (client, chantier, contrat, demande, rapport) avec tout le
+texte cherchable, y compris celui des objets liés (nom du client d'un chantier...).
+
+    rechercher(queryset, "élodie ouaga", q_secours)
+        -> queryset filtré par "id IN (SELECT objet_id FROM recherche_index WHERE ... MATCH ...)"
+
+Chaque mot tapé est cherché comme préfixe ("ouaga" trouve "Ouagadougou") et sans
+accents. Hors SQLite (ou si l'index n'existe pas) on retombe sur les icontains
+passés en q_secours.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from client_app.models import Client
+from chantier_app.models import Chantier
+from contrat_app.models import Contrat
+from secretaire_app.models import DemandeDecaissement
+from employee_app.models import RapportDepense
+
+
+TABLE = "recherche_index"
+
+
+def _texte(*morceaux):
+    return " ".join(str(m) for m in morceaux if m not in (None, ""))
+
+
+def _personne(personnel):
+    if personnel is None:
+        return ""
+    return _texte(personnel.username, personnel.first_name, personnel.last_name)
+
+
+def _client(client):
+    if client is None:
+        return ""
+    return _texte(client.nom, client.prenom, client.raison_sociale)
+
+
+#####__ TEXTE INDEXE PAR MODELE __####
+
+def texte_client(client):
+    #chantiers préchargés (prefetch_related) pour les lots: pas de requête par client
+    return _texte(
+        _client(client), client.ville, client.quartier, client.pays,
+        _personne(client.commercial_attache),
+        *[_texte(chantier.nom_chantier, chantier.reference) for chantier in client.chantiers.all()],
+    )
+
+
+def texte_chantier(chantier):
+    return _texte(chantier.nom_chantier, chantier.reference, _client(chantier.client))
+
+
+def texte_contrat(contrat):
+    chantier = contrat.chantier
+    return _texte(contrat.reference_contrat, chantier.nom_chantier, chantier.reference, _client(chantier.client))
+
+
+def texte_demande(demande):
+    chantier = demande.chantier
+    return _texte(
+        demande.reference_demande, demande.motif, demande.montant,
+        _personne(demande.demandeur),
+        chantier.nom_chantier if chantier else "",
+        chantier.reference if chantier else "",
+        demande.approuve_par.post.nom if demande.approuve_par and demande.approuve_par.post else "",
+    )
+
+
+def texte_rapport(rapport):
+    chantier = rapport.chantier
+    return _texte(
+        rapport.demande_decaissement.reference_demande if rapport.demande_decaissement else "",
+        _personne(rapport.employee),
+        _client(chantier.client) if chantier else "",
+        chantier.nom_chantier if chantier else "",
+        chantier.reference if chantier else "",
+        rapport.type_depense.categorie if rapport.type_depense else "",
+    )
+
+
+#modèle -> (fonction de texte, select_related pour la réindexation complète)
+DOCUMENTS = {
+    Client: (texte_client, ('commercial_attache',)),  # + prefetch des chantiers
+    Chantier: (texte_chantier, ('client',)),
+    Contrat: (texte_contrat, ('chantier__client',)),
+    DemandeDecaissement: (texte_demande, ('demandeur', 'chantier', 'approuve_par__post')),
+    RapportDepense: (texte_rapport, ('demande_decaissement', 'employee', 'chantier__client', 'type_depense')),
+}
+
+
+#champs de l'objet lui-même qui entrent dans son texte: un save qui n'en change aucun ne réindexe rien
+CHAMPS_INDEXES = {
+    Client: ('nom', 'prenom', 'raison_sociale', 'ville', 'quartier', 'pays', 'commercial_attache'),
+    Chantier: ('nom_chantier', 'reference', 'client'),
+    Contrat: ('reference_contrat', 'chantier'),
+    DemandeDecaissement: ('reference_demande', 'motif', 'montant', 'demandeur', 'chantier', 'approuve_par'),
+    RapportDepense: ('demande_decaissement', 'employee', 'chantier', 'type_depense'),
+}
+
+#parmi eux, ceux repris dans le texte d'autres objets (voir signals.objets_dependants)
+CHAMPS_PARTAGES = {
+    Client: ('nom', 'prenom', 'raison_sociale'),
+    Chantier: ('nom_chantier', 'reference', 'client'),
+    DemandeDecaissement: ('reference_demande',),
+}
+
+
+def precharger(queryset):
+    """select_related/prefetch_related nécessaires au texte de chaque objet du queryset"""
+    queryset = queryset.select_related(*DOCUMENTS[queryset.model][1])
+    if queryset.model is Client:
+        queryset = queryset.prefetch_related('chantiers')
+    return queryset
+
+
+def _type(modele):
+    return modele._meta.label_lower
+
+
+#####__ DISPONIBILITE __####
+
+def index_disponible():
+    """Vrai si la base est SQLite et que la table FTS5 existe (migration appliquée)"""
+    if connection.vendor != 'sqlite':
+        return False
+    #seul le succès est mémorisé: la table peut apparaître en cours de processus (migrate)
+    if not getattr(connection, '_recherche_index_ok', False):
+        connection._recherche_index_ok = TABLE in connection.introspection.table_names()
+    return connection._recherche_index_ok
+
+
+#####__ ECRITURE __####
+
+def indexer(*objets):
+    """(Ré)indexe les objets; deux requêtes en tout quel que soit leur nombre"""
+    objets = [objet for objet in objets if type(objet) in DOCUMENTS]
+    if not objets or not index_disponible():
+        return
+    cles = [(_type(type(objet)), objet.pk) for objet in objets]
+    with connection.cursor() as curseur:
+        curseur.executemany(f"DELETE FROM {TABLE} WHERE type = %s AND objet_id = %s", cles)
+        curseur.executemany(
+            f"INSERT INTO {TABLE} (type, objet_id, contenu) VALUES (%s, %s, %s)",
+            [(*cle, DOCUMENTS[type(objet)][0](objet)) for cle, objet in zip(cles, objets)],
+        )
+
+
+def desindexer(modele, pk):
+    if not index_disponible():
+        return
+    with connection.cursor() as curseur:
+        curseur.execute(f"DELETE FROM {TABLE} WHERE type = %s AND objet_id = %s", [_type(modele), pk])
+
+
+def reindexer_tout(taille_lot=500):
+    """Vide et reconstruit l'index; retourne {label: nombre d'objets indexés}"""
+    if not index_disponible():
+        return {}
+    resultat = {}
+    with connection.cursor() as curseur:
+        curseur.execute(f"DELETE FROM {TABLE}")
+        for modele, (fonction_texte, _) in DOCUMENTS.items():
+            objets = precharger(modele.objects.all())
+            lignes = [
+                (_type(modele), objet.pk, fonction_texte(objet))
+                for objet in objets.iterator(chunk_size=taille_lot)
+            ]
+            curseur.executemany(f"INSERT INTO {TABLE} (type, objet_id, contenu) VALUES (%s, %s, %s)", lignes)
+            resultat[_type(modele)] = len(lignes)
+    return resultat
+
+
+def est_vide():
+    with connection.cursor() as curseur:
+        curseur.execute(f"SELECT 1 FROM {TABLE} LIMIT 1")
+        return curseur.fetchone() is None
+
+
+#####__ LECTURE __####
+
+def expression_fts(texte):
+    """'Élodie  ouaga' -> '"Élodie"* "ouaga"*' (tous les mots, en préfixe)"""
+    mots = re.findall(r"\w+", texte or "")
+    return " ".join(f'"{mot}"*' for mot in mots)
+
+
+def rechercher(queryset, texte, q_secours):
+    """Filtre le queryset sur le texte: index FTS5 si disponible, sinon q_secours (icontains)"""
+    expression = expression_fts(texte)
+    if not expression:
+        return queryset
+    if not index_disponible():
+        return queryset.filter(q_secours).distinct()
+    correspondances = RawSQL(
+        f"SELECT objet_id FROM {TABLE} WHERE {TABLE} MATCH %s AND type = %s",
+        (expression, _type(queryset.model)),
+    )
+    return queryset.filter(pk__in=correspondances)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recherche_app import index
+
+
+class Command(BaseCommand):
+    help = "Reconstruit entièrement l'index de recherche plein texte (FTS5)"
+    
+    def handle(self, *args, **options):
+        if not index.index_disponible():
+            raise CommandError(
+                "Index plein texte indisponible (base non SQLite ou migration recherche_app non appliquée): "
+                "la recherche utilise icontains"
+            )
+        for label, nombre in index.reindexer_tout().items():
+            self.stdout.write(f"  {label}: {nombre}")
+        self.stdout.write(self.style.SUCCESS("✅ Index de recherche reconstruit"))
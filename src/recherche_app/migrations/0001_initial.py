@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+#FTS5: index plein texte de SQLite
+#unicode61 remove_diacritics 2 => "elodie" trouve "Élodie", "ete" trouve "Été"
+CREATE_INDEX = """
+CREATE VIRTUAL TABLE IF NOT EXISTS recherche_index USING fts5(
+    type UNINDEXED,
+    objet_id UNINDEXED,
+    contenu,
+    tokenize = "unicode61 remove_diacritics 2"
+)
+"""
+
+DROP_INDEX = "DROP TABLE IF EXISTS recherche_index"
+
+
+#le remplissage initial se fait au post_migrate (voir signals.remplir_index_si_vide),
+#une fois toutes les migrations des autres apps appliquées
+def creer_index(apps, schema_editor):
+    #sur une autre base (PostgreSQL...) la recherche retombe sur icontains
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE_INDEX)
+
+
+def supprimer_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
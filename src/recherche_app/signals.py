@@ -0,0 +1,96 @@
+"""Synchronisation de l'index plein texte
+Écrit dans la même transaction que la modification (même base SQLite):
+si la transaction est annulée, l'index l'est aussi.
+
+Avant chaque save, les valeurs en base des champs indexés (index.CHAMPS_INDEXES)
+sont relues: un save qui n'en change aucun (statut, montant encaissé, facture...)
+ne touche pas à l'index, et les objets dépendants ne sont réindexés que si un
+champ qu'ils reprennent (index.CHAMPS_PARTAGES) a changé.
+"""
+from django.db.models.signals import post_save, post_delete, post_migrate, pre_save
+from django.dispatch import receiver
+
+from client_app.models import Client
+from chantier_app.models import Chantier
+from contrat_app.models import Contrat
+from employee_app.models import RapportDepense
+from secretaire_app.models import DemandeDecaissement
+
+from . import index
+
+
+def objets_dependants(objet, client_initial=None):
+    """Objets dont le texte indexé contient celui de `objet` (ex: nom du client d'un chantier)
+    Chargés par lots avec leurs relations (index.precharger)
+    """
+    if isinstance(objet, Client):
+        return [
+            *index.precharger(Chantier.objects.filter(client=objet)),
+            *index.precharger(Contrat.objects.filter(chantier__client=objet)),
+            *index.precharger(RapportDepense.objects.filter(chantier__client=objet)),
+        ]
+    if isinstance(objet, Chantier):
+        #changé de client: l'ancien ne doit plus être trouvé par le nom de ce chantier
+        clients = {objet.client_id, client_initial} - {None}
+        return [
+            *index.precharger(Client.objects.filter(pk__in=clients)),
+            *index.precharger(Contrat.objects.filter(chantier=objet)),
+            *index.precharger(DemandeDecaissement.objects.filter(chantier=objet)),
+            *index.precharger(RapportDepense.objects.filter(chantier=objet)),
+        ]
+    if isinstance(objet, DemandeDecaissement):
+        return list(index.precharger(RapportDepense.objects.filter(demande_decaissement=objet)))
+    return []
+
+
+def _attnames(modele, champs):
+    return [modele._meta.get_field(champ).attname for champ in champs]
+
+
+@receiver(pre_save, dispatch_uid="recherche_etat_initial")
+def memoriser_etat_initial(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or sender not in index.CHAMPS_INDEXES or instance._state.adding:
+        return
+    attnames = _attnames(sender, index.CHAMPS_INDEXES[sender])
+    if update_fields is not None and not {sender._meta.get_field(c).attname for c in update_fields} & set(attnames):
+        #ex: save(update_fields=['status']): rien d'indexé ne peut changer, pas de lecture
+        instance._recherche_initial = {}
+        return
+    instance._recherche_initial = sender.objects.filter(pk=instance.pk).values(*attnames).first()
+
+
+@receiver(post_save, dispatch_uid="recherche_indexer")
+def indexer_objet(sender, instance, created=False, raw=False, **kwargs):
+    if raw or sender not in index.DOCUMENTS:
+        return
+    initial = instance.__dict__.pop('_recherche_initial', None)
+    if created or initial is None:
+        #nouvel objet (ou état initial inconnu): tout est considéré comme modifié
+        modifies = set(_attnames(sender, index.CHAMPS_INDEXES[sender]))
+    else:
+        modifies = {attname for attname, valeur in initial.items() if getattr(instance, attname) != valeur}
+    if not modifies:
+        return
+    index.indexer(instance)
+    if modifies & set(_attnames(sender, index.CHAMPS_PARTAGES.get(sender, ()))):
+        client_initial = (initial or {}).get('client_id') if sender is Chantier else None
+        index.indexer(*objets_dependants(instance, client_initial))
+
+
+@receiver(post_delete, dispatch_uid="recherche_desindexer")
+def desindexer_objet(sender, instance, **kwargs):
+    if sender not in index.DOCUMENTS:
+        return
+    index.desindexer(sender, instance.pk)
+    if isinstance(instance, Chantier):
+        #le client ne doit plus être trouvé par le nom de ce chantier
+        index.indexer(*index.precharger(Client.objects.filter(pk=instance.client_id)))
+
+
+@receiver(post_migrate, dispatch_uid="recherche_remplir_index")
+def remplir_index_si_vide(sender, **kwargs):
+    """Premier migrate (ou index perdu): indexe les données déjà en base"""
+    if sender.name != 'recherche_app' or not index.index_disponible():
+        return
+    if index.est_vide():
+        index.reindexer_tout()
@@ -0,0 +1,66 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from chantier_app.models import Chantier
+from client_app.models import Client
+from contrat_app.models import Contrat
+
+from . import index
+
+
+def creer_client(nom):
+    return Client.objects.create(
+        type_client='particulier', nom=nom, prenom='Test', telephone='1', adresse='a', ville='Ouaga', pays='BF',
+    )
+
+
+def creer_chantier(client, reference):
+    return Chantier.objects.create(
+        client=client, reference=reference, nom_chantier=f'Chantier {reference}', adresse_chantier='x',
+        type_travaux='decoration', type_batiment='autre',
+    )
+
+
+class SynchronisationIndexTests(TestCase):
+
+    def trouves(self, modele, texte):
+        return set(index.rechercher(modele.objects.all(), texte, None).values_list('pk', flat=True))
+
+    def requetes_index(self, requetes):
+        return [q['sql'] for q in requetes.captured_queries if index.TABLE in q['sql']]
+
+    def test_save_sans_champ_indexe_ne_touche_pas_l_index(self):
+        client = creer_client('Ouedraogo')
+        creer_chantier(client, 'CH1')
+        client.telephone = '2'
+        with CaptureQueriesContext(connection) as requetes:
+            client.save()
+        self.assertEqual(self.requetes_index(requetes), [])
+
+    def test_renommer_un_client_reindexe_ses_dependants_par_lots(self):
+        client = creer_client('Ouedraogo')
+        chantiers = [creer_chantier(client, f'CH{numero}') for numero in range(2)]
+        Contrat.objects.create(chantier=chantiers[0], reference_contrat='C1', montant_total=1000)
+
+        client.nom = 'Kabore'
+        with CaptureQueriesContext(connection) as avec_2:
+            client.save()
+        self.assertEqual(self.trouves(Chantier, 'kabore'), {c.pk for c in chantiers})
+        self.assertEqual(len(self.trouves(Contrat, 'kabore')), 1)
+
+        chantiers += [creer_chantier(client, f'CH{numero}') for numero in range(2, 10)]
+        client.nom = 'Sawadogo'
+        with CaptureQueriesContext(connection) as avec_10:
+            client.save()
+        self.assertEqual(len(avec_10), len(avec_2))
+        self.assertEqual(self.trouves(Chantier, 'sawadogo'), {c.pk for c in chantiers})
+
+    def test_chantier_deplace_n_est_plus_trouve_chez_l_ancien_client(self):
+        ancien, nouveau = creer_client('Ouedraogo'), creer_client('Kabore')
+        chantier = creer_chantier(ancien, 'TOITURE1')
+        self.assertEqual(self.trouves(Client, 'toiture1'), {ancien.pk})
+
+        chantier.client = nouveau
+        chantier.save()
+        self.assertEqual(self.trouves(Client, 'toiture1'), {nouveau.pk})
@@ -0,0 +1,174 @@
+"""COUCHE DE CACHE DU PROJET
+Partagée par tous les workers gunicorn (cache fichier ou Redis, voir settings.CACHES).
+
+    - clés versionnées par modèle: chaque save/delete d'un modèle incrémente sa
+      version, toutes les clés qui en dépendent deviennent obsolètes d'un coup
+    - @cached_query(Modele, ...): met en cache le résultat d'une fonction de calcul
+    - compteurs succès/échecs par nom, stockés dans le cache lui-même
+      (donc communs à tous les workers) et affichés sur admin/cache-stats/;
+      la liste des noms est fixée au chargement du code (declarer_stats), pas
+      tenue dans le cache: deux workers qui écrivent en même temps n'en perdent pas
+"""
+import functools
+import hashlib
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+
+PREFIXE_VERSION = "modele:version"
+PREFIXE_STATS = "cache:stats"
+
+#noms suivis: remplis à l'import par @cached_query et declarer_stats (identiques dans chaque worker)
+NOMS_STATS = set()
+
+#types d'arguments qui entrent dans la clé (les autres, ex: self ou request, sont ignorés)
+TYPES_CLE = (str, int, float, bool, Decimal, date, datetime, type(None))
+
+
+#####__ VERSIONS PAR MODELE __####
+
+def _cle_version(modele):
+    return f"{PREFIXE_VERSION}:{modele._meta.label_lower}"
+
+
+def _version_neuve():
+    #jamais déjà servie: la clé de version peut être évincée du cache (MAX_ENTRIES du cache
+    #fichier); repartir de 1 rendrait de nouveau valides les valeurs calculées sous cette version
+    return time.time_ns()
+
+
+def version_modele(modele):
+    version = cache.get(_cle_version(modele))
+    if version is None:
+        version = _version_neuve()
+        if not cache.add(_cle_version(modele), version, timeout=None):
+            #posée entre-temps par un autre worker
+            version = cache.get(_cle_version(modele), version)
+    return version
+
+
+def invalider_modele(modele):
+    """Incrémente la version du modèle: les clés qui en dépendent ne sont plus lues
+    (incr n'est pas atomique sur le cache fichier: deux invalidations simultanées
+    peuvent n'en faire qu'une, la version change quand même)
+    """
+    try:
+        cache.incr(_cle_version(modele))
+    except ValueError:
+        #clé absente (évincée ou cache vidé): version neuve
+        cache.set(_cle_version(modele), _version_neuve(), timeout=None)
+
+
+def cle_versionnee(nom, modeles, *variantes):
+    """Clé = nom + variantes + version de chaque modèle dont dépend la valeur"""
+    versions = cache.get_many([_cle_version(m) for m in modeles])
+    parties = [nom]
+    parties += [str(v) for v in variantes]
+    parties += [
+        f"{m._meta.model_name}{versions.get(_cle_version(m)) or version_modele(m)}"
+        for m in modeles
+    ]
+    cle = ":".join(parties)
+    if len(cle) > 200:
+        #les backends (memcached/fichier) n'aiment pas les clés trop longues
+        cle = f"{nom}:{hashlib.md5(cle.encode()).hexdigest()}"
+    return cle
+
+
+@receiver([post_save, post_delete], dispatch_uid="sanba_cache_versions")
+def _invalider_sur_modification(sender, **kwargs):
+    if kwargs.get('raw'):
+        return
+    transaction.on_commit(lambda: invalider_modele(sender))
+
+
+#####__ STATISTIQUES SUCCES / ECHECS __####
+
+def _incrementer(cle):
+    if not cache.add(cle, 1, timeout=None):
+        try:
+            cache.incr(cle)
+        except ValueError:
+            cache.set(cle, 1, timeout=None)
+
+
+def declarer_stats(*noms):
+    """Ajoute des noms à la page de statistiques (ex: widgets lus via lire_ou_calculer)"""
+    NOMS_STATS.update(noms)
+
+
+def _cles_stats(noms):
+    return [f"{PREFIXE_STATS}:{nom}:{t}" for nom in noms for t in ('hits', 'misses')]
+
+
+def compter(nom, succes):
+    """Enregistre un succès (hit) ou un échec (miss) du cache pour ce nom"""
+    NOMS_STATS.add(nom)
+    _incrementer(f"{PREFIXE_STATS}:{nom}:{'hits' if succes else 'misses'}")
+
+
+def lire_stats():
+    """Liste de {'nom', 'hits', 'misses', 'taux'} triée par nom"""
+    noms = sorted(NOMS_STATS)
+    valeurs = cache.get_many(_cles_stats(noms))
+    stats = []
+    for nom in noms:
+        hits = valeurs.get(f"{PREFIXE_STATS}:{nom}:hits", 0)
+        misses = valeurs.get(f"{PREFIXE_STATS}:{nom}:misses", 0)
+        total = hits + misses
+        stats.append({
+            'nom': nom,
+            'hits': hits,
+            'misses': misses,
+            'taux': (hits * 100 / total) if total else 0,
+        })
+    return stats
+
+
+def remettre_stats_a_zero():
+    cache.delete_many(_cles_stats(NOMS_STATS))
+
+
+#####__ LECTURE / ECRITURE AVEC STATS __####
+
+def lire_ou_calculer(nom, cle, calcul, timeout):
+    """Lit la clé; sinon calcule, stocke et compte un échec"""
+    valeur = cache.get(cle)
+    if valeur is not None:
+        compter(nom, True)
+        return valeur
+    compter(nom, False)
+    valeur = calcul()
+    cache.set(cle, valeur, timeout)
+    return valeur
+
+
+def cached_query(*modeles, timeout=300, nom=None):
+    """Décorateur: met en cache le résultat d'une fonction qui interroge `modeles`
+
+        @cached_query(RapportDepense, TypeDepense, timeout=600)
+        def depenses_par_categorie(): ...
+
+    Seuls les arguments simples (str, int, Decimal, date...) entrent dans la clé;
+    le résultat doit être picklable (listes/dict, pas de QuerySet paresseux).
+    """
+    def decorateur(fonction):
+        nom_cache = nom or f"{fonction.__module__}.{fonction.__qualname__}"
+        declarer_stats(nom_cache)
+
+        @functools.wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            variantes = [repr(a) for a in args if isinstance(a, TYPES_CLE)]
+            variantes += [f"{k}={v!r}" for k, v in sorted(kwargs.items()) if isinstance(v, TYPES_CLE)]
+            cle = cle_versionnee(f"requete:{nom_cache}", modeles, *variantes)
+            return lire_ou_calculer(nom_cache, cle, lambda: fonction(*args, **kwargs), timeout)
+
+        enveloppe.sans_cache = fonction
+        return enveloppe
+    return decorateur
@@ -0,0 +1,85 @@
+"""CONFIGURATION DE LA BASE DE DONNEES
+Profil choisi par la variable d'environnement DB_PROFILE:
+
+    DB_PROFILE=sqlite (défaut) : db/db.sqlite3 réglé pour plusieurs workers gunicorn
+    DB_PROFILE=postgres        : serveur PostgreSQL (POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD,
+                                 POSTGRES_HOST, POSTGRES_PORT), pilote psycopg (requirements.txt)
+
+SQLite, à chaque nouvelle connexion:
+    - journal WAL: les lectures ne sont plus bloquées par une écriture (décaissement,
+      soumission de rapport), un seul écrivain à la fois
+    - synchronous=NORMAL: en WAL, pas de corruption possible, seule la toute dernière
+      transaction peut être perdue en cas de coupure de courant
+    - busy_timeout: un écrivain attend son tour au lieu d'échouer en "database is locked"
+    - cache de pages et mmap plus grands (lectures du dashboard et des listes)
+    - transactions IMMEDIATE: le verrou d'écriture est pris dès le début de atomic(),
+      une transaction qui lit puis écrit (fonds, transitions) ne peut plus échouer
+      au moment d'écrire parce qu'une autre a écrit entre-temps
+
+Les tests tournent sur une base SQLite fichier (dossier temporaire) avec les mêmes réglages.
+
+Dans les deux cas les connexions restent ouvertes DB_CONN_MAX_AGE secondes (défaut 600)
+au lieu d'une connexion par requête.
+`manage.py bench_base` compare les profils sous charge mixte lecture/écriture.
+"""
+import os
+import tempfile
+
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,        # ms
+    'cache_size': -64000,         # négatif = en Kio, soit ~64 Mo par connexion
+    'mmap_size': 268435456,       # 256 Mo lus directement en mémoire
+    'temp_store': 'MEMORY',
+}
+
+
+def _conn_max_age():
+    return int(os.getenv('DB_CONN_MAX_AGE', 600))
+
+
+def sqlite(nom, reglages=True):
+    """Configuration SQLite; reglages=False donne la configuration Django par défaut (bench)"""
+    configuration = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': nom,
+    }
+    if reglages:
+        configuration.update({
+            'CONN_MAX_AGE': _conn_max_age(),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': ";".join(f"PRAGMA {cle}={valeur}" for cle, valeur in SQLITE_PRAGMAS.items()),
+                'transaction_mode': 'IMMEDIATE',
+            },
+        })
+    return configuration
+
+
+def postgres():
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('POSTGRES_DB', 'sanba_finflow'),
+        'USER': os.getenv('POSTGRES_USER', 'sanba'),
+        'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+        'HOST': os.getenv('POSTGRES_HOST', 'db'),
+        'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': _conn_max_age(),
+        'CONN_HEALTH_CHECKS': True,
+    }
+
+
+def configuration(base_dir, profil=None):
+    """Entrée 'default' de settings.DATABASES pour le profil (DB_PROFILE par défaut)"""
+    profil = profil or os.getenv('DB_PROFILE', 'sqlite')
+    if profil == 'postgres':
+        return postgres()
+    if profil == 'sqlite':
+        configuration = sqlite(base_dir / 'db' / 'db.sqlite3')
+        #base de test dans un fichier (et non en mémoire partagée): WAL, busy_timeout et
+        #transactions IMMEDIATE s'appliquent aussi aux tests qui écrivent depuis plusieurs threads
+        configuration['TEST'] = {'NAME': os.path.join(tempfile.gettempdir(), 'sanba_finflow_test.sqlite3')}
+        return configuration
+    raise ValueError(f"DB_PROFILE inconnu: {profil!r} (sqlite ou postgres)")
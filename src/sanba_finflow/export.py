@@ -0,0 +1,268 @@
+"""EXPORT CSV / XLSX EN FLUX
+Les listes (rapports de dépense, demandes, contrats) s'exportent avec les mêmes
+filtres que la page: ?status=valide&q=ciment&export=xlsx
+
+    - les lignes sont lues par values_list(...).iterator(chunk_size=...): ni
+      instances de modèle, ni queryset complet en mémoire
+    - la réponse est un StreamingHttpResponse: chaque lot de lignes est envoyé
+      dès qu'il est écrit, la mémoire reste constante (100 000 lignes comme 100)
+    - XLSX écrit à la main (zip + XML en flux, cellules en inlineStr): pas de
+      dépendance, pas de fichier temporaire
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+
+LIGNES_PAR_ENVOI = 500
+
+#caractères interdits en XML 1.0 (copiés-collés depuis Word, etc.)
+CARACTERES_INTERDITS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+#####__ FORMATEURS DE COLONNE __####
+
+def libelle(choices):
+    """Code -> libellé d'un champ à choices ('valide' -> 'Validé')"""
+    libelles = dict(choices)
+    return lambda valeur: libelles.get(valeur, valeur)
+
+
+def oui_non(valeur):
+    return "Oui" if valeur else "Non"
+
+
+def _par_lots(lignes, taille):
+    lot = []
+    for ligne in lignes:
+        lot.append(ligne)
+        if len(lot) >= taille:
+            yield lot
+            lot = []
+    if lot:
+        yield lot
+
+
+#####__ CSV __####
+
+class _Echo:
+    """Faux fichier: csv.writer y écrit et writerow() renvoie la ligne au lieu de la stocker"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def _valeur_csv(valeur):
+    if valeur is None:
+        return ""
+    if isinstance(valeur, datetime):
+        return timezone.localtime(valeur).strftime("%d/%m/%Y %H:%M") if timezone.is_aware(valeur) else valeur.strftime("%d/%m/%Y %H:%M")
+    if isinstance(valeur, date):
+        return valeur.strftime("%d/%m/%Y")
+    if isinstance(valeur, (Decimal, float)):
+        #séparateur ';' + virgule décimale: ouvert tel quel par Excel en français
+        return str(valeur).replace(".", ",")
+    valeur = str(valeur)
+    if valeur[:1] in ("=", "+", "-", "@", "\t", "\r"):
+        #pas de formule exécutée par le tableur (injection CSV; tabulation et retour chariot
+        #en tête sont ignorés par Excel, "\t=..." serait lu comme une formule)
+        return "'" + valeur
+    return valeur
+
+
+def flux_csv(entetes, lignes):
+    ecrivain = csv.writer(_Echo(), delimiter=";")
+    #BOM: Excel reconnaît l'UTF-8 (accents)
+    yield "\ufeff" + ecrivain.writerow(entetes)
+    for lot in _par_lots(lignes, LIGNES_PAR_ENVOI):
+        yield "".join(ecrivain.writerow([_valeur_csv(v) for v in ligne]) for ligne in lot)
+
+
+#####__ XLSX __####
+
+XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+NS_R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+
+#styles (index dans cellXfs): 0 normal, 1 date, 2 date + heure, 3 en-tête en gras
+STYLE_DATE, STYLE_DATE_HEURE, STYLE_ENTETE = 1, 2, 3
+
+FICHIERS_FIXES = {
+    '[Content_Types].xml': XML + (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': XML + (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': XML + (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': XML + (
+        f'<styleSheet {NS}>'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="4">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '</cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+EPOQUE_EXCEL = datetime(1899, 12, 30)
+
+
+def _workbook(feuille):
+    return XML + (
+        f'<workbook {NS} {NS_R}><sheets>'
+        f'<sheet name="{escape(feuille[:31])}" sheetId="1" r:id="rId1"/>'
+        '</sheets></workbook>'
+    )
+
+
+def _cellule(valeur, style=0):
+    if valeur is None or valeur == "":
+        return '<c/>'
+    if isinstance(valeur, bool):
+        valeur = oui_non(valeur)
+    elif isinstance(valeur, datetime):
+        if timezone.is_aware(valeur):
+            valeur = timezone.make_naive(valeur)
+        serie = (valeur - EPOQUE_EXCEL).total_seconds() / 86400
+        return f'<c s="{STYLE_DATE_HEURE}"><v>{serie:.6f}</v></c>'
+    elif isinstance(valeur, date):
+        return f'<c s="{STYLE_DATE}"><v>{(valeur - EPOQUE_EXCEL.date()).days}</v></c>'
+    elif isinstance(valeur, (int, float, Decimal)):
+        return f'<c><v>{valeur}</v></c>'
+    texte = escape(CARACTERES_INTERDITS.sub("", str(valeur)))
+    attribut_style = f' s="{style}"' if style else ''
+    return f'<c t="inlineStr"{attribut_style}><is><t xml:space="preserve">{texte}</t></is></c>'
+
+
+def _ligne(valeurs, style=0):
+    return "<row>" + "".join(_cellule(v, style) for v in valeurs) + "</row>"
+
+
+class _Sortie:
+    """Flux sans seek() pour zipfile (qui écrit alors des data descriptors):
+    garde les octets écrits jusqu'au prochain envoi"""
+
+    def __init__(self):
+        self.morceaux = []
+
+    def write(self, octets):
+        self.morceaux.append(bytes(octets))
+        return len(octets)
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        octets = b"".join(self.morceaux)
+        self.morceaux.clear()
+        return octets
+
+
+def flux_xlsx(entetes, lignes, feuille="Export"):
+    sortie = _Sortie()
+    with zipfile.ZipFile(sortie, "w", zipfile.ZIP_DEFLATED) as archive:
+        for nom, contenu in FICHIERS_FIXES.items():
+            archive.writestr(nom, contenu)
+        archive.writestr('xl/workbook.xml', _workbook(feuille))
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as xml:
+            xml.write(f'{XML}<worksheet {NS}><sheetData>'.encode())
+            xml.write(_ligne(entetes, STYLE_ENTETE).encode())
+            for lot in _par_lots(lignes, LIGNES_PAR_ENVOI):
+                xml.write("".join(_ligne(ligne) for ligne in lot).encode())
+                octets = sortie.vider()
+                if octets:
+                    yield octets
+            xml.write(b'</sheetData></worksheet>')
+    yield sortie.vider()
+
+
+#####__ REPONSE HTTP __####
+
+FORMATS = {
+    'csv': (flux_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (flux_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def reponse_export(format_export, entetes, lignes, nom):
+    fonction, content_type = FORMATS[format_export]
+    reponse = StreamingHttpResponse(fonction(entetes, lignes), content_type=content_type)
+    nom_fichier = f"{nom}_{timezone.localdate():%Y-%m-%d}.{format_export}"
+    reponse['Content-Disposition'] = f'attachment; filename="{nom_fichier}"'
+    return reponse
+
+
+class ExportMixin:
+    """À placer avant ListView; ?export=csv ou ?export=xlsx exporte get_queryset() (mêmes filtres)
+
+        class ListRapportDepenseView(LoginRequiredMixin, ExportMixin, KeysetPaginationMixin, ListView):
+            export_nom = "rapports_depense"
+            export_colonnes = [
+                ("Date", "date_depense"),
+                ("Statut", "status", libelle(RapportDepense.STATUS_RAPPORT_CHOICES)),
+                ("Total", "total_export"),
+            ]
+            export_annotations = {"total_export": F("prix_unitaire") * F("quantité")}
+
+    Chaque colonne: (en-tête, champ pour values_list, formateur optionnel)
+    """
+
+    export_param = 'export'
+    export_nom = 'export'
+    export_colonnes = ()
+    export_annotations = {}
+    export_taille_lot = 2000
+
+    def get(self, request, *args, **kwargs):
+        format_export = request.GET.get(self.export_param)
+        if format_export in FORMATS:
+            return self.exporter(format_export)
+        return super().get(request, *args, **kwargs)
+
+    def lignes_export(self):
+        queryset = self.get_queryset()
+        if getattr(self, 'keyset_ordering', None):
+            #même ordre que la liste, sur un index
+            queryset = queryset.order_by(*self.keyset_ordering)
+        if self.export_annotations:
+            queryset = queryset.annotate(**self.export_annotations)
+        champs = [colonne[1] for colonne in self.export_colonnes]
+        formateurs = [colonne[2] if len(colonne) > 2 else None for colonne in self.export_colonnes]
+        lignes = queryset.values_list(*champs).iterator(chunk_size=self.export_taille_lot)
+        if not any(formateurs):
+            return lignes
+        return (
+            [f(valeur) if f else valeur for f, valeur in zip(formateurs, ligne)]
+            for ligne in lignes
+        )
+
+    def exporter(self, format_export):
+        entetes = [colonne[0] for colonne in self.export_colonnes]
+        return reponse_export(format_export, entetes, self.lignes_export(), self.export_nom)
@@ -0,0 +1,140 @@
+"""PAGINATION PAR CURSEUR (keyset)
+Au lieu de OFFSET (qui relit et jette toutes les lignes des pages précédentes),
+on filtre sur les valeurs de tri de la dernière ligne affichée:
+
+    WHERE (date_creation, id) < (:date, :id) ORDER BY date_creation DESC, id DESC LIMIT 21
+
+La page 500 coûte donc le même prix que la page 1 et il n'y a plus de COUNT(*).
+Le tri doit finir par une colonne unique (id) et ne contenir que des champs non NULL.
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+
+class PageCurseur:
+    """Page renvoyée au template (remplace page_obj de Django)
+    next_querystring / previous_querystring conservent les filtres de la requête
+    """
+
+    def __init__(self, object_list, has_next, has_previous, next_querystring="", previous_querystring=""):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_querystring = next_querystring
+        self.previous_querystring = previous_querystring
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginationMixin:
+    """À placer avant ListView:
+
+        class ChantierListeView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+            paginate_by = 20
+            keyset_ordering = ('-date_creation', '-id')
+
+    Le contexte garde les noms de Django (page_obj, is_paginated, object_list)
+    mais paginator vaut None: pas de nombre total de pages.
+    """
+
+    keyset_ordering = ('-id',)
+    curseur_param = 'curseur'
+    sens_param = 'sens'  # 'suivant' (défaut) ou 'precedent'
+
+    #####__ ENCODAGE DU CURSEUR __####
+
+    def _champs_tri(self):
+        return [(champ.lstrip('-'), champ.startswith('-')) for champ in self.keyset_ordering]
+
+    def encoder_curseur(self, objet):
+        valeurs = [getattr(objet, nom) for nom, _ in self._champs_tri()]
+        brut = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in valeurs], default=str)
+        return base64.urlsafe_b64encode(brut.encode()).decode().rstrip('=')
+
+    def decoder_curseur(self, curseur, modele):
+        """Retourne la liste des valeurs typées, ou None si le curseur est invalide"""
+        try:
+            brut = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+            valeurs = json.loads(brut)
+            champs = self._champs_tri()
+            if len(valeurs) != len(champs):
+                return None
+            return [
+                modele._meta.get_field(nom).to_python(valeur)
+                for (nom, _), valeur in zip(champs, valeurs)
+            ]
+        except Exception:
+            #curseur trafiqué ou d'une ancienne version: on repart de la page 1
+            return None
+
+    #####__ FILTRE "APRES LE CURSEUR" __####
+
+    def _filtre_apres(self, valeurs, inverse=False):
+        """(a, b, c) après (va, vb, vc) dans l'ordre de tri =
+            a > va  OU  (a = va ET b > vb)  OU  (a = va ET b = vb ET c > vc)
+        (< au lieu de > pour les champs triés en DESC; inverse=True pour reculer)
+        """
+        condition = Q()
+        egalites = {}
+        for (nom, decroissant), valeur in zip(self._champs_tri(), valeurs):
+            operateur = 'lt' if decroissant != inverse else 'gt'
+            condition |= Q(**egalites, **{f"{nom}__{operateur}": valeur})
+            egalites[nom] = valeur
+        return condition
+
+    def _querystring(self, curseur, sens):
+        parametres = self.request.GET.copy()
+        parametres.pop('page', None)
+        parametres[self.curseur_param] = curseur
+        parametres[self.sens_param] = sens
+        return '?' + parametres.urlencode()
+
+    #####__ BRANCHEMENT DANS ListView __####
+
+    def paginate_queryset(self, queryset, page_size):
+        """Remplace la pagination OFFSET de MultipleObjectMixin"""
+        ordre_inverse = [champ[1:] if champ.startswith('-') else f"-{champ}" for champ in self.keyset_ordering]
+        curseur = self.request.GET.get(self.curseur_param)
+        recule = self.request.GET.get(self.sens_param) == 'precedent'
+        valeurs = self.decoder_curseur(curseur, queryset.model) if curseur else None
+
+        if valeurs is None:
+            lignes = list(queryset.order_by(*self.keyset_ordering)[:page_size + 1])
+            has_next, has_previous = len(lignes) > page_size, False
+            lignes = lignes[:page_size]
+        elif recule:
+            lignes = list(
+                queryset.filter(self._filtre_apres(valeurs, inverse=True)).order_by(*ordre_inverse)[:page_size + 1]
+            )
+            has_next, has_previous = True, len(lignes) > page_size
+            lignes = lignes[:page_size][::-1]
+        else:
+            lignes = list(
+                queryset.filter(self._filtre_apres(valeurs)).order_by(*self.keyset_ordering)[:page_size + 1]
+            )
+            has_next, has_previous = len(lignes) > page_size, True
+            lignes = lignes[:page_size]
+
+        page = PageCurseur(
+            lignes,
+            has_next=has_next and bool(lignes),
+            has_previous=has_previous and bool(lignes),
+            next_querystring=self._querystring(self.encoder_curseur(lignes[-1]), 'suivant') if lignes else '',
+            previous_querystring=self._querystring(self.encoder_curseur(lignes[0]), 'precedent') if lignes else '',
+        )
+        return (None, page, lignes, page.has_other_pages())
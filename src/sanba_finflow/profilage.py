@@ -0,0 +1,251 @@
+"""PROFILAGE DES REQUETES HTTP
+QueryProfilerMiddleware mesure, pour chaque requête:
+    - le nombre de requêtes SQL et leur temps cumulé
+    - les doublons (même SQL avec les mêmes paramètres exécuté plusieurs fois)
+    - le temps de rendu du template (TemplateResponse des vues génériques; un render()
+      dans une vue fonction est compté dans la durée totale)
+et écrit une ligne JSON par requête dans un fichier tournant (logger
+"sanba_finflow.requetes", handler JournalPartage, voir settings.LOGGING),
+lu par la page admin/profilage/.
+
+Budgets: settings.QUERY_BUDGETS = {"dashboard_app:dashboard-view": 15, ...}
+Un dépassement est journalisé; avec QUERY_BUDGETS_STRICT (activé par le lanceur de
+tests sanba_finflow.test_runner) il lève BudgetRequetesDepasse et fait échouer le
+test qui a appelé la vue.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import time
+from collections import Counter, defaultdict, deque
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils import timezone
+
+try:
+    import fcntl
+except ImportError:
+    #Windows (poste de développement): verrou msvcrt, voir _verrouiller
+    fcntl = None
+    import msvcrt
+
+
+logger = logging.getLogger(__name__)
+journal = logging.getLogger("sanba_finflow.requetes")
+
+
+class BudgetRequetesDepasse(AssertionError):
+    """Une vue a exécuté plus de requêtes SQL que son budget (mode strict)"""
+
+
+class Profil:
+    """Compteurs d'une requête HTTP; sert aussi de execute_wrapper"""
+
+    def __init__(self):
+        self.requetes = 0
+        self.sql = 0.0
+        self.template = 0.0
+        self.vues = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - debut
+            self.requetes += 1
+            try:
+                self.vues[(sql, repr(params))] += 1
+            except Exception:
+                #paramètres sans repr (rare): la requête compte, mais pas pour les doublons
+                pass
+
+    @property
+    def doublons(self):
+        return sum(nombre - 1 for nombre in self.vues.values() if nombre > 1)
+
+    def plus_repetee(self):
+        if not self.doublons:
+            return None
+        (sql, _), nombre = self.vues.most_common(1)[0]
+        return {'sql': sql[:300], 'fois': nombre}
+
+
+def budget_de(vue):
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(vue)
+
+
+class QueryProfilerMiddleware:
+    """À placer en tête de MIDDLEWARE pour compter aussi les requêtes des autres middlewares (session, auth)"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILAGE_ACTIF', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profil = Profil()
+        request._profil_requetes = profil
+        debut = time.perf_counter()
+        with connection.execute_wrapper(profil):
+            response = self.get_response(request)
+        duree = time.perf_counter() - debut
+
+        match = getattr(request, 'resolver_match', None)
+        vue = match.view_name if match else None
+        budget = budget_de(vue)
+        hors_budget = budget is not None and profil.requetes > budget
+        ligne = {
+            'date': timezone.now().isoformat(timespec='seconds'),
+            'vue': vue,
+            'methode': request.method,
+            'chemin': request.path,
+            'statut': response.status_code,
+            'duree_ms': round(duree * 1000, 1),
+            'requetes': profil.requetes,
+            'sql_ms': round(profil.sql * 1000, 1),
+            'doublons': profil.doublons,
+            'template_ms': round(profil.template * 1000, 1),
+            'budget': budget,
+        }
+        if profil.doublons:
+            ligne['plus_repetee'] = profil.plus_repetee()
+        journal.info(json.dumps(ligne, ensure_ascii=False))
+
+        if hors_budget:
+            message = f"{vue}: {profil.requetes} requêtes SQL pour un budget de {budget} ({request.method} {request.path})"
+            if getattr(settings, 'QUERY_BUDGETS_STRICT', False):
+                raise BudgetRequetesDepasse(message)
+            logger.warning(message)
+        return response
+
+    def process_template_response(self, request, response):
+        """Chronomètre le rendu (appelé juste avant response.render() par le handler)"""
+        profil = getattr(request, '_profil_requetes', None)
+        if profil is None:
+            return response
+        rendre = response.render
+
+        def rendre_chronometre():
+            debut = time.perf_counter()
+            try:
+                return rendre()
+            finally:
+                profil.template += time.perf_counter() - debut
+
+        response.render = rendre_chronometre
+        return response
+
+
+#####__ JOURNAL COMMUN AUX WORKERS __####
+
+def _verrouiller(fichier):
+    """Verrou exclusif entre processus, relâché à la fermeture du fichier
+    msvcrt.locking abandonne (OSError) après 10 s d'attente: la ligne est alors écrite sans tourner
+    """
+    if fcntl is not None:
+        fcntl.flock(fichier, fcntl.LOCK_EX)
+    else:
+        fichier.seek(0)
+        msvcrt.locking(fichier.fileno(), msvcrt.LK_LOCK, 1)
+
+
+class JournalPartage(logging.handlers.WatchedFileHandler):
+    """Fichier journal écrit par plusieurs processus (workers gunicorn)
+    RotatingFileHandler renomme le fichier depuis chaque processus sans se concerter:
+    les autres continuent d'écrire dans l'ancien fichier, ou tournent une deuxième fois.
+    Ici un seul processus tourne (verrou sur `<fichier>.lock`, taille revérifiée
+    une fois le verrou pris), les autres voient que le fichier a changé (WatchedFileHandler)
+    et rouvrent le nouveau. Le dossier est créé à la première écriture.
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=3, encoding=None):
+        super().__init__(filename, encoding=encoding, delay=True)
+        self.maxBytes = maxBytes
+        self.backupCount = backupCount
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+    def _trop_gros(self):
+        try:
+            return os.path.getsize(self.baseFilename) >= self.maxBytes
+        except FileNotFoundError:
+            return False
+
+    def _tourner(self):
+        with open(f"{self.baseFilename}.lock", 'a') as verrou:
+            _verrouiller(verrou)
+            if not self._trop_gros():
+                return  # un autre worker vient de le faire
+            #fichier ouvert ici fermé avant renommage (exigé sous Windows), rouvert par emit
+            self.close()
+            for numero in range(self.backupCount - 1, 0, -1):
+                if os.path.exists(f"{self.baseFilename}.{numero}"):
+                    os.replace(f"{self.baseFilename}.{numero}", f"{self.baseFilename}.{numero + 1}")
+            os.replace(self.baseFilename, f"{self.baseFilename}.1")
+
+    def emit(self, record):
+        if self.maxBytes and self.backupCount and self._trop_gros():
+            try:
+                self._tourner()
+            except OSError:
+                self.handleError(record)
+        #reopenIfNeeded (WatchedFileHandler) rouvre le fichier s'il a été tourné
+        super().emit(record)
+
+
+
+#####__ RAPPORT __####
+
+def _lignes(fichier, maximum):
+    """Les `maximum` dernières lignes du fichier et de sa sauvegarde la plus récente (.1)"""
+    lignes = deque(maxlen=maximum)
+    for chemin in (f"{fichier}.1", str(fichier)):
+        if os.path.exists(chemin):
+            with open(chemin, encoding='utf-8') as f:
+                lignes.extend(f)
+    for ligne in lignes:
+        try:
+            yield json.loads(ligne)
+        except ValueError:
+            #ligne tronquée (écriture en cours, rotation)
+            continue
+
+
+def _centile(valeurs, centile):
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * centile / 100))]
+
+
+def lire_rapport(fichier=None, maximum=50000):
+    """Agrège les dernières lignes du journal par vue
+    Retourne une liste de dicts triée par nombre maximum de requêtes décroissant
+    """
+    fichier = fichier or settings.PROFILAGE_FICHIER
+    par_vue = defaultdict(list)
+    for ligne in _lignes(fichier, maximum):
+        par_vue[ligne.get('vue') or '(non résolue)'].append(ligne)
+
+    rapport = []
+    for vue, lignes in par_vue.items():
+        requetes = [l['requetes'] for l in lignes]
+        budget = budget_de(vue)
+        rapport.append({
+            'vue': vue,
+            'appels': len(lignes),
+            'requetes_moy': sum(requetes) / len(lignes),
+            'requetes_p95': _centile(requetes, 95),
+            'requetes_max': max(requetes),
+            'sql_ms_moy': sum(l['sql_ms'] for l in lignes) / len(lignes),
+            'template_ms_moy': sum(l['template_ms'] for l in lignes) / len(lignes),
+            'duree_ms_p95': _centile([l['duree_ms'] for l in lignes], 95),
+            'doublons_max': max(l['doublons'] for l in lignes),
+            'budget': budget,
+            'depassements': sum(1 for r in requetes if budget is not None and r > budget),
+        })
+    return sorted(rapport, key=lambda r: (-r['requetes_max'], r['vue']))
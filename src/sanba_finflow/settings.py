@@ -14,6 +14,8 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 
+from sanba_finflow.database import configuration as base_de_donnees
+
 load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -60,11 +62,16 @@ INSTALLED_APPS = [
     'chantier_app',
     'contrat_app',
     'dashboard_app',
-    'home_app'
+    'home_app',
+    'recherche_app',
+    'notification_app',
+    'alerte_app',
+    'stockage_app',
     
 ]
 
 MIDDLEWARE = [
+    'sanba_finflow.profilage.QueryProfilerMiddleware',  # en premier: compte aussi les requêtes des middlewares
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -97,13 +104,52 @@ WSGI_APPLICATION = 'sanba_finflow.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+#   DB_PROFILE=sqlite (défaut) : db/db.sqlite3 en WAL avec pragmas réglés
+#   DB_PROFILE=postgres        : POSTGRES_* (voir sanba_finflow/database.py)
 DATABASES = {
+    'default': base_de_donnees(BASE_DIR),
+}
+
+
+# Cache
+# Partagé entre les workers gunicorn (sinon chaque worker a son LocMemCache privé)
+#   CACHE_BACKEND=fichier (défaut) : dossier commun à tous les workers du conteneur
+#   CACHE_BACKEND=redis            : serveur Redis (REDIS_URL), nécessite le paquet redis
+#   CACHE_BACKEND=memoire          : cache local au processus (dev; toujours utilisé par les tests)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'fichier')
+
+CACHES_MEMOIRE = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR /'db' / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sanba-finflow',
     }
 }
 
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+            'KEY_PREFIX': 'sanba',
+        }
+    }
+elif CACHE_BACKEND == 'memoire':
+    CACHES = CACHES_MEMOIRE
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', BASE_DIR / 'cache'),
+            'KEY_PREFIX': 'sanba',
+            'OPTIONS': {
+                'MAX_ENTRIES': 5000,
+            },
+        }
+    }
+
+#les tests remplacent CACHES par CACHES_MEMOIRE (sanba_finflow/test_runner.py)
+TEST_RUNNER = 'sanba_finflow.test_runner.LanceurTests'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -149,6 +195,13 @@ STATIC_URL = 'static/'
 MEDIA_ROOT = os.path.join(BASE_DIR/"media")
 STATIC_ROOT = os.path.join(BASE_DIR/"staticfiles")
 
+#téléversement des factures par morceaux (employee_app/televersement.py)
+#sur le même disque que MEDIA_ROOT: la facture terminée y est déplacée, pas recopiée
+TELEVERSEMENT_DOSSIER = os.path.join(MEDIA_ROOT, ".televersements")
+TELEVERSEMENT_TAILLE_MAX = 100 * 1024 * 1024
+TELEVERSEMENT_TAILLE_MORCEAU = 8 * 1024 * 1024
+TELEVERSEMENT_EXPIRATION = 48  # heures sans nouveau morceau avant suppression
+
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR/"sanba_finflow/static")
 ]
@@ -183,10 +236,76 @@ CRISPY_TEMPLATE_PACK = "tailwind"
 NPM_BIN_PATH = r'C:\Program Files\nodejs\npm.cmd'
 
 # Essaye avec SSL au lieu de TLS
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+#les vues n'envoient plus rien: elles remplissent notification_app.MessageSortant,
+#le worker `manage.py run_outbox` utilise ce backend (locmem/console en dev: EMAIL_BACKEND=...)
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 465  # Port SSL
 EMAIL_USE_SSL = True  # Au lieu de TLS
 EMAIL_USE_TLS = False
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
-EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD') # Utilise un mot de passe d'application si l'authentification à deux facteurs est activée
\ No newline at end of file
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD') # Utilise un mot de passe d'application si l'authentification à deux facteurs est activée
+DEFAULT_FROM_EMAIL = EMAIL_HOST_USER or 'webmaster@localhost'
+EMAIL_TIMEOUT = 30  # le worker ne reste pas bloqué sur un serveur SMTP muet
+
+# Alertes (alerte_app), réévaluées par `manage.py scanner_alertes --boucle`:
+# mail de rapport en retard seulement pour les décaissements en retard depuis moins de
+# tant d'heures (le premier passage ne relance pas tout l'historique)
+ALERTES_FENETRE_MAIL_RETARD = int(os.getenv('ALERTES_FENETRE_MAIL_RETARD', '168'))
+# copie des mails de rapport en retard (adresses séparées par des virgules, aucune par défaut)
+ALERTES_EMAILS_GESTION = [adresse.strip() for adresse in os.getenv('ALERTES_EMAILS_GESTION', '').split(',') if adresse.strip()]
+
+# Profilage des requêtes (sanba_finflow.profilage): une ligne JSON par requête HTTP,
+# fichier commun aux workers (créé au premier écrit) lu par la page admin/profilage/
+PROFILAGE_ACTIF = os.getenv('PROFILAGE_ACTIF', '1') == '1'
+PROFILAGE_FICHIER = Path(os.getenv('PROFILAGE_FICHIER', BASE_DIR / 'logs' / 'requetes.jsonl'))
+
+# Nombre maximum de requêtes SQL par vue (nom d'URL); dépassement journalisé,
+# ou exception en mode strict (activé par le lanceur de tests, voir TEST_RUNNER)
+QUERY_BUDGETS = {
+    'dashboard_app:dashboard-view': 15,
+    'dashboard_app:dashboard-widget': 15,
+    'chantier_app:liste-chantier': 10,
+    'chantier_app:detail-chantier': 15,
+    'client_app:liste-client': 10,
+    'client_app:detail-client': 15,
+    'directeur_app:directeur-view': 10,
+    'secretaire_app:secretaire-view': 10,
+}
+QUERY_BUDGETS_STRICT = os.getenv('QUERY_BUDGETS_STRICT', '0') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '{levelname} {asctime} {name}: {message}', 'style': '{'},
+        'brut': {'format': '{message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+        'profilage': {
+            #plusieurs workers écrivent le même fichier: rotation sous verrou, les autres suivent
+            'class': 'sanba_finflow.profilage.JournalPartage',
+            'filename': PROFILAGE_FICHIER,
+            'maxBytes': int(os.getenv('PROFILAGE_TAILLE_MAX', 10 * 1024 * 1024)),
+            'backupCount': 3,
+            'encoding': 'utf-8',
+            'formatter': 'brut',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        #LOG_LEVEL=DEBUG pour revoir les traces de diagnostic des vues
+        'level': os.getenv('LOG_LEVEL', 'INFO'),
+    },
+    'loggers': {
+        'sanba_finflow.requetes': {
+            'handlers': ['profilage'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,43 @@
+"""LANCEUR DE TESTS (settings.TEST_RUNNER)
+Réglages propres aux tests, appliqués quelle que soit la façon de lancer la suite:
+    - cache en mémoire (profil CACHE_BACKEND=memoire): chaque lancement part d'un cache
+      vide, rien n'est lu ni laissé dans le cache fichier du projet
+    - budgets de requêtes stricts: une vue qui dépasse QUERY_BUDGETS fait échouer son test
+    - journal de profilage dans un dossier temporaire, supprimé en fin de suite (rien
+      n'est ajouté au logs/requetes.jsonl du projet)
+"""
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from sanba_finflow.profilage import JournalPartage, journal
+
+
+class LanceurTests(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._dossier_journal = tempfile.mkdtemp(prefix='sanba_finflow_tests_')
+        fichier = os.path.join(self._dossier_journal, 'requetes.jsonl')
+        self._reglages_tests = override_settings(
+            CACHES=settings.CACHES_MEMOIRE, QUERY_BUDGETS_STRICT=True, PROFILAGE_FICHIER=fichier,
+        )
+        self._reglages_tests.enable()
+        #LOGGING est appliqué au démarrage: le handler vise encore le fichier du projet
+        handler = JournalPartage(fichier, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('{message}', style='{'))
+        self._handlers_journal = journal.handlers[:]
+        journal.handlers = [handler]
+
+    def teardown_test_environment(self, **kwargs):
+        for handler in journal.handlers:
+            handler.close()
+        journal.handlers = self._handlers_journal
+        shutil.rmtree(self._dossier_journal, ignore_errors=True)
+        self._reglages_tests.disable()
+        super().teardown_test_environment(**kwargs)
@@ -3,8 +3,12 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from dashboard_app.views import RapportRequetesView, StatistiquesCacheView
+
 
 urlpatterns = [
+    path('admin/cache-stats/', admin.site.admin_view(StatistiquesCacheView.as_view()), name="cache-stats"),
+    path('admin/profilage/', admin.site.admin_view(RapportRequetesView.as_view()), name="profilage"),
     path('admin/', admin.site.urls),
     path("", include("home_app.urls")),
     path("authentification", include("auth_app.urls")),
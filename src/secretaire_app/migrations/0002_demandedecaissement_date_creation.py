@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def remplir_date_creation(apps, schema_editor):
+    #meilleure approximation pour l'existant: la dernière date_demande connue
+    DemandeDecaissement = apps.get_model('secretaire_app', 'DemandeDecaissement')
+    DemandeDecaissement.objects.update(date_creation=F('date_demande'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('secretaire_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='demandedecaissement',
+            name='date_creation',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(remplir_date_creation, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='demandedecaissement',
+            name='date_creation',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AddIndex(
+            model_name='demandedecaissement',
+            index=models.Index(fields=['date_creation', 'id'], name='demande_creation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandedecaissement',
+            index=models.Index(fields=['status', 'date_creation', 'id'], name='demande_statut_creation_idx'),
+        ),
+    ]
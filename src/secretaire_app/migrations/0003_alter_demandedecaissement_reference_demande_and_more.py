@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chantier_app', '0003_chantier_chantier_statut_fin_idx_and_more'),
+        ('secretaire_app', '0002_demandedecaissement_date_creation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='demandedecaissement',
+            name='reference_demande',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='demandedecaissement',
+            index=models.Index(fields=['date_demande'], name='demande_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandedecaissement',
+            index=models.Index(condition=models.Q(('decaisse', True)), fields=['date_decaissement'], name='demande_decaisse_idx'),
+        ),
+    ]
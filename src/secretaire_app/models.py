@@ -25,10 +25,24 @@ class DemandeDecaissement(models.Model):
     )
     decaisse = models.BooleanField(default=False)
     date_demande = models.DateTimeField(auto_now=True)
+    #date_demande bouge à chaque save (auto_now): l'historique est trié sur cette date fixe
+    date_creation = models.DateTimeField(auto_now_add=True)
     date_approbation = models.DateTimeField(null=True, blank=True)
     date_decaissement = models.DateTimeField(null=True, blank=True)
     reference_demande = models.CharField(max_length=50, unique=True, null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            #dernières demandes des pages d'accueil: order_by('-date_demande')[:5], index lu à l'envers
+            models.Index(fields=['date_demande'], name='demande_date_idx'),
+            #demandes décaissées (suivi des rapports en retard); index partiel car sur SQLite
+            #Django écrit decaisse=True sous la forme "WHERE decaisse", inutilisable par un index composite
+            models.Index(fields=['date_decaissement'], condition=models.Q(decaisse=True), name='demande_decaisse_idx'),
+            #historique paginé par curseur (-date_creation, -id), filtré ou non par statut
+            models.Index(fields=['date_creation', 'id'], name='demande_creation_idx'),
+            models.Index(fields=['status', 'date_creation', 'id'], name='demande_statut_creation_idx'),
+        ]
+    
     def __str__(self):
         return f'{self.reference_demande}'
     
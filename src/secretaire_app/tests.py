@@ -1,3 +1,30 @@
+from decimal import Decimal
+
 from django.test import TestCase
+from django.urls import reverse
+
+from auth_app.models import Personnel
+
+from .models import DemandeDecaissement
+
+
+class HistoriqueDemandeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.utilisateur = Personnel.objects.create_superuser(username='boss', password='pw', email='b@x.com')
+        for numero in range(30):
+            DemandeDecaissement.objects.create(demandeur=cls.utilisateur, montant=Decimal('1000'), motif=f'Motif {numero}')
+
+    def test_modifier_une_demande_ne_la_fait_pas_changer_de_page(self):
+        self.client.force_login(self.utilisateur)
+        url = reverse('secretaire_app:hist-demande-decaisse')
+        page_1 = self.client.get(url)
+        vus = [demande.id for demande in page_1.context['dmd_decaissmt_hist']]
+
+        #une demande de la page 2 est approuvée entre-temps: son date_demande (auto_now) change
+        DemandeDecaissement.objects.exclude(id__in=vus).earliest('id').save()
 
-# Create your tests here.
+        page_2 = self.client.get(url + page_1.context['page_obj'].next_querystring)
+        vus += [demande.id for demande in page_2.context['dmd_decaissmt_hist']]
+        self.assertEqual(sorted(vus), sorted(DemandeDecaissement.objects.values_list('id', flat=True)))
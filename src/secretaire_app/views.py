@@ -1,20 +1,22 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.utils import timezone
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView
 import django_htmx
 from django.db.models import Sum, Count, Q
-from django.core.mail import send_mail
+from notification_app.outbox import mettre_en_file
 from django.conf import settings
-from datetime import timedelta
-from django.utils import timezone
 from secretaire_app.models import DemandeDecaissement
         
 from client_app.forms import ClientForm
 from .forms import DemandeDecaissementForm
 from .models import DemandeDecaissement
+from sanba_finflow.pagination import KeysetPaginationMixin
+from sanba_finflow.export import ExportMixin, libelle, oui_non
+from recherche_app.index import rechercher
 from directeur_app.models import FondDisponible
+from directeur_app import fonds
+from alerte_app.scanner import alertes_actives
 from auth_app.form import ChangeCredentialsForm
 
 
@@ -38,7 +40,7 @@ def demande_decaissement_view(request):
                 
                 # Après succès d'envoie de demande
                 try:
-                    send_mail(
+                    mettre_en_file(
                         subject=" Demande Décaissement 💰", 
                         message=f"""Bonjour, Mr {demande.demandeur.username},
                         \n demande un décaissement de {form.cleaned_data.get('montant')} FCFA'
@@ -60,7 +62,8 @@ def demande_decaissement_view(request):
                        "fond": fond.montant,
                        "ch_form":ChangeCredentialsForm(request.user),
                        "form": ClientForm(),
-                       "list_demande":list_demande
+                       "list_demande":list_demande,
+                       "alertes":alertes_actives('secretaire')[:10],
                        }
                 return render(request, "secretaire_templates/secretaire.html",ctx)
             
@@ -72,7 +75,8 @@ def demande_decaissement_view(request):
             "list_demande":list_demande,
             "fond": fond.montant,
             "ch_form":ChangeCredentialsForm(request.user),
-            "form":ClientForm()
+            "form":ClientForm(),
+            "alertes":alertes_actives('secretaire')[:10],
             } 
     return render(request, "secretaire_templates/secretaire.html",ctx)
             
@@ -82,32 +86,24 @@ def valider_decaissement_view(request, decaissement_id):
     
     try:    
         
-        fond = FondDisponible.objects.get(id=1)
-        decaissement = get_object_or_404(DemandeDecaissement, id=decaissement_id)
+        get_object_or_404(DemandeDecaissement, id=decaissement_id)
         
-                 # 🚨 Vérifie pas déjà décaissé
-        if decaissement.decaisse:
-            messages.warning(request, "⚠️ Déjà décaissé !")
+        try:
+            #fond suffisant, pas déjà décaissé et écriture du journal: tout dans une transaction
+            decaissement, _ = fonds.decaisser(decaissement_id, request.user)
+        except fonds.DejaDecaisse as e:
+            # 🚨 Vérifie pas déjà décaissé
+            messages.warning(request, str(e))
             return redirect("secretaire_app:secretaire-view")
-        
-        if fond.montant < decaissement.montant:
-            messages.info(request, "Fond inssufisant")
-            
-        elif decaissement.montant <= 0 or decaissement.montant==None:
-            messages.info(request, "Impossible veillez verifier la somme")
+        except fonds.OperationFondImpossible as e:
+            messages.info(request, str(e))
         else:
-            fond.montant -= decaissement.montant
-            decaissement.decaisse = True
-            decaissement.date_decaissement = timezone.now()
-            decaissement.save()
-            fond.save()
-        
             messages.success(request, f"{request.user} viens de faire le decaissement de  {decaissement.montant} FCFA pour  {decaissement.demandeur.username} ")
             logger.info(f"Décaissement #{decaissement_id}: {decaissement.montant} FCFA -> {decaissement.demandeur.username}")
             
             try:
             # Après succès
-                send_mail(
+                mettre_en_file(
                     subject=f"💰 Décaissement {decaissement.montant} FCFA",
                     message=f"Décaissement pour {decaissement.demandeur.username}, a été effectué.",
                     from_email=settings.EMAIL_HOST_USER,
@@ -116,38 +112,34 @@ def valider_decaissement_view(request, decaissement_id):
             except Exception as e:
                 logger.error(f"Erreur envoi mail décaissement {e}")
             
-            time_limite = timezone.now() - timedelta(hours=48)
-            if decaissement.decaisse==True and decaissement.rapports_depense is None and decaissement.date_decaissement <= time_limite:
-                messages.warning(request, f"⚠️ Attention {decaissement.demandeur.username} n'a pas encore soumis son rapport de dépense pour le décaissement, référence:{decaissement.reference_demande} fait il y a plus de 48 heures.")
-                
-                try:
-                    send_mail(
-                        subject="⚠️ Rapport de Dépense en Retard",
-                        message=f"Bonjour {decaissement.demandeur.username}, n'a pas encore soumis son rapport de dépense pour le décaissement fait il y a plus de 48 heures.",
-                        from_email=settings.EMAIL_HOST_USER,    
-                        recipient_list=[request.user.email, "nasserdevtest@gmail.com"]
-                    )   
-                except Exception as e:
-                    logger.error(f"Erreur envoi mail rapport retard {e}")
-                
-                try:
-                    send_mail(
-                        subject="⚠️ Rapport de Dépense en Retard",
-                        message=f"Bonjour {decaissement.demandeur.username}, vous n'avez pas encore soumis votre rapport de dépense pour le décaissement effectué il y a plus de 48 heures. Veuillez le faire dès que possible.",
-                        from_email=settings.EMAIL_HOST_USER,        
-                        recipient_list=[decaissement.demandeur.email]
-                    )
-                except Exception as e:
-                    logger.error(f"Erreur envoi mail rapport retard {e}")
+            #le suivi des rapports en retard (48h) est fait par alerte_app.scanner
 
     except Exception as e:
         logger.error(f"erreur decaissement {e}")
     return redirect("secretaire_app:secretaire-view")
 
-class HistoriqueDemandeView(LoginRequiredMixin, ListView):
+class HistoriqueDemandeView(LoginRequiredMixin, ExportMixin, KeysetPaginationMixin, ListView):
     model = DemandeDecaissement
     template_name="historique/demande_decaissement_hist.html"
     context_object_name = 'dmd_decaissmt_hist'
+    paginate_by = 25
+    keyset_ordering = ('-date_creation', '-id') #pagination par curseur (pas d'OFFSET), sur une date qui ne bouge pas
+    
+    #?export=csv / ?export=xlsx: liste filtrée en flux (sanba_finflow.export)
+    export_nom = "demandes_decaissement"
+    export_colonnes = [
+        ("Référence", "reference_demande"),
+        ("Date", "date_demande"),
+        ("Demandeur", "demandeur__username"),
+        ("Chantier", "chantier__reference"),
+        ("Motif", "motif"),
+        ("Montant", "montant"),
+        ("Statut", "status", libelle(DemandeDecaissement.STATUS_CHOICES)),
+        ("Approuvé par", "approuve_par__username"),
+        ("Date approbation", "date_approbation"),
+        ("Décaissé", "decaisse", oui_non),
+        ("Date décaissement", "date_decaissement"),
+    ]
     
     def get_template_names(self):
         if self.request.headers.get('HX-request'):
@@ -159,7 +151,7 @@ class HistoriqueDemandeView(LoginRequiredMixin, ListView):
             'demandeur',
             'chantier',
             "approuve_par"
-        ).order_by('-date_demande')
+        ).order_by('-date_creation')
         #################__FILTRER LES DEMANDE PAR STATUS__################################
         status = self.request.GET.get('status')
         if status:
@@ -168,7 +160,8 @@ class HistoriqueDemandeView(LoginRequiredMixin, ListView):
         #########################__FILTRER PAR RECHERCHE__############################
         search = self.request.GET.get('q')
         if search:
-            queryset = queryset.filter(
+            #index plein texte (recherche_app), icontains seulement hors SQLite
+            queryset = rechercher(queryset, search,
                 Q(demandeur__username__icontains=search)|
                 Q(demandeur__first_name__icontains=search)|
                 Q(demandeur__last_name__icontains=search)|
@@ -203,8 +196,8 @@ class HistoriqueDemandeView(LoginRequiredMixin, ListView):
             total_general_effectue =Sum("montant", filter=Q(decaisse=True))
         )   
         
-        queryset = self.get_queryset()
-        total_general_filter = queryset.aggregate(total=Sum("montant"))["total"] or 0
+        #total sur toute la liste filtrée (pas seulement la page affichée)
+        total_general_filter = self.object_list.order_by().aggregate(total=Sum("montant"))["total"] or 0
         context["total_general_filter"] = total_general_filter
         
         return context
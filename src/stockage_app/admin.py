@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Blob
+
+
+@admin.register(Blob)
+class AdminBlob(admin.ModelAdmin):
+    list_display = ["chemin", "taille", "references", "date_creation", "date_dernier_usage"]
+    search_fields = ["sha256", "chemin"]
+    readonly_fields = ["sha256", "chemin", "taille", "references", "date_creation", "date_dernier_usage"]
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class StockageAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'stockage_app'
+    
+    def ready(self):
+        #compteurs de références des blobs tenus à jour par les modèles qui les utilisent
+        from .signals import connecter
+        connecter()
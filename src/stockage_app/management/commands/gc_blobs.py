@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from stockage_app.stockage import collecter, importer_anciens
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime les blobs (factures, contrats, devis) qui ne sont plus référencés et les "
+        "fichiers orphelins de media/ (voir stockage_app.stockage)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--delai", type=float, default=24, help="Âge minimum en heures d'un fichier supprimé (défaut 24)")
+        parser.add_argument("--simulation", action="store_true", help="Affiche ce qui serait supprimé sans rien supprimer")
+        parser.add_argument("--importer", action="store_true", help="Range d'abord les anciens fichiers dans le stockage par contenu")
+
+    def handle(self, *args, **options):
+        if options["importer"] and not options["simulation"]:
+            self.stdout.write(f"📦 {importer_anciens()} ancien(s) fichier(s) rangé(s) par contenu")
+
+        resultat = collecter(timedelta(hours=options["delai"]), simulation=options["simulation"])
+        prefixe = "🔎 (simulation) " if options["simulation"] else "🗑️ "
+        self.stdout.write(f"🔢 {resultat['references_corrigees']} compteur(s) de références corrigé(s)")
+        self.stdout.write(
+            f"{prefixe}{resultat['blobs']} blob(s) et {resultat['orphelins']} fichier(s) orphelin(s), "
+            f"{resultat['octets'] / (1024 * 1024):.1f} Mo"
+        )
+        self.stdout.write(self.style.SUCCESS("✅ Nettoyage terminé"))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('chemin', models.CharField(max_length=255)),
+                ('taille', models.PositiveBigIntegerField()),
+                ('references', models.IntegerField(default=0)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_dernier_usage', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('references__lte', 0)), fields=['date_dernier_usage'], name='blob_orphelin_idx')],
+            },
+        ),
+    ]
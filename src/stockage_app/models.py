@@ -0,0 +1,25 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Blob(models.Model):
+    """Fichier stocké une seule fois, identifié par le SHA-256 de son contenu
+    (voir stockage_app.stockage). `references` = nombre de champs fichier qui pointent
+    dessus; à 0 il est supprimé par `manage.py gc_blobs` après un délai de grâce.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    chemin = models.CharField(max_length=255)
+    taille = models.PositiveBigIntegerField()
+    references = models.IntegerField(default=0)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    #dernier upload ou changement de références: le GC ne touche pas un blob récent
+    date_dernier_usage = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            #candidats du GC
+            models.Index(fields=['date_dernier_usage'], condition=models.Q(references__lte=0), name='blob_orphelin_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.chemin} ({self.references} réf.)"
@@ -0,0 +1,60 @@
+"""Compteurs de références des blobs
+Le nom de chaque champ stocké par contenu est mémorisé au chargement de l'objet (post_init);
+après save, on compare: +1 sur le nouveau blob, -1 sur l'ancien. Un delete retire 1 à chacun.
+Les update() en masse ne passent pas ici: `gc_blobs` recompte tout depuis les tables avant
+de supprimer quoi que ce soit.
+"""
+from django.db.models.signals import post_delete, post_init, post_save
+
+from .stockage import ajuster_references, modeles_et_champs
+
+
+#modèle -> champs stockés par contenu (rempli par connecter)
+CHAMPS_PAR_MODELE = {}
+
+
+def _champs(sender):
+    return CHAMPS_PAR_MODELE.get(sender, ())
+
+
+def _noms(instance, champs):
+    #valeur brute du __dict__: un champ différé (only/defer) est ignoré plutôt que rechargé
+    noms = {}
+    for champ in champs:
+        if champ in instance.__dict__:
+            valeur = instance.__dict__[champ]
+            noms[champ] = getattr(valeur, 'name', valeur) or ''
+    return noms
+
+
+def memoriser(sender, instance, **kwargs):
+    instance._blobs_charges = _noms(instance, _champs(sender))
+
+
+def apres_enregistrement(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    avant = {} if created else getattr(instance, '_blobs_charges', {})
+    apres = _noms(instance, _champs(sender))
+    for champ, nom in apres.items():
+        if champ not in avant and not created:
+            continue  # valeur précédente inconnue: laissé au recomptage du GC
+        ancien = avant.get(champ, '')
+        if nom != ancien:
+            ajuster_references([nom], +1)
+            ajuster_references([ancien], -1)
+    instance._blobs_charges = apres
+
+
+def apres_suppression(sender, instance, **kwargs):
+    ajuster_references(_noms(instance, _champs(sender)).values(), -1)
+
+
+def connecter():
+    for modele, champ in modeles_et_champs():
+        CHAMPS_PAR_MODELE.setdefault(modele, []).append(champ)
+    for modele in CHAMPS_PAR_MODELE:
+        uid = f"blobs_{modele._meta.label_lower}"
+        post_init.connect(memoriser, sender=modele, dispatch_uid=f"{uid}_init")
+        post_save.connect(apres_enregistrement, sender=modele, dispatch_uid=f"{uid}_save")
+        post_delete.connect(apres_suppression, sender=modele, dispatch_uid=f"{uid}_delete")
@@ -0,0 +1,220 @@
+"""STOCKAGE PAR CONTENU (blobs)
+Les factures et documents de contrat sont rangés par le SHA-256 de leur contenu:
+
+    media/blobs/3f/3fa4...c9.webp
+
+    - la même facture envoyée 3 fois n'est écrite qu'une fois sur disque (et dans
+      les sauvegardes): les 3 rapports pointent vers le même fichier
+    - Blob (clé = hash) compte les références; savoir si un contenu existe déjà
+      est une lecture par clé primaire
+    - un fichier n'est jamais modifié sous le même nom: nginx peut le mettre en
+      cache "immutable"
+    - les fichiers sans référence sont supprimés par `manage.py gc_blobs`
+
+Champs concernés: CHAMPS ci-dessous (storage=stockage_blobs dans leur modèle).
+"""
+import hashlib
+import os
+import uuid
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+
+DOSSIER = "blobs"
+
+#(modèle, champ) stockés par contenu; les noms hors de DOSSIER (anciens fichiers) sont ignorés
+CHAMPS = [
+    ('employee_app.RapportDepense', 'facture'),
+    ('contrat_app.Contrat', 'contrat_pdf'),
+    ('contrat_app.Contrat', 'devis_initial'),
+]
+
+
+def empreinte(fichier):
+    """SHA-256 (hex) d'un fichier Django, lu par blocs; le fichier est rembobiné"""
+    sha = hashlib.sha256()
+    for bloc in fichier.chunks():
+        sha.update(bloc)
+    fichier.seek(0)
+    return sha.hexdigest()
+
+
+def chemin_blob(sha256, extension):
+    return f"{DOSSIER}/{sha256[:2]}/{sha256}{extension}"
+
+
+def sha_du_chemin(nom):
+    """'blobs/3f/3fa4...c9.webp' -> '3fa4...c9'; None pour un fichier hors du stockage par contenu"""
+    if not nom or not nom.startswith(f"{DOSSIER}/"):
+        return None
+    return os.path.splitext(os.path.basename(nom))[0]
+
+
+class StockageParContenu(FileSystemStorage):
+    """FileSystemStorage qui ignore le nom demandé et range le fichier sous son hash
+    Un contenu déjà présent n'est pas réécrit: le nom existant est renvoyé
+    """
+
+    def _save(self, name, content):
+        from .models import Blob
+
+        sha = empreinte(content)
+        extension = os.path.splitext(name)[1].lower()[:10]
+        #même verrou que collecter(): le GC ne peut pas supprimer la ligne ni le fichier
+        #entre le moment où on le trouve et celui où on le rend
+        with transaction.atomic():
+            #l'UPDATE prend le verrou (ligne sous PostgreSQL, base sous SQLite) et éloigne le GC
+            if Blob.objects.filter(sha256=sha).update(date_dernier_usage=timezone.now()):
+                chemin = Blob.objects.values_list('chemin', flat=True).get(sha256=sha)
+            else:
+                chemin = Blob.objects.get_or_create(
+                    sha256=sha, defaults={'chemin': chemin_blob(sha, extension), 'taille': content.size},
+                )[0].chemin
+            if not self.exists(chemin):
+                #écrit à côté puis renommé: un fichier coupé en cours d'écriture n'a jamais le nom final
+                partiel = super()._save(f"{chemin}.{uuid.uuid4().hex}.partiel", content)
+                os.replace(self.path(partiel), self.path(chemin))
+        return chemin
+
+
+_stockage = StockageParContenu()
+
+
+def stockage_blobs():
+    """Passé en callable aux FileField (storage=stockage_blobs): les migrations gardent la référence"""
+    return _stockage
+
+
+#####__ REFERENCES __####
+
+def ajuster_references(noms, delta):
+    shas = {sha for nom in noms if (sha := sha_du_chemin(nom))}
+    if not shas:
+        return
+    from .models import Blob
+    Blob.objects.filter(sha256__in=shas).update(
+        references=F('references') + delta, date_dernier_usage=timezone.now(),
+    )
+
+
+def modeles_et_champs():
+    for label, champ in CHAMPS:
+        yield apps.get_model(label), champ
+
+
+def compter_references():
+    """{sha256: nombre de lignes qui pointent dessus}, recalculé depuis les tables (vérité)"""
+    comptes = {}
+    for modele, champ in modeles_et_champs():
+        lignes = (
+            modele.objects.filter(**{f"{champ}__startswith": f"{DOSSIER}/"})
+            .values(champ).annotate(n=Count('pk')).values_list(champ, 'n')
+        )
+        for nom, n in lignes:
+            sha = sha_du_chemin(nom)
+            comptes[sha] = comptes.get(sha, 0) + n
+    return comptes
+
+
+#####__ NETTOYAGE (manage.py gc_blobs) __####
+
+#tous les champs fichier dont les dossiers sont nettoyés (y compris les non-blobs)
+CHAMPS_NETTOYES = CHAMPS + [('employee_app.RapportDepense', 'miniature')]
+
+
+def recompter_references():
+    """Remet Blob.references d'accord avec les tables; retourne le nombre de blobs corrigés"""
+    from .models import Blob
+
+    comptes = compter_references()
+    corriges = []
+    for blob in Blob.objects.only('sha256', 'references').iterator(chunk_size=2000):
+        vrai = comptes.get(blob.sha256, 0)
+        if blob.references != vrai:
+            blob.references = vrai
+            corriges.append(blob)
+    Blob.objects.bulk_update(corriges, ['references'], batch_size=500)
+    return len(corriges)
+
+
+def importer_anciens():
+    """Range les fichiers d'avant le stockage par contenu dans blobs/ (les doublons fusionnent)
+    Les anciens fichiers deviennent orphelins et partent au nettoyage suivant
+    """
+    importes = 0
+    for modele, champ in modeles_et_champs():
+        anciens = (
+            modele.objects.exclude(**{f"{champ}__startswith": f"{DOSSIER}/"}).exclude(**{champ: ''})
+            .exclude(**{f"{champ}__isnull": True}).values_list('pk', champ)
+        )
+        for pk, nom in anciens.iterator(chunk_size=500):
+            if not _stockage.exists(nom):
+                continue
+            with _stockage.open(nom, 'rb') as fichier:
+                nouveau = _stockage.save(nom, fichier)
+            #update(): pas de save() complet (ni post_save ni recalculs) pour un simple déplacement
+            modele.objects.filter(pk=pk, **{champ: nom}).update(**{champ: nouveau})
+            importes += 1
+    return importes
+
+
+def _fichiers(dossier):
+    racine = _stockage.path(dossier)
+    for chemin, _, noms in os.walk(racine):
+        for nom in noms:
+            complet = os.path.join(chemin, nom)
+            yield os.path.relpath(complet, _stockage.location).replace(os.sep, '/'), complet
+
+
+def collecter(delai, simulation=False):
+    """Supprime les blobs sans référence et les fichiers orphelins plus vieux que `delai`
+    Retourne {'references_corrigees', 'blobs', 'orphelins', 'octets'}
+    """
+    from .models import Blob
+
+    limite = timezone.now() - delai
+    resultat = {'references_corrigees': recompter_references(), 'blobs': 0, 'orphelins': 0, 'octets': 0}
+
+    def supprimer(nom, complet):
+        resultat['octets'] += os.path.getsize(complet)
+        if not simulation:
+            os.remove(complet)
+
+    #1. blobs sans référence
+    candidats = Blob.objects.filter(references__lte=0, date_dernier_usage__lt=limite)
+    for blob in candidats.iterator(chunk_size=500):
+        #ligne et fichier supprimés sous le verrou pris par le DELETE: un upload du même
+        #contenu (_save) attend la fin, puis recrée la ligne et réécrit le fichier
+        with transaction.atomic():
+            #conditionnel: un upload a pu réutiliser le blob depuis la lecture
+            if not simulation and not Blob.objects.filter(
+                sha256=blob.sha256, references__lte=0, date_dernier_usage__lt=limite
+            ).delete()[0]:
+                continue
+            resultat['blobs'] += 1
+            if _stockage.exists(blob.chemin):
+                supprimer(blob.chemin, _stockage.path(blob.chemin))
+
+    #2. fichiers sans ligne: blobs/ sans Blob, anciens dossiers sans rapport/contrat qui les cite
+    connus = set(Blob.objects.values_list('chemin', flat=True))
+    dossiers = {DOSSIER}
+    for modele, champ in ((apps.get_model(label), champ) for label, champ in CHAMPS_NETTOYES):
+        connus.update(n for n in modele.objects.values_list(champ, flat=True).distinct() if n)
+        upload_to = modele._meta.get_field(champ).upload_to
+        if isinstance(upload_to, str):
+            dossiers.add(upload_to.strip('/'))
+    #un dossier inclus dans un autre n'est parcouru qu'une fois
+    dossiers = {d for d in dossiers if not any(d != autre and d.startswith(f"{autre}/") for autre in dossiers)}
+    for dossier in sorted(dossiers):
+        if not _stockage.exists(dossier):
+            continue
+        for nom, complet in _fichiers(dossier):
+            if nom in connus or os.path.getmtime(complet) >= limite.timestamp():
+                continue
+            resultat['orphelins'] += 1
+            supprimer(nom, complet)
+    return resultat
@@ -0,0 +1,124 @@
+import datetime
+import os
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from auth_app.models import Personnel
+from employee_app.models import RapportDepense, TypeDepense
+
+from . import stockage
+from .models import Blob
+
+
+PDF_A = b'%PDF-1.4\nfacture A\n'
+PDF_B = b'%PDF-1.4\nfacture B\n'
+
+
+class StockageParContenuTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media = tempfile.mkdtemp(prefix="sanba_media_")
+        cls._media = override_settings(MEDIA_ROOT=cls.media)
+        cls._media.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._media.disable()
+        shutil.rmtree(cls.media, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.employee = Personnel.objects.create_user(username='employe', password='pw')
+        cls.type_depense = TypeDepense.objects.create(nom='Ciment')
+
+    def rapport_avec(self, contenu):
+        rapport = RapportDepense.objects.create(
+            employee=self.employee, type_depense=self.type_depense, prix_unitaire=Decimal('500'),
+            date_depense=datetime.date.today(),
+        )
+        rapport.facture.save('facture.pdf', ContentFile(contenu), save=True)
+        return rapport
+
+    def references(self, rapport):
+        return Blob.objects.get(sha256=stockage.sha_du_chemin(rapport.facture.name)).references
+
+    def vieillir(self, heures=48):
+        Blob.objects.update(date_dernier_usage=timezone.now() - datetime.timedelta(hours=heures))
+
+    def test_meme_contenu_un_seul_fichier(self):
+        premier, second = self.rapport_avec(PDF_A), self.rapport_avec(PDF_A)
+
+        self.assertEqual(premier.facture.name, second.facture.name)
+        self.assertTrue(premier.facture.name.startswith(f"{stockage.DOSSIER}/"))
+        self.assertEqual(self.references(premier), 2)
+        self.assertEqual(os.listdir(os.path.dirname(premier.facture.path)), [os.path.basename(premier.facture.path)])
+
+    def test_references_au_remplacement_et_a_la_suppression(self):
+        premier, second = self.rapport_avec(PDF_A), self.rapport_avec(PDF_A)
+        ancien = Blob.objects.get(sha256=stockage.sha_du_chemin(premier.facture.name))
+
+        premier.facture.save('autre.pdf', ContentFile(PDF_B), save=True)
+        ancien.refresh_from_db()
+        self.assertEqual(ancien.references, 1)
+        self.assertEqual(self.references(premier), 1)
+
+        second.delete()
+        ancien.refresh_from_db()
+        self.assertEqual(ancien.references, 0)
+
+    def test_gc_supprime_blob_et_fichier_orphelins(self):
+        garde = self.rapport_avec(PDF_A)
+        supprime = self.rapport_avec(PDF_B)
+        chemin_supprime = supprime.facture.path
+        supprime.delete()
+        #fichier de blobs/ sans ligne Blob (upload interrompu...), vieux puis récent
+        vieux, recent = (os.path.join(self.media, stockage.DOSSIER, 'zz', nom) for nom in ('vieux.pdf', 'recent.pdf'))
+        os.makedirs(os.path.dirname(vieux))
+        for chemin in (vieux, recent):
+            with open(chemin, 'wb') as fichier:
+                fichier.write(b'x')
+        deux_jours = time.time() - 48 * 3600
+        os.utime(vieux, (deux_jours, deux_jours))
+        self.vieillir()
+
+        resultat = stockage.collecter(datetime.timedelta(hours=24))
+
+        self.assertEqual((resultat['blobs'], resultat['orphelins']), (1, 1))
+        self.assertFalse(os.path.exists(chemin_supprime))
+        self.assertFalse(os.path.exists(vieux))
+        self.assertTrue(os.path.exists(recent))
+        self.assertTrue(os.path.exists(garde.facture.path))
+        self.assertEqual(list(Blob.objects.values_list('references', flat=True)), [1])
+
+    def test_blob_reutilise_avant_le_gc_conserve(self):
+        rapport = self.rapport_avec(PDF_A)
+        chemin = rapport.facture.path
+        rapport.delete()
+        self.vieillir()
+
+        #le même contenu revient avant le passage du GC: la date d'usage est rafraîchie
+        nom = stockage.stockage_blobs().save('facture.pdf', ContentFile(PDF_A))
+
+        self.assertEqual(stockage.collecter(datetime.timedelta(hours=24))['blobs'], 0)
+        self.assertEqual(nom, stockage.chemin_blob(stockage.sha_du_chemin(nom), '.pdf'))
+        self.assertTrue(os.path.exists(chemin))
+
+    def test_fichier_manquant_reecrit(self):
+        rapport = self.rapport_avec(PDF_A)
+        #ligne restée sans fichier (GC interrompu avant son commit)
+        os.remove(rapport.facture.path)
+
+        second = self.rapport_avec(PDF_A)
+
+        self.assertEqual(second.facture.name, rapport.facture.name)
+        with open(second.facture.path, 'rb') as fichier:
+            self.assertEqual(fichier.read(), PDF_A)